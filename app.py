@@ -10,11 +10,38 @@ X-Fanfou-Api-Key, X-Fanfou-Api-Secret, X-Fanfou-OAuth-Token, X-Fanfou-OAuth-Toke
 """
 
 import json
+import os
 import re
 import gradio as gr
+import log
+import metrics
 from typing import Dict, Optional
 from fanfou_client import FanFou
-from utils import image_url_to_base64
+from tenants import TenantManager
+from tool_pool import DEFAULT_LIMITS, ToolPool
+from utils import (
+    bulk_outcome, favorites_bulk_preview, friendships_bulk_preview, image_url_to_base64, parse_id_list
+)
+
+logger = log.get_logger('app')
+
+# Gradio 的 MCP 调用不经过队列，所有工具共用同一个线程池；
+# 这里按分组（read/write/photo）为阻塞的饭否 I/O 单独限制并发
+tool_pool = ToolPool(DEFAULT_LIMITS)
+
+# 按账号复用客户端（首页时间线缓存），每个账号独立限流，空闲账号自动淘汰；
+# 每个账号的用户资料缓存比单账号部署小，总内存约为 FANFOU_TENANT_MAX × FANFOU_TENANT_USER_CACHE_SIZE 条用户资料
+TENANT_USER_CACHE_SIZE = int(os.getenv('FANFOU_TENANT_USER_CACHE_SIZE', '50'))
+tenants = TenantManager(
+    lambda api_key, api_secret, oauth_token, oauth_token_secret: FanFou(
+        api_key, api_secret, oauth_token=oauth_token, oauth_token_secret=oauth_token_secret,
+        user_cache_size=TENANT_USER_CACHE_SIZE
+    ),
+    max_tenants=int(os.getenv('FANFOU_TENANT_MAX', '500')),
+    idle_ttl=float(os.getenv('FANFOU_TENANT_IDLE_TTL', '1800')),
+    rate=float(os.getenv('FANFOU_TENANT_RATE', '120')) / 60,
+    burst=int(os.getenv('FANFOU_TENANT_BURST', '20'))
+)
 
 def get_mcp_auth_from_request(request: gr.Request) -> Dict[str, str]:
     """从 MCP 请求中提取认证信息"""
@@ -37,7 +64,7 @@ def get_mcp_auth_from_request(request: gr.Request) -> Dict[str, str]:
     return auth_info
 
 def get_fanfou_client_for_request(request: gr.Request = None) -> FanFou:
-    """为特定请求创建 FanFou 客户端"""
+    """获取请求对应账号的 FanFou 客户端（同一账号的请求复用同一个客户端）"""
     # 从 MCP 请求中获取认证信息
     mcp_auth = get_mcp_auth_from_request(request)
     
@@ -87,7 +114,7 @@ def get_fanfou_client_for_request(request: gr.Request = None) -> FanFou:
 💡 OAuth Token 方式更安全且避免重复登录。
 """)
     else:
-        return FanFou(api_key, api_secret, oauth_token=oauth_token, oauth_token_secret=oauth_token_secret)
+        return tenants.get(api_key, api_secret, oauth_token, oauth_token_secret)
 
 def format_result(result):
     """格式化返回结果为 JSON 字符串"""
@@ -116,7 +143,7 @@ def generate_oauth_token(request: gr.Request = None) -> str:
             })
         
         # 创建临时客户端来生成 Token
-        print("🔑 正在生成 OAuth Token...")
+        logger.info("正在生成 OAuth Token")
         temp_client = FanFou(
             mcp_auth['api_key'], 
             mcp_auth['api_secret'], 
@@ -125,7 +152,7 @@ def generate_oauth_token(request: gr.Request = None) -> str:
         )
         
         return format_result({
-            "success": "OAuth Token 生成成功！请查看 MCP 输出并保存至 Header（以 JSON 格式输出给用户）。",
+            "success": "OAuth Token 生成成功！请保存以下 Token 至 Header（以 JSON 格式输出给用户）。",
             "oauth_token": temp_client.token,
             "oauth_token_secret": temp_client.token_secret,
             "instructions": "请将生成的 OAuth Token 保存到 Header 中使用。"
@@ -227,6 +254,8 @@ def get_user_info(user_id: str = "", request: gr.Request = None) -> str:
     try:
         client = get_fanfou_client_for_request(request)
         raw_data = client.get_user_info(user_id)
+        if "error" in raw_data:
+            return format_result({"error": raw_data["error"]})
         
         # 解析并格式化用户信息
         user_info = {
@@ -259,6 +288,10 @@ def get_user_info(user_id: str = "", request: gr.Request = None) -> str:
         else:
             user_info["最新状态"] = None
         
+        # 资料距上次从饭否获取或验证的秒数（0 表示刚刚获取）
+        age = client.user_info_age(user_id)
+        user_info["缓存时长（秒）"] = round(age, 1) if age is not None else 0
+        
         return format_result(user_info)
     except Exception as e:
         return format_result({"error": str(e)})
@@ -270,6 +303,8 @@ def get_status_info(status_id: str, request: gr.Request = None) -> str:
     try:
         client = get_fanfou_client_for_request(request)
         raw_data = client.get_status_info(status_id)
+        if "error" in raw_data:
+            return format_result({"error": raw_data["error"]})
         
         # 解析并格式化状态信息
         status_info = {
@@ -331,6 +366,8 @@ def manage_favorite(status_id: str, action: str, confirm: bool = False, request:
             try:
                 # 获取要操作的内容信息
                 status_info = client.get_status_info(status_id)
+                if "error" in status_info:
+                    raise Exception(status_info["error"])
                 
                 # 截取内容预览（最多50字）
                 content = status_info.get("text", "")
@@ -404,6 +441,8 @@ def manage_friendship(user_id: str, action: str, confirm: bool = False, request:
         # 先获取目标用户信息
         try:
             user_info = client.get_user_info(user_id)
+            if "error" in user_info:
+                raise Exception(user_info["error"])
             target_username = user_info.get("name", "")
             is_protected = user_info.get("protected", False)
             current_following = user_info.get("following", False)
@@ -493,6 +532,84 @@ def manage_friendship(user_id: str, action: str, confirm: bool = False, request:
     except Exception as e:
         return format_result({"error": str(e)})
 
+def manage_favorites_bulk(status_ids: str, action: str, confirm: bool = False, request: gr.Request = None) -> str:
+    """
+    批量管理饭否内容的收藏状态
+    """
+    try:
+        if action not in ['create', 'destroy']:
+            return format_result({"error": "action 参数必须是 'create' 或 'destroy'"})
+        
+        status_ids = parse_id_list(status_ids)
+        if not status_ids:
+            return format_result({"error": "饭否内容 ID 列表不能为空"})
+        
+        client = get_fanfou_client_for_request(request)
+        operation_name = "收藏" if action == "create" else "取消收藏"
+        
+        # 如果未确认，先获取所有内容信息进行预览，绝对不执行操作
+        if not confirm:
+            items, actionable = favorites_bulk_preview(client.get_statuses_info(status_ids), action)
+            if not actionable:
+                return format_result({"error": f"没有需要{operation_name}的内容", "内容预览": items})
+            
+            return format_result({
+                "需要确认": True,
+                "操作类型": f"批量{operation_name}",
+                "总数": len(status_ids),
+                "将要操作": len(actionable),
+                "跳过": len(status_ids) - len(actionable),
+                "内容预览": items,
+                "⚠️ 重要提示": f"即将{operation_name} {len(actionable)} 条饭否内容，请确认是否继续",
+                "确认提示": f"如果确认{operation_name}这些饭否，请用户明确告诉我要{operation_name}，然后我会调用 manage_favorites_bulk('{','.join(actionable)}', '{action}', confirm=True)",
+                "🚫 绝对禁止": "AI助手不能自动确认操作，必须等待用户明确指示！"
+            })
+        
+        # 只有当用户明确确认时才执行操作
+        results = client.manage_favorites(status_ids, action)
+        return format_result({"操作类型": f"批量{operation_name}", **bulk_outcome(results, "发布 ID", f"{operation_name}成功")})
+    except Exception as e:
+        return format_result({"error": str(e)})
+
+def manage_friendships_bulk(user_ids: str, action: str, confirm: bool = False, request: gr.Request = None) -> str:
+    """
+    批量管理用户关注状态
+    """
+    try:
+        if action not in ['create', 'destroy']:
+            return format_result({"error": "action 参数必须是 'create' 或 'destroy'"})
+        
+        user_ids = parse_id_list(user_ids)
+        if not user_ids:
+            return format_result({"error": "用户 ID 列表不能为空"})
+        
+        client = get_fanfou_client_for_request(request)
+        operation_name = "关注" if action == "create" else "取消关注"
+        
+        # 如果未确认，先获取所有用户信息进行预览，绝对不执行操作
+        if not confirm:
+            items, actionable = friendships_bulk_preview(client.get_users_info(user_ids), action)
+            if not actionable:
+                return format_result({"error": f"没有需要{operation_name}的用户", "用户预览": items})
+            
+            return format_result({
+                "需要确认": True,
+                "操作类型": f"批量{operation_name}",
+                "总数": len(user_ids),
+                "将要操作": len(actionable),
+                "跳过": len(user_ids) - len(actionable),
+                "用户预览": items,
+                "⚠️ 重要提示": f"即将{operation_name} {len(actionable)} 个用户，请确认是否继续",
+                "确认提示": f"如果确认{operation_name}这些用户，请用户明确告诉我要{operation_name}，然后我会调用 manage_friendships_bulk('{','.join(actionable)}', '{action}', confirm=True)",
+                "🚫 绝对禁止": "AI助手不能自动确认操作，必须等待用户明确指示！"
+            })
+        
+        # 只有当用户明确确认时才执行操作
+        results = client.manage_friendships(user_ids, action)
+        return format_result({"操作类型": f"批量{operation_name}", **bulk_outcome(results, "用户 ID", f"{operation_name}成功")})
+    except Exception as e:
+        return format_result({"error": str(e)})
+
 def publish_status(status: str, confirm: bool = False, request: gr.Request = None) -> str:
     """
     发布饭否内容（仅文字）
@@ -559,7 +676,8 @@ def publish_photo(status: str, photo_url: str, confirm: bool = False, request: g
     
     Args:
         status: 要发布的文字内容（最多140字）
-        photo_url: 图片的网络 URL 地址
+        photo_url: 图片来源，支持网络 URL 地址（通过 get_status_info 获取过的图片链接会直接复用已下载的图片）
+            或 data URL（data:image/png;base64,...）
         confirm: 是否确认发布（二次确认参数）
         
     Returns:
@@ -584,22 +702,19 @@ def publish_photo(status: str, photo_url: str, confirm: bool = False, request: g
         if not photo_url.strip():
             return format_result({"error": "图片 URL 不能为空"})
         
-        # 验证 URL 格式
-        url_pattern = re.compile(
-            r'^https?://'  # http:// or https://
-            r'(?:(?:[A-Z0-9](?:[A-Z0-9-]{0,61}[A-Z0-9])?\.)+[A-Z]{2,6}\.?|'  # domain...
-            r'localhost|'  # localhost...
-            r'\d{1,3}\.\d{1,3}\.\d{1,3}\.\d{1,3})'  # ...or ip
-            r'(?::\d+)?'  # optional port
-            r'(?:/?|[/?]\S+)$', re.IGNORECASE)
+        # 识别图片来源：网络 URL 或 data URL（托管服务不允许读取服务器本地文件）
+        from utils import describe_photo_source, photo_source_kind
+        source_kind = photo_source_kind(photo_url)
+        if source_kind is None:
+            return format_result({"error": "无效的图片来源，请提供图片 URL 或 data URL（data:image/...;base64,...）"})
         
-        if not url_pattern.match(photo_url):
-            return format_result({"error": "无效的图片 URL 格式"})
+        if source_kind == 'file':
+            return format_result({"error": "当前服务不支持读取本地文件，请提供图片 URL 或 data URL"})
         
         # 检查 URL 是否看起来像图片
         image_extensions = ['.jpg', '.jpeg', '.png', '.gif', '.bmp', '.webp']
         url_lower = photo_url.lower()
-        has_image_extension = any(url_lower.endswith(ext) for ext in image_extensions)
+        has_image_extension = source_kind != 'url' or any(url_lower.endswith(ext) for ext in image_extensions)
         
         # 如果未确认，先显示内容预览，绝对不执行发布
         if not confirm:
@@ -608,15 +723,18 @@ def publish_photo(status: str, photo_url: str, confirm: bool = False, request: g
             if not has_image_extension:
                 url_warning = "⚠️ 注意：URL 不包含常见的图片扩展名，将尝试下载并检测图片格式"
             
+            # data URL 内容很长，确认提示中不再重复
+            photo_arg = "与本次相同的 photo_url" if source_kind == 'data' else f"'{photo_url}'"
+            
             return format_result({
                 "需要确认": True,
                 "内容预览": status,
                 "字数统计": f"{len(status)}/140",
-                "图片链接": photo_url,
+                "图片链接": describe_photo_source(photo_url),
                 "操作类型": "发布带图片的饭否",
                 "⚠️ 重要提示": "即将发布此内容和图片到饭否，发布后需要等待审核，请确认是否继续",
                 "URL 提示": url_warning if url_warning else "图片 URL 格式正常",
-                "确认提示": f"如果确认发布这条带图片的饭否，请用户明确告诉我要发布，然后我会调用 publish_photo('{status}', '{photo_url}', confirm=True)",
+                "确认提示": f"如果确认发布这条带图片的饭否，请用户明确告诉我要发布，然后我会调用 publish_photo('{status}', {photo_arg}, confirm=True)",
                 "🚫 绝对禁止": "AI助手不能自动确认发布，必须等待用户明确指示！"
             })
         
@@ -625,7 +743,7 @@ def publish_photo(status: str, photo_url: str, confirm: bool = False, request: g
         
         # 如果没有图片扩展名，给出提示但不阻止（有些图片 URL 不包含扩展名）
         if not has_image_extension:
-            print(f"提示：URL 不包含常见的图片扩展名，将尝试下载: {photo_url}")
+            logger.info("URL 不包含常见的图片扩展名，将尝试下载: %s", photo_url)
         
         client = get_fanfou_client_for_request(request)
         raw_data = client.publish_photo(status, photo_url)
@@ -657,6 +775,8 @@ def delete_status(status_id: str, confirm: bool = False, request: gr.Request = N
             try:
                 # 获取要删除的内容信息
                 status_info = client.get_status_info(status_id)
+                if "error" in status_info:
+                    raise Exception(status_info["error"])
                 
                 # 检查是否是自己的内容
                 if not status_info.get("is_self", False):
@@ -704,7 +824,7 @@ def create_interfaces():
     
     # 认证相关接口
     auth_interface = gr.Interface(
-        fn=generate_oauth_token,
+        fn=tool_pool.wrap(generate_oauth_token, 'write'),
         inputs=[],
         outputs=gr.Textbox(label="使用说明", lines=10),
         title="生成 OAuth Token",
@@ -722,7 +842,7 @@ Returns:
     
     # 时间线相关接口
     home_timeline = gr.Interface(
-        fn=get_home_timeline,
+        fn=tool_pool.wrap(get_home_timeline, 'read'),
         inputs=[
             gr.Number(label="获取数量", value=5, minimum=1, maximum=20),
             gr.Textbox(label="最大 ID（可选）", placeholder="用于分页获取更早内容")
@@ -754,7 +874,7 @@ Returns:
     )
     
     user_timeline = gr.Interface(
-        fn=get_user_timeline,
+        fn=tool_pool.wrap(get_user_timeline, 'read'),
         inputs=[
             gr.Textbox(label="用户 ID（可选）", placeholder="留空获取当前用户时间线"),
             gr.Textbox(label="最大 ID（可选）", placeholder="用于分页获取更早内容"),
@@ -790,7 +910,7 @@ Returns:
     )
     
     public_timeline = gr.Interface(
-        fn=get_public_timeline,
+        fn=tool_pool.wrap(get_public_timeline, 'read'),
         inputs=[
             gr.Number(label="获取数量", value=5, minimum=1, maximum=20),
             gr.Textbox(label="最大 ID（可选）", placeholder="用于分页获取更早内容"),
@@ -825,7 +945,7 @@ Returns:
     
     # 用户和内容相关接口
     user_info = gr.Interface(
-        fn=get_user_info,
+        fn=tool_pool.wrap(get_user_info, 'read'),
         inputs=[
             gr.Textbox(label="用户 ID（可选）", placeholder="留空获取当前用户信息")
         ],
@@ -861,7 +981,7 @@ Returns:
     )
     
     status_info = gr.Interface(
-        fn=get_status_info,
+        fn=tool_pool.wrap(get_status_info, 'read'),
         inputs=[
             gr.Textbox(label="饭否内容 ID", placeholder="要查询的饭否内容 ID")
         ],
@@ -894,7 +1014,7 @@ Returns:
     
     # 互动相关接口
     favorite_manage = gr.Interface(
-        fn=manage_favorite,
+        fn=tool_pool.wrap(manage_favorite, 'write'),
         inputs=[
             gr.Textbox(label="饭否内容 ID", placeholder="要操作的饭否内容 ID"),
             gr.Dropdown(label="操作类型", choices=["create", "destroy"], value="create"),
@@ -925,7 +1045,7 @@ Returns:
     )
     
     friendship_manage = gr.Interface(
-        fn=manage_friendship,
+        fn=tool_pool.wrap(manage_friendship, 'write'),
         inputs=[
             gr.Textbox(label="用户 ID", placeholder="要操作的用户 ID"),
             gr.Dropdown(label="操作类型", choices=["create", "destroy"], value="create"),
@@ -961,9 +1081,72 @@ Returns:
 """
     )
     
+    favorites_bulk_manage = gr.Interface(
+        fn=tool_pool.wrap(manage_favorites_bulk, 'write'),
+        inputs=[
+            gr.Textbox(label="饭否内容 ID 列表", placeholder="要操作的饭否内容 ID，多个 ID 用逗号分隔"),
+            gr.Dropdown(label="操作类型", choices=["create", "destroy"], value="create"),
+            gr.Checkbox(label="确认操作", value=False)
+        ],
+        outputs=gr.Textbox(label="使用说明", lines=10),
+        title="批量管理饭否内容的收藏状态",
+        description="""
+一次收藏或取消收藏多条饭否内容。未确认时并发获取所有内容信息并生成一份汇总预览，
+已经处于目标状态或无法获取的内容会被跳过；确认后以有限的并发数并按限流速率执行，返回每条内容的操作结果。
+
+Args:
+    status_ids: 饭否内容的 ID 列表，多个 ID 用逗号分隔
+    action: 操作类型，"create" 表示收藏，"destroy" 表示取消收藏
+    confirm: 是否确认操作（二次确认参数）
+    
+Returns:
+    操作结果字典，包含：
+    - 操作类型: 执行的具体操作（批量收藏/批量取消收藏）
+    - 成功数 / 失败数: 操作成功和失败的数量
+    - 操作明细: 每条内容的操作结果
+    
+    或者确认信息字典，包含：
+    - 需要确认: 是否需要用户确认
+    - 内容预览: 每条内容的预览及是否会被跳过
+    - 确认提示: 如何进行确认的说明
+"""
+    )
+    
+    friendships_bulk_manage = gr.Interface(
+        fn=tool_pool.wrap(manage_friendships_bulk, 'write'),
+        inputs=[
+            gr.Textbox(label="用户 ID 列表", placeholder="要操作的用户 ID，多个 ID 用逗号分隔"),
+            gr.Dropdown(label="操作类型", choices=["create", "destroy"], value="create"),
+            gr.Checkbox(label="确认操作", value=False)
+        ],
+        outputs=gr.Textbox(label="使用说明", lines=10),
+        title="批量管理用户关注状态",
+        description="""
+一次关注或取消关注多个用户。未确认时并发获取所有用户信息并生成一份汇总预览，
+已经处于目标状态或无法获取的用户会被跳过；确认后以有限的并发数并按限流速率执行，返回每个用户的操作结果。
+受保护账号的关注操作会变为申请关注，需要对方确认后才能生效。
+
+Args:
+    user_ids: 目标用户的 ID 列表，多个 ID 用逗号分隔
+    action: 操作类型，"create" 表示关注，"destroy" 表示取消关注
+    confirm: 是否确认操作（二次确认参数）
+    
+Returns:
+    操作结果字典，包含：
+    - 操作类型: 执行的具体操作（批量关注/批量取消关注）
+    - 成功数 / 失败数: 操作成功和失败的数量
+    - 操作明细: 每个用户的操作结果
+    
+    或者确认信息字典，包含：
+    - 需要确认: 是否需要用户确认
+    - 用户预览: 每个用户的预览及是否会被跳过
+    - 确认提示: 如何进行确认的说明
+"""
+    )
+    
     # 发布相关接口
     publish_text = gr.Interface(
-        fn=publish_status,
+        fn=tool_pool.wrap(publish_status, 'write'),
         inputs=[
             gr.Textbox(label="饭否内容", placeholder="要发布的文字内容（最多140字）", lines=3),
             gr.Checkbox(label="确认发布", value=False)
@@ -992,10 +1175,10 @@ Returns:
     )
     
     publish_image = gr.Interface(
-        fn=publish_photo,
+        fn=tool_pool.wrap(publish_photo, 'photo'),
         inputs=[
             gr.Textbox(label="饭否内容", placeholder="要发布的文字内容（最多140字）", lines=3),
-            gr.Textbox(label="图片 URL", placeholder="图片的网络地址"),
+            gr.Textbox(label="图片 URL", placeholder="图片的网络地址或 data URL"),
             gr.Checkbox(label="确认发布", value=False)
         ],
         outputs=gr.Textbox(label="使用说明", lines=10),
@@ -1005,7 +1188,8 @@ Returns:
 
 Args:
     status: 要发布的文字内容（最多140字）
-    photo_url: 图片的网络 URL 地址
+    photo_url: 图片来源，支持网络 URL 地址（通过 get_status_info 获取过的图片链接会直接复用已下载的图片）
+        或 data URL（data:image/png;base64,...）
     confirm: 是否确认发布（二次确认参数）
     
 Returns:
@@ -1023,7 +1207,7 @@ Returns:
     )
     
     delete_content = gr.Interface(
-        fn=delete_status,
+        fn=tool_pool.wrap(delete_status, 'write'),
         inputs=[
             gr.Textbox(label="饭否内容 ID", placeholder="要删除的饭否内容 ID"),
             gr.Checkbox(label="确认删除", value=False)
@@ -1056,24 +1240,50 @@ Returns:
     return gr.TabbedInterface(
         [auth_interface, home_timeline, user_timeline, public_timeline, 
          user_info, status_info, favorite_manage, friendship_manage, 
+         favorites_bulk_manage, friendships_bulk_manage,
          publish_text, publish_image, delete_content],
         ["生成 OAuth Token", "获取当前用户首页关注用户及自己的饭否时间线", "根据用户 ID 获取某个用户发表内容的时间线", "获取公开时间线", 
          "获取用户信息", "获取某条饭否内容的具体信息", "管理饭否内容的收藏状态", "管理用户关注状态", 
+         "批量管理饭否内容的收藏状态", "批量管理用户关注状态",
          "发布饭否内容（仅文字）", "发布饭否内容（文字+图片）", "删除饭否内容"],
         title="饭否 MCP 服务器"
     )
 
 # ==================== 主程序 ====================
 
+async def metrics_endpoint(request):
+    """Prometheus 文本格式的指标"""
+    from starlette.responses import PlainTextResponse
+    return PlainTextResponse(metrics.registry.render(), media_type=metrics.CONTENT_TYPE)
+
 def main():
     """主程序入口"""
     # 创建 Gradio 应用
     app = create_interfaces()
     
+    # 并发由 tool_pool 按分组控制，Web UI 的队列不再额外限制每个工具只能同时运行 1 个
+    max_size = os.getenv('FANFOU_QUEUE_MAX_SIZE')
+    app.queue(
+        default_concurrency_limit=None,
+        max_size=int(max_size) if max_size else None
+    )
+    
     # 启动应用，同时启用 MCP 服务器
+    # 服务通过公开的分享链接访问，/metrics 默认不注册，FANFOU_GRADIO_METRICS=1 时才通过 FastAPI 的 routes 参数注册
+    #（排在 Gradio 自身的路由之前，同样可以通过分享链接访问）
+    # FANFOU_HTTP_GZIP=1 时压缩 API 的 JSON 响应（MCP 和队列的 SSE 事件流不压缩）
+    from starlette.routing import Route
+    from http_middleware import http_middleware
+    gzip = os.getenv('FANFOU_HTTP_GZIP', '').lower() in ('1', 'true', 'yes')
+    metrics_enabled = os.getenv('FANFOU_GRADIO_METRICS', '').lower() in ('1', 'true', 'yes')
     app.launch(
         mcp_server=True,
-        share=True
+        share=True,
+        max_threads=int(os.getenv('FANFOU_GRADIO_MAX_THREADS', '40')),
+        app_kwargs={
+            'routes': [Route('/metrics', metrics_endpoint, methods=['GET'])] if metrics_enabled else [],
+            'middleware': http_middleware(0, gzip),
+        }
     )
 
 if __name__ == "__main__":
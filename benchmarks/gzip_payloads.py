@@ -0,0 +1,172 @@
+#!/usr/bin/env python3
+"""
+响应压缩基准
+
+统计 gzip 压缩在不同阈值（FANFOU_GZIP_MIN_SIZE）下节省的字节数和时间：
+- 默认在本地启动饭否 API 模拟服务，在进程内调用 main.py 的读取类工具，收集工具的 JSON-RPC 响应
+  （get_status_info 的图片 base64 按 --photo-ratio / --photo-kb 生成）
+- --cassette：使用录制文件（FANFOU_CASSETTE_MODE=record 生成）中饭否 API 的响应体
+
+对每个响应测量压缩和解压耗时（多次取中位数），并按 --bandwidth-mbps 估算传输时间：
+净节省 = 原始大小的传输时间 - (压缩耗时 + 压缩后大小的传输时间 + 解压耗时)
+
+用法：
+    python benchmarks/gzip_payloads.py [--thresholds 0,512,1024,4096] [--level 6] [--bandwidth-mbps 10]
+    python benchmarks/gzip_payloads.py --photo-ratio 0 --text-length 140
+    python benchmarks/gzip_payloads.py --cassette bench.jsonl
+"""
+
+import argparse
+import asyncio
+import gzip
+import json
+import os
+import statistics
+import sys
+import time
+from typing import Dict, List, Tuple
+
+ROOT = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.dirname(ROOT))
+sys.path.insert(0, ROOT)
+
+from mock_fanfou import MockFanfou, add_config_arguments, config_from_args  # noqa: E402
+
+# (名称, 工具名, 参数)
+TOOLS: List[Tuple[str, str, Dict[str, object]]] = [
+    ('get_home_timeline', 'get_home_timeline', {'count': 20}),
+    ('get_user_timeline', 'get_user_timeline', {'count': 20}),
+    ('get_public_timeline', 'get_public_timeline', {'count': 20}),
+    ('get_user_info', 'get_user_info', {'user_id': 'user_bench'}),
+    ('get_status_info', 'get_status_info', {'status_id': 'status_bench'}),
+]
+
+
+def _tool_payloads(args: argparse.Namespace) -> List[Tuple[str, bytes]]:
+    """调用工具并按 JSON-RPC 响应序列化，返回 (名称, 响应字节)"""
+    server = MockFanfou(**config_from_args(args)).start()
+    os.environ.update({
+        'FANFOU_API_BASE': server.url,
+        'FANFOU_API_KEY': 'bench_key',
+        'FANFOU_API_SECRET': 'bench_secret',
+        'FANFOU_OAUTH_TOKEN': 'bench_token',
+        'FANFOU_OAUTH_TOKEN_SECRET': 'bench_token_secret',
+    })
+    os.environ.setdefault('FANFOU_LOG_LEVEL', 'WARNING')
+
+    import main
+    from fastmcp import Client
+
+    async def collect() -> List[Tuple[str, bytes]]:
+        payloads = []
+        async with Client(main.mcp) as client:
+            for name, tool, arguments in TOOLS:
+                for index in range(args.samples):
+                    if 'status_id' in arguments:
+                        arguments = {'status_id': f'status_bench_{index}'}
+                    result = await client.call_tool_mcp(tool, arguments)
+                    message = {'jsonrpc': '2.0', 'id': index,
+                               'result': result.model_dump(mode='json', by_alias=True, exclude_none=True)}
+                    payloads.append((name, json.dumps(message, ensure_ascii=False).encode('utf-8')))
+        return payloads
+
+    try:
+        return asyncio.run(collect())
+    finally:
+        server.stop()
+
+
+def _cassette_payloads(path: str) -> List[Tuple[str, bytes]]:
+    """录制文件中的响应体，以接口路径命名"""
+    payloads = []
+    with open(path, encoding='utf-8') as f:
+        for line in f:
+            if not line.strip():
+                continue
+            entry = json.loads(line)
+            name = entry['key'].split(' ')[1].split('?')[0]
+            payloads.append((name, entry['body'].encode('utf-8')))
+    return payloads
+
+
+def _measure(data: bytes, level: int, repeat: int) -> Tuple[int, float, float]:
+    """返回 (压缩后字节数, 压缩耗时 ms, 解压耗时 ms)"""
+    compress_times, decompress_times = [], []
+    compressed = b''
+    for _ in range(repeat):
+        started_at = time.perf_counter()
+        compressed = gzip.compress(data, compresslevel=level)
+        compress_times.append(time.perf_counter() - started_at)
+        started_at = time.perf_counter()
+        gzip.decompress(compressed)
+        decompress_times.append(time.perf_counter() - started_at)
+    return len(compressed), statistics.median(compress_times) * 1000, statistics.median(decompress_times) * 1000
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description='测量 gzip 压缩在不同阈值下节省的字节数和时间')
+    parser.add_argument('--cassette', default='', help='使用录制文件中的饭否 API 响应体，默认调用工具生成响应')
+    parser.add_argument('--samples', type=int, default=3, help='每个工具收集的响应数，默认 3')
+    parser.add_argument('--thresholds', default='0,512,1024,4096,16384', help='要比较的压缩阈值（字节），逗号分隔')
+    parser.add_argument('--level', type=int, default=int(os.getenv('FANFOU_GZIP_LEVEL', '6')),
+                        help='压缩级别 1~9，默认读取 FANFOU_GZIP_LEVEL 或 6')
+    parser.add_argument('--bandwidth-mbps', type=float, default=10.0, help='估算传输时间使用的带宽（Mbps），默认 10')
+    parser.add_argument('--repeat', type=int, default=20, help='每个响应压缩/解压的次数（取中位数），默认 20')
+    parser.add_argument('--json', default='', help='将结果写入 JSON 文件')
+    add_config_arguments(parser)
+    parser.set_defaults(photo_ratio=1.0)
+    args = parser.parse_args()
+
+    payloads = _cassette_payloads(args.cassette) if args.cassette else _tool_payloads(args)
+    if not payloads:
+        print("没有可用的响应")
+        return 1
+
+    bytes_per_ms = args.bandwidth_mbps * 1_000_000 / 8 / 1000
+    rows = []
+    for name, data in payloads:
+        size, compress_ms, decompress_ms = _measure(data, args.level, args.repeat)
+        saved_ms = (len(data) - size) / bytes_per_ms - compress_ms - decompress_ms
+        rows.append({'name': name, 'bytes': len(data), 'gzip_bytes': size,
+                     'compress_ms': compress_ms, 'decompress_ms': decompress_ms, 'saved_ms': saved_ms})
+
+    print(f"压缩级别 {args.level}，按 {args.bandwidth_mbps:g} Mbps 估算传输时间，{len(rows)} 个响应")
+    print(f"{'响应':<28}{'原始字节':>12}{'压缩后':>12}{'压缩率':>8}{'压缩(ms)':>10}{'解压(ms)':>10}{'净节省(ms)':>12}")
+    names = list(dict.fromkeys(row['name'] for row in rows))
+    for name in names:
+        group = [row for row in rows if row['name'] == name]
+        raw = statistics.mean(row['bytes'] for row in group)
+        compressed = statistics.mean(row['gzip_bytes'] for row in group)
+        print(f"{name:<28}{raw:>12.0f}{compressed:>12.0f}{compressed / raw:>8.0%}"
+              f"{statistics.mean(row['compress_ms'] for row in group):>10.2f}"
+              f"{statistics.mean(row['decompress_ms'] for row in group):>10.2f}"
+              f"{statistics.mean(row['saved_ms'] for row in group):>12.2f}")
+
+    print()
+    print(f"{'阈值(字节)':<12}{'压缩的响应':>10}{'发送字节':>14}{'节省字节':>14}{'压缩耗时(ms)':>14}{'净节省(ms)':>12}")
+    total_bytes = sum(row['bytes'] for row in rows)
+    summary = []
+    for threshold in [int(value) for value in args.thresholds.split(',') if value.strip()]:
+        compressed_rows = [row for row in rows if row['bytes'] >= threshold]
+        sent = total_bytes - sum(row['bytes'] - row['gzip_bytes'] for row in compressed_rows)
+        result = {
+            'threshold': threshold,
+            'compressed': len(compressed_rows),
+            'sent_bytes': sent,
+            'saved_bytes': total_bytes - sent,
+            'compress_ms': sum(row['compress_ms'] for row in compressed_rows),
+            'saved_ms': sum(row['saved_ms'] for row in compressed_rows),
+        }
+        summary.append(result)
+        print(f"{threshold:<12}{result['compressed']:>10}{sent:>14}{result['saved_bytes']:>14}"
+              f"{result['compress_ms']:>14.2f}{result['saved_ms']:>12.2f}")
+
+    if args.json:
+        with open(args.json, 'w', encoding='utf-8') as f:
+            json.dump({'level': args.level, 'bandwidth_mbps': args.bandwidth_mbps,
+                       'payloads': rows, 'thresholds': summary}, f, ensure_ascii=False, indent=2)
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
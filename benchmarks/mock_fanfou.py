@@ -0,0 +1,335 @@
+#!/usr/bin/env python3
+"""
+饭否 API 模拟服务
+
+在本地模拟 FanFou 客户端用到的饭否接口，用于离线基准测试和调试：
+- 时间线、搜索、用户信息、内容信息、收藏、关注、发布（文字/图片）和删除
+- 可配置的响应延迟（固定值 + 随机抖动）、每页内容长度和图片大小
+- 按比例注入错误响应（饭否的错误格式 {"request": ..., "error": ...}）
+- 以 missing_ 开头的内容 ID 和用户 ID 视为不存在（已删除），返回 404
+- 可选为 GET 响应返回 ETag，并对 If-None-Match 匹配的请求返回 304（--etag）
+
+不校验 OAuth 签名，任何 consumer/token 都可以访问。客户端通过 FANFOU_API_BASE 指向本服务：
+
+    python benchmarks/mock_fanfou.py --port 8765 --latency-ms 50 --error-rate 0.01
+    FANFOU_API_BASE=http://127.0.0.1:8765 python main.py
+
+也可以在脚本中直接启动：
+
+    with MockFanfou(latency_ms=20) as server:
+        os.environ['FANFOU_API_BASE'] = server.url
+"""
+
+import argparse
+import hashlib
+import json
+import random
+import re
+import threading
+import time
+import urllib.parse
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Any, Dict, List, Optional, Tuple
+
+CURRENT_USER_ID = 'mock_user'
+
+# 最小的 JPEG 文件头，图片内容其余部分用随机字节补齐（与真实 JPEG 数据一样几乎无法再压缩）
+_JPEG_HEAD = b'\xff\xd8\xff\xe0\x00\x10JFIF\x00\x01\x01\x00\x00\x01\x00\x01\x00\x00'
+
+# 生成内容文字使用的常用字
+_TEXT_CHARS = ('的一是不了人我在有他这中大来上个国到说们为子和你地出道也时年得就那要下以生会自着去之过家学对可她里后小么'
+               '心多天而能好都然没日于起还发成事只作当想看文无开手十用主行方又如前所本见经头面公同三已老从动两长'
+               '，。！？、 ')
+
+_STATUS_PATH = re.compile(r'^/statuses/show/([^/]+)\.json$')
+_FAVORITE_PATH = re.compile(r'^/favorites/(create|destroy)/([^/]+)\.json$')
+_FRIENDSHIP_PATH = re.compile(r'^/friendships/(create|destroy)\.json$')
+_PHOTO_PATH = re.compile(r'^/photos/file/([^/]+)\.jpg$')
+
+# 以此开头的内容 ID 和用户 ID 视为不存在
+MISSING_PREFIX = 'missing_'
+
+
+class MockConfig:
+    """模拟服务的行为配置"""
+
+    def __init__(self, latency_ms: float = 0.0, jitter_ms: float = 0.0, text_length: int = 140,
+                 photo_ratio: float = 0.0, photo_kb: int = 100, error_rate: float = 0.0,
+                 error_status: int = 500, seed: Optional[int] = None, etag: bool = False):
+        self.latency_ms = latency_ms
+        self.jitter_ms = jitter_ms
+        self.text_length = text_length
+        self.photo_ratio = photo_ratio
+        self.photo_kb = photo_kb
+        self.error_rate = error_rate
+        self.error_status = error_status
+        self.etag = etag
+        self._random = random.Random(seed)
+        self._lock = threading.Lock()
+
+    def random(self) -> float:
+        with self._lock:
+            return self._random.random()
+
+
+class _Handler(BaseHTTPRequestHandler):
+    server: '_Server'
+    protocol_version = 'HTTP/1.1'
+
+    def log_message(self, format: str, *args: Any) -> None:
+        pass
+
+    # ---- 响应构造 ----
+
+    def _user(self, user_id: str) -> Dict[str, Any]:
+        return {
+            'id': user_id,
+            'name': f'用户{user_id}',
+            'screen_name': f'用户{user_id}',
+            'location': '北京',
+            'gender': '',
+            'birthday': '',
+            'description': '模拟用户',
+            'profile_image_url': '',
+            'profile_image_url_large': '',
+            'url': '',
+            'protected': False,
+            'followers_count': 100,
+            'friends_count': 100,
+            'favourites_count': 10,
+            'statuses_count': 1000,
+            'photo_count': 10,
+            'following': False,
+            'created_at': 'Sat Jun 09 23:56:33 +0000 2007',
+        }
+
+    def _status(self, status_id: str, user_id: str = CURRENT_USER_ID) -> Dict[str, Any]:
+        config = self.server.config
+        # 按内容 ID 生成固定的随机文字，避免重复文本让压缩等测量结果失真
+        text = ''.join(random.Random(status_id).choices(_TEXT_CHARS, k=config.text_length))
+        status = {
+            'id': status_id,
+            'rawid': abs(hash(status_id)) % 10 ** 9,
+            'text': text,
+            'created_at': 'Sat Jun 09 23:56:33 +0000 2007',
+            'source': '网页',
+            'favorited': False,
+            'is_self': user_id == CURRENT_USER_ID,
+            'location': '北京',
+            'in_reply_to_status_id': '',
+            'in_reply_to_user_id': '',
+            'in_reply_to_screen_name': '',
+            'user': self._user(user_id),
+        }
+        if config.photo_ratio and config.random() < config.photo_ratio:
+            photo_url = f'{self.server.url}/photos/file/{status_id}.jpg'
+            status['photo'] = {'imageurl': photo_url, 'thumburl': photo_url, 'largeurl': photo_url}
+        return status
+
+    def _timeline(self, query: Dict[str, str]) -> List[Dict[str, Any]]:
+        count = max(1, min(int(query.get('count', '20') or 20), 60))
+        user_id = query.get('id', CURRENT_USER_ID) or CURRENT_USER_ID
+        return [self._status(f'status_{user_id}_{index}', user_id) for index in range(count)]
+
+    def _route(self, method: str, path: str, query: Dict[str, str], form: Dict[str, str]) -> Tuple[int, Any]:
+        """返回 (状态码, JSON 响应)"""
+        if method == 'GET':
+            if path in ('/statuses/home_timeline.json', '/statuses/public_timeline.json',
+                        '/statuses/user_timeline.json', '/search/public_timeline.json',
+                        '/search/user_timeline.json'):
+                return 200, self._timeline(query)
+            if path == '/users/show.json':
+                user_id = query.get('id') or CURRENT_USER_ID
+                if user_id.startswith(MISSING_PREFIX):
+                    return 404, {'request': path, 'error': '该用户不存在'}
+                return 200, self._user(user_id)
+            match = _STATUS_PATH.match(path)
+            if match:
+                if match.group(1).startswith(MISSING_PREFIX):
+                    return 404, {'request': path, 'error': '没有这条消息'}
+                return 200, self._status(match.group(1))
+        elif method == 'POST':
+            if path == '/account/verify_credentials.json':
+                return 200, self._user(CURRENT_USER_ID)
+            match = _FAVORITE_PATH.match(path)
+            if match:
+                status = self._status(match.group(2))
+                status['favorited'] = match.group(1) == 'create'
+                return 200, status
+            match = _FRIENDSHIP_PATH.match(path)
+            if match:
+                user = self._user(form.get('id', ''))
+                user['following'] = match.group(1) == 'create'
+                return 200, user
+            if path in ('/statuses/update.json', '/photos/upload.json'):
+                status = self._status(f'status_new_{int(time.time() * 1000)}')
+                status['text'] = form.get('status', status['text'])
+                return 200, status
+            if path == '/statuses/destroy.json':
+                return 200, self._status(form.get('id', ''))
+        return 404, {'request': path, 'error': '不存在的接口'}
+
+    # ---- HTTP 处理 ----
+
+    def _send(self, status: int, body: bytes, content_type: str, headers: Optional[Dict[str, str]] = None) -> None:
+        self.send_response(status)
+        self.send_header('Content-Type', content_type)
+        self.send_header('Content-Length', str(len(body)))
+        for name, value in (headers or {}).items():
+            self.send_header(name, value)
+        self.end_headers()
+        if self.command != 'HEAD':
+            self.wfile.write(body)
+
+    def _handle(self) -> None:
+        config = self.server.config
+        parsed = urllib.parse.urlparse(self.path)
+        query = dict(urllib.parse.parse_qsl(parsed.query))
+
+        # 读取完整的请求体，保持连接可以复用
+        length = int(self.headers.get('Content-Length') or 0)
+        body = self.rfile.read(length) if length else b''
+        form: Dict[str, str] = {}
+        if self.headers.get('Content-Type', '').startswith('application/x-www-form-urlencoded'):
+            form = dict(urllib.parse.parse_qsl(body.decode('utf-8', 'replace')))
+
+        delay = config.latency_ms + config.jitter_ms * config.random()
+        if delay > 0:
+            time.sleep(delay / 1000)
+
+        # 图片文件，供 get_status_info 等转换 base64 时下载
+        match = _PHOTO_PATH.match(parsed.path)
+        if match and self.command in ('GET', 'HEAD'):
+            self._send(200, self.server.photo(config.photo_kb * 1024), 'image/jpeg')
+            return
+
+        if config.error_rate and config.random() < config.error_rate:
+            status, data = config.error_status, {'request': parsed.path, 'error': '模拟的服务端错误'}
+        else:
+            status, data = self._route(self.command, parsed.path, query, form)
+        content = json.dumps(data, ensure_ascii=False).encode('utf-8')
+        if config.etag and status == 200 and self.command == 'GET':
+            etag = '"%s"' % hashlib.sha1(content).hexdigest()[:16]
+            if self.headers.get('If-None-Match') == etag:
+                status, content = 304, b''
+            self.server.record(parsed.path, status)
+            self._send(status, content, 'application/json; charset=utf-8', {'ETag': etag})
+            return
+        self.server.record(parsed.path, status)
+        self._send(status, content, 'application/json; charset=utf-8')
+
+    do_GET = _handle
+    do_POST = _handle
+    do_HEAD = _handle
+
+
+class _Server(ThreadingHTTPServer):
+    daemon_threads = True
+    # 基准测试的并发连接数可能超过默认的 backlog
+    request_queue_size = 128
+
+    def __init__(self, address: Tuple[str, int], config: MockConfig):
+        super().__init__(address, _Handler)
+        self.config = config
+        self.url = f'http://{self.server_address[0]}:{self.server_address[1]}'
+        self.requests: Dict[Tuple[str, int], int] = {}
+        self._requests_lock = threading.Lock()
+        self._photos: Dict[int, bytes] = {}
+
+    def photo(self, size: int) -> bytes:
+        """指定大小的图片内容，同一大小只生成一次"""
+        data = self._photos.get(size)
+        if data is None:
+            data = _JPEG_HEAD + random.Random(size).randbytes(max(0, size - len(_JPEG_HEAD)))
+            self._photos[size] = data
+        return data
+
+    def record(self, path: str, status: int) -> None:
+        with self._requests_lock:
+            self.requests[(path, status)] = self.requests.get((path, status), 0) + 1
+
+
+class MockFanfou:
+    """在后台线程中运行的模拟服务，url 属性为 FANFOU_API_BASE 应设置的地址"""
+
+    def __init__(self, host: str = '127.0.0.1', port: int = 0, **config: Any):
+        self.config = MockConfig(**config)
+        self._server = _Server((host, port), self.config)
+        self._thread: Optional[threading.Thread] = None
+
+    @property
+    def url(self) -> str:
+        return self._server.url
+
+    @property
+    def requests(self) -> Dict[Tuple[str, int], int]:
+        """各接口按状态码统计的请求数"""
+        return dict(self._server.requests)
+
+    def serve_forever(self) -> None:
+        """在当前线程中运行，直到 Ctrl+C"""
+        try:
+            self._server.serve_forever()
+        except KeyboardInterrupt:
+            pass
+        finally:
+            self._server.server_close()
+
+    def start(self) -> 'MockFanfou':
+        self._thread = threading.Thread(target=self._server.serve_forever, name='mock-fanfou', daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self) -> None:
+        self._server.shutdown()
+        self._server.server_close()
+
+    def __enter__(self) -> 'MockFanfou':
+        return self.start()
+
+    def __exit__(self, *exc_info) -> None:
+        self.stop()
+
+
+def add_config_arguments(parser: argparse.ArgumentParser) -> None:
+    """添加模拟服务行为相关的命令行参数（基准测试脚本共用）"""
+    parser.add_argument('--latency-ms', type=float, default=0.0, help='每个请求的固定延迟（毫秒），默认 0')
+    parser.add_argument('--jitter-ms', type=float, default=0.0, help='在固定延迟上增加的随机延迟上限（毫秒），默认 0')
+    parser.add_argument('--text-length', type=int, default=140, help='每条内容的文字长度，默认 140')
+    parser.add_argument('--photo-ratio', type=float, default=0.0, help='带图片的内容比例（0~1），默认 0')
+    parser.add_argument('--photo-kb', type=int, default=100, help='图片大小（KB），默认 100')
+    parser.add_argument('--error-rate', type=float, default=0.0, help='返回错误响应的比例（0~1），默认 0')
+    parser.add_argument('--error-status', type=int, default=500, help='错误响应的状态码，默认 500')
+    parser.add_argument('--seed', type=int, default=None, help='随机数种子')
+    parser.add_argument('--etag', action='store_true', help='GET 响应返回 ETag，If-None-Match 匹配时返回 304')
+
+
+def config_from_args(args: argparse.Namespace) -> Dict[str, Any]:
+    return {
+        'latency_ms': args.latency_ms,
+        'jitter_ms': args.jitter_ms,
+        'text_length': args.text_length,
+        'photo_ratio': args.photo_ratio,
+        'photo_kb': args.photo_kb,
+        'error_rate': args.error_rate,
+        'error_status': args.error_status,
+        'seed': args.seed,
+        'etag': args.etag,
+    }
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description='饭否 API 模拟服务')
+    parser.add_argument('--host', default='127.0.0.1', help='监听地址，默认 127.0.0.1')
+    parser.add_argument('--port', type=int, default=8765, help='监听端口，默认 8765')
+    add_config_arguments(parser)
+    args = parser.parse_args()
+
+    server = MockFanfou(args.host, args.port, **config_from_args(args))
+    print(f"饭否 API 模拟服务已启动: {server.url}")
+    print(f"使用 FANFOU_API_BASE={server.url} 让客户端连接到模拟服务")
+    server.serve_forever()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,117 @@
+#!/usr/bin/env python3
+"""
+OAuth 签名基准
+
+比较两种签名方式每秒可以完成的签名次数：
+- oauth2：oauth2.Request.from_consumer_and_token + SignatureMethod_HMAC_SHA1（原来的签名方式）
+- signer：fanfou_client.OAuthSigner（按凭据缓存 HMAC 对象，直接拼接签名基础字符串）
+
+每种请求形态（GET 查询、表单 POST、带请求体摘要的 POST）分别测量；测量前先用相同的 oauth_* 参数
+校验两种方式的签名一致，不一致时以非零状态码退出。
+
+用法：
+    python benchmarks/oauth_signing.py [--iterations 20000] [--repeat 5]
+"""
+
+import argparse
+import os
+import statistics
+import sys
+import time
+import urllib.parse
+from typing import Callable, List, Tuple
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+import oauth2  # noqa: E402
+
+from fanfou_client import OAuthSigner  # noqa: E402
+
+CONSUMER_KEY, CONSUMER_SECRET = 'benchmark_consumer_key', 'benchmark_consumer_secret'
+TOKEN_KEY, TOKEN_SECRET = 'benchmark_token_key', 'benchmark_token_secret'
+
+FORM = 'application/x-www-form-urlencoded'
+
+# (名称, 方法, URL, 请求体, Content-Type)
+CASES: List[Tuple[str, str, str, str, str]] = [
+    ('GET 时间线', 'GET', 'http://api.fanfou.com/statuses/home_timeline.json?count=20&format=html', '', ''),
+    ('GET 搜索', 'GET', 'http://api.fanfou.com/search/public_timeline.json?q=%E9%A5%AD%E5%90%A6&count=20', '', ''),
+    ('POST 表单', 'POST', 'http://api.fanfou.com/statuses/update.json',
+     urllib.parse.urlencode({'status': '饭否签名基准测试 ' * 8, 'in_reply_to_status_id': 'abc'}), FORM),
+    ('POST 请求体', 'POST', 'http://api.fanfou.com/photos/upload.json', 'x' * 1024, 'application/octet-stream'),
+]
+
+
+def oauth2_sign(consumer: oauth2.Consumer, token: oauth2.Token, method: str, url: str, body: str,
+                content_type: str) -> oauth2.Request:
+    """与 oauth2.Client.request 相同的签名过程"""
+    is_form_encoded = content_type == FORM
+    parameters = urllib.parse.parse_qs(body) if is_form_encoded and body else None
+    request = oauth2.Request.from_consumer_and_token(
+        consumer, token=token, http_method=method, http_url=url,
+        parameters=parameters, body=body.encode('utf-8'), is_form_encoded=is_form_encoded
+    )
+    request.sign_request(oauth2.SignatureMethod_HMAC_SHA1(), consumer, token)
+    if is_form_encoded:
+        request.to_postdata()
+    elif method == 'GET':
+        request.to_url()
+    else:
+        request.to_header(realm='http://api.fanfou.com')
+    return request
+
+
+def check_signature(signer: OAuthSigner, consumer: oauth2.Consumer, token: oauth2.Token,
+                    method: str, url: str, body: str, content_type: str) -> bool:
+    """用 oauth2 生成的 oauth_* 参数（含随机数和时间戳）重新计算签名，检查结果一致"""
+    request = oauth2_sign(consumer, token, method, url, body, content_type)
+    params = []
+    for key, value in request.items():
+        if key == 'oauth_signature':
+            continue
+        for item in (value if isinstance(value, list) else [value]):
+            params.append((key, item.decode('utf-8') if isinstance(item, bytes) else item))
+    return signer.signature(method, url, params) == request['oauth_signature'].decode('ascii')
+
+
+def measure(fn: Callable[[], object], iterations: int, repeat: int) -> float:
+    """返回每秒签名次数（多轮取中位数）"""
+    rates = []
+    for _ in range(repeat):
+        started_at = time.perf_counter()
+        for _ in range(iterations):
+            fn()
+        rates.append(iterations / (time.perf_counter() - started_at))
+    return statistics.median(rates)
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description='比较 oauth2 和 OAuthSigner 的签名速度')
+    parser.add_argument('--iterations', type=int, default=20000, help='每轮签名次数，默认 20000')
+    parser.add_argument('--repeat', type=int, default=5, help='每种方式的测量轮数（取中位数），默认 5')
+    args = parser.parse_args()
+
+    consumer = oauth2.Consumer(CONSUMER_KEY, CONSUMER_SECRET)
+    token = oauth2.Token(TOKEN_KEY, TOKEN_SECRET)
+    signer = OAuthSigner(CONSUMER_KEY, CONSUMER_SECRET, TOKEN_KEY, TOKEN_SECRET)
+
+    failures = [name for name, method, url, body, content_type in CASES
+                if not check_signature(signer, consumer, token, method, url, body, content_type)]
+    if failures:
+        print(f"❌ 签名与 oauth2 不一致: {', '.join(failures)}")
+        return 1
+    print("✅ 签名与 oauth2 一致")
+
+    print(f"{'请求':<12}{'oauth2(次/秒)':>16}{'signer(次/秒)':>16}{'加速':>8}")
+    for name, method, url, body, content_type in CASES:
+        headers = {'Content-Type': content_type} if content_type else None
+        baseline = measure(lambda: oauth2_sign(consumer, token, method, url, body, content_type),
+                           args.iterations, args.repeat)
+        optimized = measure(lambda: signer.sign(url, method, body, headers), args.iterations, args.repeat)
+        print(f"{name:<12}{baseline:>16.0f}{optimized:>16.0f}{optimized / baseline:>7.1f}x")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
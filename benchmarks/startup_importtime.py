@@ -0,0 +1,135 @@
+#!/usr/bin/env python3
+"""
+启动耗时基准
+
+使用 `python -X importtime` 测量导入 main 模块的耗时，并检查预算：
+- 启动阶段不能导入只在首次使用时才需要的重量级模块（requests、oauth2、httplib2、gradio）
+- 本项目代码的导入耗时（多次运行取中位数）不能超过预算：累计耗时中扣除 fastmcp/mcp 及其依赖的部分，
+  它们占总耗时的绝大部分且随机器负载波动，不受本项目控制，计入预算只会让检查频繁误报
+
+用法：
+    python benchmarks/startup_importtime.py [--module main] [--runs 5] [--budget-ms 200]
+
+超出预算时以非零状态码退出，可直接用于 CI。
+"""
+
+import argparse
+import os
+import statistics
+import subprocess
+import sys
+from typing import Dict, List, Tuple
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# 启动阶段不应该被导入的模块
+DEFERRED_MODULES = ['requests', 'oauth2', 'httplib2', 'gradio', 'PIL']
+
+# 不计入预算的第三方框架（包括它们导入的依赖）
+EXCLUDED_PACKAGES = {'fastmcp', 'mcp'}
+
+# 本项目代码目前约 40 ms，预算留出约 5 倍余量吸收机器间的差异
+DEFAULT_BUDGET_MS = float(os.getenv('FANFOU_IMPORT_BUDGET_MS', '200'))
+
+
+def measure_once(module: str) -> Tuple[float, float, Dict[str, float]]:
+    """
+    运行一次 `python -X importtime -c "import <module>"`
+
+    返回目标模块的累计导入耗时、扣除 EXCLUDED_PACKAGES 子树后的导入耗时（毫秒）以及每个模块的累计耗时
+    """
+    result = subprocess.run(
+        [sys.executable, '-X', 'importtime', '-W', 'ignore', '-c', f'import {module}'],
+        cwd=ROOT, capture_output=True, text=True
+    )
+    if result.returncode != 0:
+        raise RuntimeError(f"导入 {module} 失败:\n{result.stderr}")
+
+    total_ms = 0.0
+    modules: Dict[str, float] = {}
+    # (缩进层级, 自身耗时, 模块名)，按输出顺序（子模块在前，父模块在后）
+    entries: List[Tuple[int, float, str]] = []
+    for line in result.stderr.splitlines():
+        if not line.startswith('import time:') or 'cumulative' in line:
+            continue
+        self_us, cumulative, raw_name = line[len('import time:'):].split('|')
+        name = raw_name.strip()
+        cumulative_ms = int(cumulative) / 1000
+        modules[name] = cumulative_ms
+        entries.append(((len(raw_name) - len(raw_name.lstrip()) - 1) // 2, int(self_us) / 1000, name))
+        if name == module:
+            total_ms = cumulative_ms
+    return total_ms, _own_time(entries, module), modules
+
+
+def _own_time(entries: List[Tuple[int, float, str]], module: str) -> float:
+    """
+    累加目标模块子树中不属于 EXCLUDED_PACKAGES 子树的模块的自身耗时
+
+    倒序遍历时父模块出现在子模块之前，遇到被排除的模块后跳过所有更深层级的模块
+    """
+    own_ms = 0.0
+    inside = False
+    excluded_depth = None
+    for depth, self_ms, name in reversed(entries):
+        if not inside:
+            inside = depth == 0 and name == module
+            if not inside:
+                continue
+        elif depth == 0:
+            break
+        if excluded_depth is not None:
+            if depth > excluded_depth:
+                continue
+            excluded_depth = None
+        if name.split('.')[0] in EXCLUDED_PACKAGES:
+            excluded_depth = depth
+            continue
+        own_ms += self_ms
+    return own_ms
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description='测量 MCP 服务器的启动导入耗时')
+    parser.add_argument('--module', default='main', help='要测量的模块，默认 main')
+    parser.add_argument('--runs', type=int, default=5, help='运行次数，默认 5')
+    parser.add_argument('--budget-ms', type=float, default=DEFAULT_BUDGET_MS,
+                        help='本项目代码的导入耗时预算（毫秒，不含 fastmcp/mcp），默认读取 FANFOU_IMPORT_BUDGET_MS 或 200')
+    parser.add_argument('--top', type=int, default=10, help="输出耗时最多的模块数量")
+    args = parser.parse_args()
+
+    # 第一次运行用于预热 .pyc 缓存，不计入结果
+    measure_once(args.module)
+
+    totals: List[float] = []
+    owns: List[float] = []
+    modules: Dict[str, float] = {}
+    for _ in range(args.runs):
+        total_ms, own_ms, modules = measure_once(args.module)
+        totals.append(total_ms)
+        owns.append(own_ms)
+
+    median_ms = statistics.median(owns)
+    print(f"import {args.module}: 中位数 {statistics.median(totals):.1f} ms（{args.runs} 次，最小 {min(totals):.1f} ms，最大 {max(totals):.1f} ms）")
+    print(f"不含 {'/'.join(sorted(EXCLUDED_PACKAGES))}: 中位数 {median_ms:.1f} ms（最小 {min(owns):.1f} ms，最大 {max(owns):.1f} ms）")
+
+    print("耗时最多的模块（最后一次运行，累计耗时）：")
+    for name, cumulative_ms in sorted(modules.items(), key=lambda item: item[1], reverse=True)[1:args.top + 1]:
+        print(f"  {cumulative_ms:8.1f} ms  {name}")
+
+    failures = []
+    loaded = [name for name in DEFERRED_MODULES if name in modules]
+    if loaded:
+        failures.append(f"启动阶段导入了应延迟加载的模块: {', '.join(loaded)}")
+    if median_ms > args.budget_ms:
+        failures.append(f"导入耗时 {median_ms:.1f} ms 超出预算 {args.budget_ms:.1f} ms")
+
+    for failure in failures:
+        print(f"❌ {failure}")
+    if not failures:
+        print(f"✅ 在预算 {args.budget_ms:.1f} ms 以内")
+    return 1 if failures else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,298 @@
+#!/usr/bin/env python3
+"""
+工具吞吐量基准
+
+启动本地的饭否 API 模拟服务（benchmarks/mock_fanfou.py），在不同并发数下调用 main.py 的 MCP 工具
+和 app.py 的 Gradio 处理函数，输出每个工具的吞吐量和 p50/p99 延迟：
+- main：通过 FastMCP 内存传输调用工具，经过与真实 MCP 会话相同的参数校验和中间件
+- http：在子进程中以 --transport http 启动 main.py，通过 streamable HTTP 调用工具，同步工具在工作线程中执行
+- app：通过 tool_pool 包装后的处理函数调用，与 Gradio MCP 调用的线程池分组一致
+
+用法：
+    python benchmarks/tool_throughput.py [--target main|http|app|all] [--concurrency 1,4,16] [--requests 50]
+                                         [--tools get_user_info,publish_status] [--latency-ms 20] [--json result.json]
+
+模拟服务在单独的进程中运行，不与被测代码争用 GIL。写操作和单个账号的限流（FANFOU_WRITE_RATE、FANFOU_TENANT_RATE）默认放开，
+可通过环境变量覆盖；其余 FANFOU_* 配置（缓存、连接池等）按正常方式读取，便于对比优化前后的结果。
+"""
+
+import argparse
+import asyncio
+import base64
+import json
+import os
+import socket
+import statistics
+import subprocess
+import sys
+import time
+from typing import Any, Callable, Dict, List, Tuple
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from mock_fanfou import add_config_arguments, config_from_args  # noqa: E402
+
+# 上传图片使用的最小 JPEG（data URL）
+_PHOTO_DATA_URL = 'data:image/jpeg;base64,' + base64.b64encode(
+    b'\xff\xd8\xff\xe0\x00\x10JFIF\x00\x01\x01\x00\x00\x01\x00\x01\x00\x00' + b'\0' * 4096
+).decode('ascii')
+
+_STATUS_IDS = [f'status_bench_{index}' for index in range(5)]
+_USER_IDS = [f'user_bench_{index}' for index in range(5)]
+
+# (名称, 工具名, main.py 参数, app.py 线程池分组, app.py 参数)，app.py 的处理函数与 main.py 的工具同名
+SCENARIOS: List[Tuple[str, str, Dict[str, Any], str, Dict[str, Any]]] = [
+    ('get_user_timeline', 'get_user_timeline', {'count': 20}, 'read', {'count': 20}),
+    ('get_home_timeline', 'get_home_timeline', {'count': 20}, 'read', {'count': 20}),
+    ('get_public_timeline', 'get_public_timeline', {'count': 20}, 'read', {'count': 20}),
+    ('search_public_timeline', 'get_public_timeline', {'count': 20, 'q': '饭否'}, 'read', {'count': 20, 'q': '饭否'}),
+    ('get_user_info', 'get_user_info', {'user_id': 'user_bench'}, 'read', {'user_id': 'user_bench'}),
+    ('get_status_info', 'get_status_info', {'status_id': 'status_bench'}, 'read', {'status_id': 'status_bench'}),
+    ('manage_favorite', 'manage_favorite', {'status_id': 'status_bench', 'action': 'create', 'confirm': True},
+     'write', {'status_id': 'status_bench', 'action': 'create', 'confirm': True}),
+    ('manage_friendship', 'manage_friendship', {'user_id': 'user_bench', 'action': 'create', 'confirm': True},
+     'write', {'user_id': 'user_bench', 'action': 'create', 'confirm': True}),
+    ('manage_favorites_bulk', 'manage_favorites_bulk', {'status_ids': _STATUS_IDS, 'action': 'create', 'confirm': True},
+     'write', {'status_ids': ','.join(_STATUS_IDS), 'action': 'create', 'confirm': True}),
+    ('manage_friendships_bulk', 'manage_friendships_bulk', {'user_ids': _USER_IDS, 'action': 'create', 'confirm': True},
+     'write', {'user_ids': ','.join(_USER_IDS), 'action': 'create', 'confirm': True}),
+    ('publish_status', 'publish_status', {'status': '基准测试', 'confirm': True},
+     'write', {'status': '基准测试', 'confirm': True}),
+    ('publish_photo', 'publish_photo', {'status': '基准测试', 'photo_url': _PHOTO_DATA_URL, 'confirm': True},
+     'photo', {'status': '基准测试', 'photo_url': _PHOTO_DATA_URL, 'confirm': True}),
+    ('delete_status', 'delete_status', {'status_id': 'status_bench', 'confirm': True},
+     'write', {'status_id': 'status_bench', 'confirm': True}),
+]
+
+_CREDENTIALS = {
+    'FANFOU_API_KEY': 'bench_key',
+    'FANFOU_API_SECRET': 'bench_secret',
+    'FANFOU_OAUTH_TOKEN': 'bench_token',
+    'FANFOU_OAUTH_TOKEN_SECRET': 'bench_token_secret',
+}
+
+
+class _Request:
+    """模拟 gr.Request，只提供处理函数读取的认证 Header"""
+
+    def __init__(self):
+        self.headers = {
+            'X-Fanfou-Api-Key': _CREDENTIALS['FANFOU_API_KEY'],
+            'X-Fanfou-Api-Secret': _CREDENTIALS['FANFOU_API_SECRET'],
+            'X-Fanfou-OAuth-Token': _CREDENTIALS['FANFOU_OAUTH_TOKEN'],
+            'X-Fanfou-OAuth-Token-Secret': _CREDENTIALS['FANFOU_OAUTH_TOKEN_SECRET'],
+        }
+
+
+def _is_error(value: Any) -> bool:
+    """工具返回 {"error": ...}、[{"error": ...}] 或 JSON 文本形式的错误时视为失败"""
+    if isinstance(value, dict) and 'result' in value and len(value) == 1:
+        value = value['result']
+    if isinstance(value, list) and value:
+        value = value[0]
+    if isinstance(value, dict):
+        return bool(value.get('error'))
+    if isinstance(value, str):
+        return value.lstrip().startswith('{') and '"error"' in value[:200]
+    return False
+
+
+def _api_errors() -> int:
+    """饭否 API 返回非 2xx 状态码或请求异常的累计次数（工具可能把 API 错误格式化成正常结果）"""
+    import metrics
+    return int(sum(value for (_, _, status), value in metrics.api_requests.items() if not status.startswith('2')))
+
+
+def _percentile(values: List[float], percent: float) -> float:
+    ordered = sorted(values)
+    index = min(len(ordered) - 1, max(0, int(round(percent / 100 * len(ordered) + 0.5)) - 1))
+    return ordered[index]
+
+
+async def _run_level(call: Callable[[], Any], concurrency: int, requests: int) -> Dict[str, Any]:
+    """以 concurrency 个并发调用共执行 requests 次，返回吞吐量和延迟统计"""
+    latencies: List[float] = []
+    errors = 0
+    remaining = requests
+
+    async def worker():
+        nonlocal remaining, errors
+        while remaining > 0:
+            remaining -= 1
+            started_at = time.perf_counter()
+            try:
+                failed = _is_error(await call())
+            except Exception:
+                failed = True
+            latencies.append(time.perf_counter() - started_at)
+            errors += failed
+
+    api_errors = _api_errors()
+    started_at = time.perf_counter()
+    await asyncio.gather(*(worker() for _ in range(concurrency)))
+    elapsed = time.perf_counter() - started_at
+    return {
+        'concurrency': concurrency,
+        'requests': len(latencies),
+        'errors': errors,
+        'api_errors': _api_errors() - api_errors,
+        'throughput': len(latencies) / elapsed if elapsed > 0 else 0.0,
+        'p50_ms': statistics.median(latencies) * 1000,
+        'p99_ms': _percentile(latencies, 99) * 1000,
+    }
+
+
+async def _bench_main(scenarios, levels: List[int], requests: int, warmup: int,
+                      target: str = 'main', server: Any = None) -> List[Dict[str, Any]]:
+    from fastmcp import Client
+
+    if server is None:
+        import main
+        server = main.mcp
+
+    results = []
+    async with Client(server) as client:
+        for name, tool, arguments, _, _ in scenarios:
+            async def call(tool=tool, arguments=arguments):
+                result = await client.call_tool(tool, arguments, raise_on_error=False)
+                return {'error': 'tool error'} if result.is_error else result.structured_content
+
+            for _ in range(warmup):
+                await call()
+            for concurrency in levels:
+                results.append({'target': target, 'tool': name, **await _run_level(call, concurrency, requests)})
+                _print_row(results[-1])
+    return results
+
+
+async def _bench_app(scenarios, levels: List[int], requests: int, warmup: int) -> List[Dict[str, Any]]:
+    import app
+
+    results = []
+    for name, tool, _, group, arguments in scenarios:
+        wrapped = app.tool_pool.wrap(getattr(app, tool), group)
+
+        async def call(wrapped=wrapped, arguments=arguments):
+            return await wrapped(**arguments, request=_Request())
+
+        for _ in range(warmup):
+            await call()
+        for concurrency in levels:
+            results.append({'target': 'app', 'tool': name, **await _run_level(call, concurrency, requests)})
+            _print_row(results[-1])
+    return results
+
+
+def _print_header() -> None:
+    print(f"{'目标':<6}{'工具':<26}{'并发':>6}{'请求':>8}{'错误':>6}{'API错误':>9}{'吞吐(次/秒)':>14}{'p50(ms)':>10}{'p99(ms)':>10}")
+
+
+def _print_row(row: Dict[str, Any]) -> None:
+    print(f"{row['target']:<6}{row['tool']:<26}{row['concurrency']:>6}{row['requests']:>8}{row['errors']:>6}{row['api_errors']:>9}"
+          f"{row['throughput']:>14.1f}{row['p50_ms']:>10.1f}{row['p99_ms']:>10.1f}", flush=True)
+
+
+def _free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(('127.0.0.1', 0))
+        return sock.getsockname()[1]
+
+
+def _start_mock(args: argparse.Namespace) -> Tuple[subprocess.Popen, str]:
+    """在子进程中启动模拟服务，返回 (进程, 地址)"""
+    port = _free_port()
+    command = [sys.executable, os.path.join(os.path.dirname(os.path.abspath(__file__)), 'mock_fanfou.py'),
+               '--port', str(port)]
+    for key, value in config_from_args(args).items():
+        option = f"--{key.replace('_', '-')}"
+        # 开关参数（store_true）只在开启时传递
+        if isinstance(value, bool):
+            if value:
+                command.append(option)
+        elif value is not None:
+            command += [option, str(value)]
+    process = subprocess.Popen(command, stdout=subprocess.PIPE, text=True)
+    # 第一行输出表示已经开始监听；没有输出（进程已退出）时说明启动失败，错误信息见模拟服务的 stderr
+    if not process.stdout.readline() or process.poll() is not None:
+        process.kill()
+        process.wait()
+        raise SystemExit(f"❌ 模拟服务启动失败（退出码 {process.returncode}）")
+    return process, f'http://127.0.0.1:{port}'
+
+
+def _start_http_server(threads: int) -> Tuple[subprocess.Popen, str]:
+    """在子进程中以 streamable HTTP 方式启动 main.py（使用当前的环境变量），返回 (进程, MCP 地址)"""
+    port = _free_port()
+    command = [sys.executable, os.path.join(ROOT, 'main.py'), '--transport', 'http', '--port', str(port),
+               '--concurrency', str(threads)]
+    process = subprocess.Popen(command)
+    deadline = time.time() + 30
+    while time.time() < deadline:
+        if process.poll() is not None:
+            raise SystemExit(f"❌ HTTP 服务启动失败（退出码 {process.returncode}）")
+        try:
+            with socket.create_connection(('127.0.0.1', port), timeout=0.5):
+                return process, f'http://127.0.0.1:{port}/mcp/'
+        except OSError:
+            time.sleep(0.1)
+    process.kill()
+    process.wait()
+    raise SystemExit("❌ HTTP 服务启动超时")
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description='测量 MCP 工具在本地模拟服务上的吞吐量和延迟')
+    parser.add_argument('--target', choices=['main', 'http', 'app', 'all'], default='main', help='被测对象，默认 main')
+    parser.add_argument('--concurrency', default='1,4,16', help='并发数列表，默认 1,4,16')
+    parser.add_argument('--requests', type=int, default=50, help='每个并发数下的调用次数，默认 50')
+    parser.add_argument('--warmup', type=int, default=2, help='每个工具正式测量前的预热调用次数，默认 2')
+    parser.add_argument('--tools', default='', help='只测量指定的工具（逗号分隔），默认全部')
+    parser.add_argument('--json', default='', help='将结果写入 JSON 文件')
+    add_config_arguments(parser)
+    args = parser.parse_args()
+
+    levels = [int(level) for level in args.concurrency.split(',') if level.strip()]
+    selected = {name.strip() for name in args.tools.split(',') if name.strip()}
+    scenarios = [scenario for scenario in SCENARIOS if not selected or scenario[0] in selected]
+    if not scenarios:
+        parser.error(f"没有匹配的工具，可选: {', '.join(scenario[0] for scenario in SCENARIOS)}")
+
+    process, url = _start_mock(args)
+    try:
+        os.environ['FANFOU_API_BASE'] = url
+        os.environ.update(_CREDENTIALS)
+        os.environ.setdefault('FANFOU_WRITE_RATE', '1000000')
+        os.environ.setdefault('FANFOU_WRITE_BURST', '1000000')
+        os.environ.setdefault('FANFOU_TENANT_RATE', '0')
+        os.environ.setdefault('FANFOU_LOG_LEVEL', 'WARNING')
+
+        print(f"模拟服务: {url}（延迟 {args.latency_ms} ms，抖动 {args.jitter_ms} ms，错误率 {args.error_rate}）")
+        _print_header()
+        results: List[Dict[str, Any]] = []
+        if args.target in ('main', 'all'):
+            results += asyncio.run(_bench_main(scenarios, levels, args.requests, args.warmup))
+        if args.target in ('http', 'all'):
+            # 连接和工具线程数不成为瓶颈
+            server, server_url = _start_http_server(max(levels) * 2)
+            try:
+                results += asyncio.run(_bench_main(scenarios, levels, args.requests, args.warmup, 'http', server_url))
+            finally:
+                server.terminate()
+                server.wait()
+        if args.target in ('app', 'all'):
+            results += asyncio.run(_bench_app(scenarios, levels, args.requests, args.warmup))
+    finally:
+        process.terminate()
+        process.wait()
+
+    if args.json:
+        with open(args.json, 'w', encoding='utf-8') as f:
+            json.dump({'mock': config_from_args(args), 'results': results}, f, ensure_ascii=False, indent=2)
+        print(f"结果已写入 {args.json}")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
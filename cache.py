@@ -0,0 +1,385 @@
+#!/usr/bin/env python3
+"""
+缓存模块
+
+提供进程内共享的缓存实现，以及多个工作进程共享的磁盘缓存（DiskBytesCache）
+"""
+
+import json
+import os
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Callable, Dict, Hashable, Optional, Set, Tuple
+
+import log
+import metrics
+import tracing
+
+logger = log.get_logger('cache')
+
+
+class SWRCache:
+    """
+    stale-while-revalidate 缓存
+
+    - 数据年龄小于 soft_ttl：直接返回缓存
+    - 数据年龄介于 soft_ttl 与 hard_ttl 之间：立即返回旧数据，并在后台线程刷新
+    - 数据年龄超过 hard_ttl 或没有缓存：调用方阻塞等待加载
+    同一个 key 同一时间最多只有一个加载任务，避免并发请求同时打到 API。
+    clear() 会增加缓存的代数，清空前开始的加载（包括后台刷新）完成后不再写回，避免把旧数据重新放回缓存。
+    """
+
+    def __init__(self, name: str = 'swr'):
+        # 指标中的缓存名称
+        self.name = name
+        # key -> (value, 写入时间)
+        self._entries: Dict[Hashable, Tuple[Any, float]] = {}
+        self._lock = threading.Lock()
+        self._key_locks: Dict[Hashable, threading.Lock] = {}
+        self._refreshing: Set[Hashable] = set()
+        self._generation = 0
+
+    @property
+    def generation(self) -> int:
+        """缓存的代数，每次 clear() 加一；在缓存外加载数据时先读取，写入时传给 set"""
+        return self._generation
+
+    def get(self, key: Hashable, loader: Callable[[], Any], soft_ttl: float, hard_ttl: float,
+            should_cache: Optional[Callable[[Any], bool]] = None) -> Any:
+        """
+        读取缓存，必要时通过 loader 加载
+
+        should_cache 用于判断 loader 的返回值是否可以写入缓存（例如错误响应不缓存）
+        """
+        entry = self._entries.get(key)
+        if entry is not None:
+            value, stored_at = entry
+            age = time.monotonic() - stored_at
+            if age < soft_ttl:
+                metrics.cache_requests.inc(cache=self.name, result='hit')
+                tracing.annotate(f'cache.{self.name}', 'hit')
+                return value
+            if age < hard_ttl:
+                metrics.cache_requests.inc(cache=self.name, result='stale')
+                tracing.annotate(f'cache.{self.name}', 'stale')
+                self._refresh_in_background(key, loader, should_cache)
+                return value
+
+        metrics.cache_requests.inc(cache=self.name, result='miss')
+        tracing.annotate(f'cache.{self.name}', 'miss')
+        with self._key_lock(key):
+            # 等锁期间可能已经被其他线程加载过
+            entry = self._entries.get(key)
+            if entry is not None and time.monotonic() - entry[1] < soft_ttl:
+                return entry[0]
+            return self._load(key, loader, should_cache)
+
+    def set(self, key: Hashable, value: Any, generation: Optional[int] = None) -> None:
+        """
+        直接写入缓存（用于预取）
+
+        generation 为开始加载 value 时的代数，缓存在此之后被清空过时不写入
+        """
+        with self._lock:
+            if generation is not None and generation != self._generation:
+                return
+            self._entries[key] = (value, time.monotonic())
+
+    def age(self, key: Hashable) -> Optional[float]:
+        """返回缓存数据的年龄（秒），不存在时返回 None"""
+        entry = self._entries.get(key)
+        if entry is None:
+            return None
+        return time.monotonic() - entry[1]
+
+    def clear(self) -> None:
+        """清空缓存，正在进行的加载完成后不再写回"""
+        with self._lock:
+            self._entries.clear()
+            self._generation += 1
+
+    def _key_lock(self, key: Hashable) -> threading.Lock:
+        with self._lock:
+            lock = self._key_locks.get(key)
+            if lock is None:
+                lock = self._key_locks[key] = threading.Lock()
+            return lock
+
+    def _load(self, key: Hashable, loader: Callable[[], Any],
+              should_cache: Optional[Callable[[Any], bool]]) -> Any:
+        generation = self._generation
+        value = loader()
+        if should_cache is None or should_cache(value):
+            self.set(key, value, generation)
+        return value
+
+    def _refresh_in_background(self, key: Hashable, loader: Callable[[], Any],
+                               should_cache: Optional[Callable[[Any], bool]]) -> None:
+        with self._lock:
+            if key in self._refreshing:
+                return
+            self._refreshing.add(key)
+
+        def refresh():
+            try:
+                with self._key_lock(key):
+                    self._load(key, loader, should_cache)
+            except Exception as e:
+                # 刷新失败时保留旧数据，等待下一次刷新或硬过期
+                logger.warning("后台刷新缓存失败 %s: %s", key, e)
+            finally:
+                with self._lock:
+                    self._refreshing.discard(key)
+
+        threading.Thread(target=refresh, name=f"swr-refresh-{key}", daemon=True).start()
+
+
+class BytesLRUCache:
+    """
+    按总字节数限制容量的 LRU 缓存
+
+    适用于缓存图片等二进制数据，超过 max_bytes 时淘汰最久未使用的条目，超过 ttl 的条目视为不存在。
+    """
+
+    def __init__(self, max_bytes: int, ttl: float, name: str = 'bytes'):
+        self.name = name
+        self.max_bytes = max_bytes
+        self.ttl = ttl
+        # key -> (数据, 附加信息, 写入时间)，按使用顺序排列
+        self._entries: "OrderedDict[Hashable, Tuple[bytes, Any, float]]" = OrderedDict()
+        self._size = 0
+        self._lock = threading.Lock()
+
+    def get(self, key: Hashable) -> Optional[Tuple[bytes, Any]]:
+        """读取缓存，返回 (数据, 附加信息)，不存在或已过期时返回 None"""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and time.monotonic() - entry[2] >= self.ttl:
+                self._remove(key)
+                entry = None
+            if entry is None:
+                metrics.cache_requests.inc(cache=self.name, result='miss')
+                tracing.annotate(f'cache.{self.name}', 'miss')
+                return None
+            self._entries.move_to_end(key)
+        metrics.cache_requests.inc(cache=self.name, result='hit')
+        tracing.annotate(f'cache.{self.name}', 'hit')
+        return entry[0], entry[1]
+
+    def set(self, key: Hashable, data: bytes, info: Any = None) -> None:
+        """写入缓存，单个条目超过容量时不缓存"""
+        if len(data) > self.max_bytes:
+            return
+        with self._lock:
+            if key in self._entries:
+                self._remove(key)
+            self._entries[key] = (data, info, time.monotonic())
+            self._size += len(data)
+            while self._size > self.max_bytes:
+                self._remove(next(iter(self._entries)))
+
+    def _remove(self, key: Hashable) -> None:
+        data = self._entries.pop(key)[0]
+        self._size -= len(data)
+
+
+class ValidatedEntry:
+    """ValidatorCache 的条目：数据及其验证器"""
+
+    __slots__ = ('value', 'etag', 'last_modified', 'digest', 'validated_at')
+
+    def __init__(self, value: Any, etag: str, last_modified: str, digest: bytes):
+        self.value = value
+        self.etag = etag
+        self.last_modified = last_modified
+        self.digest = digest
+        self.validated_at = time.monotonic()
+
+    @property
+    def age(self) -> float:
+        """距上次从服务端获取或验证的秒数"""
+        return time.monotonic() - self.validated_at
+
+
+class ValidatorCache:
+    """
+    保存响应验证器（ETag / Last-Modified / 响应内容摘要）的 LRU 缓存
+
+    条目过期后不删除，调用方用其中的验证器发送条件请求；服务端返回 304 或内容摘要未变化时
+    调用 revalidate 刷新验证时间，继续使用缓存的数据。条目数超过 max_entries 时淘汰最久未使用的条目。
+    """
+
+    def __init__(self, max_entries: int, name: str = 'validator'):
+        self.name = name
+        self.max_entries = max_entries
+        self._entries: "OrderedDict[Hashable, ValidatedEntry]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key: Hashable) -> Optional[ValidatedEntry]:
+        """读取条目（包括已过期的），不存在时返回 None"""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                self._entries.move_to_end(key)
+            return entry
+
+    def set(self, key: Hashable, value: Any, etag: str = '', last_modified: str = '', digest: bytes = b'') -> None:
+        """写入条目"""
+        with self._lock:
+            self._entries.pop(key, None)
+            self._entries[key] = ValidatedEntry(value, etag, last_modified, digest)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    @staticmethod
+    def revalidate(entry: ValidatedEntry, etag: str = '', last_modified: str = '') -> None:
+        """数据未变化，刷新验证时间（服务端返回了新的验证器时一并更新）"""
+        if etag:
+            entry.etag = etag
+        if last_modified:
+            entry.last_modified = last_modified
+        entry.validated_at = time.monotonic()
+
+    def pop(self, key: Hashable) -> None:
+        """删除条目（数据已知发生变化时）"""
+        with self._lock:
+            self._entries.pop(key, None)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+
+
+class DiskBytesCache:
+    """
+    保存在本地 SQLite 文件中的字节缓存，接口与 BytesLRUCache 相同
+
+    多个工作进程可以打开同一个文件共享缓存（WAL 模式，读写互不阻塞）；
+    超过 max_bytes 时淘汰最久未使用的条目，超过 ttl 的条目视为不存在。写入时间使用墙上时间，各进程一致。
+    """
+
+    def __init__(self, path: str, max_bytes: int, ttl: float, name: str = 'disk'):
+        self.path = path
+        self.name = name
+        self.max_bytes = max_bytes
+        self.ttl = ttl
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self._conn = sqlite3.connect(path, check_same_thread=False, isolation_level=None, timeout=10)
+        self._lock = threading.Lock()
+        with self._lock:
+            self._conn.execute("PRAGMA journal_mode=WAL")
+            self._conn.execute(
+                "CREATE TABLE IF NOT EXISTS entries (key TEXT PRIMARY KEY, data BLOB NOT NULL, info TEXT,"
+                " size INTEGER NOT NULL, stored_at REAL NOT NULL, used_at REAL NOT NULL)"
+            )
+            self._conn.execute("CREATE INDEX IF NOT EXISTS entries_used_at ON entries (used_at)")
+
+    def get(self, key: Hashable) -> Optional[Tuple[bytes, Any]]:
+        """读取缓存，返回 (数据, 附加信息)，不存在或已过期时返回 None"""
+        now = time.time()
+        try:
+            with self._lock:
+                row = self._conn.execute(
+                    "SELECT data, info FROM entries WHERE key = ? AND stored_at > ?", (str(key), now - self.ttl)
+                ).fetchone()
+                if row is not None:
+                    self._conn.execute("UPDATE entries SET used_at = ? WHERE key = ?", (now, str(key)))
+        except sqlite3.Error as e:
+            # 磁盘缓存不可用时按未命中处理，不影响调用方
+            logger.warning("读取磁盘缓存失败 %s: %s", self.path, e)
+            row = None
+        if row is None:
+            metrics.cache_requests.inc(cache=self.name, result='miss')
+            tracing.annotate(f'cache.{self.name}', 'miss')
+            return None
+        metrics.cache_requests.inc(cache=self.name, result='hit')
+        tracing.annotate(f'cache.{self.name}', 'hit')
+        return bytes(row[0]), json.loads(row[1]) if row[1] is not None else None
+
+    def set(self, key: Hashable, data: bytes, info: Any = None) -> None:
+        """写入缓存，单个条目超过容量时不缓存"""
+        if len(data) > self.max_bytes:
+            return
+        now = time.time()
+        try:
+            with self._lock:
+                self._conn.execute("BEGIN IMMEDIATE")
+                try:
+                    self._conn.execute(
+                        "INSERT OR REPLACE INTO entries (key, data, info, size, stored_at, used_at)"
+                        " VALUES (?, ?, ?, ?, ?, ?)",
+                        (str(key), data, json.dumps(info) if info is not None else None, len(data), now, now)
+                    )
+                    self._conn.execute("DELETE FROM entries WHERE stored_at <= ?", (now - self.ttl,))
+                    self._evict()
+                    self._conn.execute("COMMIT")
+                except BaseException:
+                    self._conn.execute("ROLLBACK")
+                    raise
+        except sqlite3.Error as e:
+            logger.warning("写入磁盘缓存失败 %s: %s", self.path, e)
+
+    def _evict(self) -> None:
+        """按最近使用时间淘汰条目，直到总大小不超过 max_bytes，调用方持有 _lock 并已开启事务"""
+        total = self._conn.execute("SELECT COALESCE(SUM(size), 0) FROM entries").fetchone()[0]
+        if total <= self.max_bytes:
+            return
+        for key, size in self._conn.execute("SELECT key, size FROM entries ORDER BY used_at").fetchall():
+            self._conn.execute("DELETE FROM entries WHERE key = ?", (key,))
+            total -= size
+            if total <= self.max_bytes:
+                break
+
+
+class TTLCache:
+    """
+    带过期时间和容量上限的简单缓存
+
+    超过 ttl 的条目视为不存在；条目数超过 max_entries 时淘汰最早写入的条目。
+    """
+
+    def __init__(self, ttl: float, max_entries: int = 1024):
+        self.ttl = ttl
+        self.max_entries = max_entries
+        # key -> (value, 过期时间)，按写入顺序排列
+        self._entries: "OrderedDict[Hashable, Tuple[Any, float]]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key: Hashable) -> Optional[Any]:
+        """读取缓存，不存在或已过期时返回 None"""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            if time.monotonic() >= entry[1]:
+                del self._entries[key]
+                return None
+            return entry[0]
+
+    def pop(self, key: Hashable) -> Optional[Any]:
+        """读取并删除缓存，不存在或已过期时返回 None"""
+        with self._lock:
+            entry = self._entries.pop(key, None)
+        if entry is None or time.monotonic() >= entry[1]:
+            return None
+        return entry[0]
+
+    def set(self, key: Hashable, value: Any) -> None:
+        """写入缓存"""
+        now = time.monotonic()
+        with self._lock:
+            self._entries.pop(key, None)
+            self._entries[key] = (value, now + self.ttl)
+            # 条目按写入顺序排列，先清理已过期的，再按容量淘汰最早的
+            while self._entries:
+                oldest_key, (_, expires_at) = next(iter(self._entries.items()))
+                if expires_at > now and len(self._entries) <= self.max_entries:
+                    break
+                del self._entries[oldest_key]
+
+    def __len__(self) -> int:
+        return len(self._entries)
@@ -0,0 +1,139 @@
+#!/usr/bin/env python3
+"""
+请求录制/回放模块
+
+录制饭否 API 的请求和响应，之后不访问网络直接回放，用于排除网络波动、单独测量工具本身的开销
+（结果筛选、HTML 处理、序列化等）：
+- record: 正常发送请求，并将每个响应以一行 JSON 追加写入录制文件
+- replay: 不发送请求，从录制文件中查找响应立即返回，找不到时抛出异常
+
+请求按归一化的 URL 索引：忽略协议和主机（录制和回放可以使用不同的 FANFOU_API_BASE），
+去掉 oauth_* 签名参数，其余参数排序；表单请求体按同样方式加入索引。回放时是一次字典查找。
+"""
+
+import json
+import threading
+import urllib.parse
+from typing import Dict, List, Optional, Tuple, Union
+
+import log
+
+logger = log.get_logger('cassette')
+
+RECORD = 'record'
+REPLAY = 'replay'
+
+
+def _normalize_params(query: str) -> str:
+    params = [(key, value) for key, value in urllib.parse.parse_qsl(query, keep_blank_values=True)
+              if not key.startswith('oauth_')]
+    return urllib.parse.urlencode(sorted(params))
+
+
+def request_key(method: str, url: str, body: Union[str, bytes, None] = None) -> str:
+    """
+    计算请求的索引，例如 GET /users/show.json?id=xxx
+
+    只有表单请求体参与索引，multipart 等流式请求体只按 URL 索引
+    """
+    parsed = urllib.parse.urlparse(url)
+    key = f'{method.upper()} {parsed.path}'
+    query = _normalize_params(parsed.query)
+    if query:
+        key += f'?{query}'
+    if body:
+        if isinstance(body, bytes):
+            body = body.decode('utf-8', 'replace')
+        form = _normalize_params(body)
+        if form:
+            key += f' {form}'
+    return key
+
+
+def _path_key(key: str) -> Optional[str]:
+    """去掉请求体后的索引，用于写操作的宽松匹配；请求没有请求体时返回 None"""
+    parts = key.split(' ', 2)
+    return ' '.join(parts[:2]) if len(parts) == 3 else None
+
+
+class Cassette:
+    """
+    录制文件
+
+    同一请求录制了多个响应时按录制顺序循环回放；写操作（带请求体）没有完全匹配时，
+    使用同一接口最近录制的响应（发布内容等参数每次可能不同）
+    """
+
+    def __init__(self, path: str, mode: str):
+        if mode not in (RECORD, REPLAY):
+            raise ValueError(f"未知的录制模式: {mode}（支持 {RECORD}、{REPLAY}）")
+        self.path = path
+        self.mode = mode
+        self._responses: Dict[str, List[Tuple[int, bytes]]] = {}
+        self._positions: Dict[str, int] = {}
+        self._lock = threading.Lock()
+        if mode == REPLAY:
+            self._load()
+
+    @property
+    def replaying(self) -> bool:
+        return self.mode == REPLAY
+
+    def _load(self) -> None:
+        count = 0
+        try:
+            with open(self.path, encoding='utf-8') as f:
+                for line in f:
+                    if not line.strip():
+                        continue
+                    entry = json.loads(line)
+                    self._add(entry['key'], entry['status'], entry['body'].encode('utf-8'))
+                    count += 1
+        except OSError as e:
+            raise ValueError(f"无法读取录制文件 {self.path}: {e}")
+        logger.info("已加载录制文件 %s（%d 条记录）", self.path, count)
+
+    def _add(self, key: str, status: int, content: bytes) -> None:
+        self._responses.setdefault(key, []).append((status, content))
+        path_key = _path_key(key)
+        if path_key is not None:
+            # 写操作的宽松索引始终指向最近录制的响应
+            self._responses[path_key] = [(status, content)]
+
+    def record(self, method: str, url: str, body: Union[str, bytes, None], status: int, content: bytes) -> None:
+        """追加一条录制记录"""
+        key = request_key(method, url, body)
+        line = json.dumps({'key': key, 'status': status, 'body': content.decode('utf-8', 'replace')},
+                          ensure_ascii=False)
+        with self._lock:
+            self._add(key, status, content)
+            try:
+                with open(self.path, 'a', encoding='utf-8') as f:
+                    f.write(line + '\n')
+            except OSError as e:
+                logger.warning("写入录制文件失败: %s", e)
+
+    def replay(self, method: str, url: str, body: Union[str, bytes, None] = None) -> Tuple[int, bytes]:
+        """返回录制的 (状态码, 响应体)，没有录制时抛出 LookupError"""
+        key = request_key(method, url, body)
+        with self._lock:
+            responses = self._responses.get(key)
+            if responses is None and _path_key(key) is not None:
+                key = _path_key(key)
+                responses = self._responses.get(key)
+            if responses is None:
+                raise LookupError(f"录制文件中没有该请求: {request_key(method, url, body)}")
+            position = self._positions.get(key, 0)
+            self._positions[key] = position + 1
+        return responses[position % len(responses)]
+
+
+def from_env(mode: str, path: str) -> Optional[Cassette]:
+    """根据 FANFOU_CASSETTE_MODE 创建录制文件，未开启时返回 None"""
+    if not mode:
+        return None
+    if mode not in (RECORD, REPLAY):
+        logger.warning("未知的 FANFOU_CASSETTE_MODE: %s（支持 %s、%s）", mode, RECORD, REPLAY)
+        return None
+    logger.info("请求%s模式，录制文件: %s", '回放' if mode == REPLAY else '录制', path)
+    return Cassette(path, mode)
@@ -3,10 +3,410 @@
 饭否 API 客户端
 """
 
+import base64
+import binascii
+import contextlib
+import functools
+import hashlib
+import hmac
+import io
 import json
+import os
+import secrets
+import threading
+import time
 import urllib.parse
+import httplib2
 import oauth2
-from typing import List, Dict, Any, Optional, Tuple
+from typing import BinaryIO, Iterator, List, Dict, Any, Optional, Tuple
+import cassette
+import log
+import metrics
+import tracing
+from cache import SWRCache, TTLCache, ValidatorCache
+from rate_limiter import RateLimiter
+from utils import (
+    DATA_URL_PATTERN, IMAGE_SIGNATURE_SIZE, MultipartStream, detect_image_type,
+    image_cache, local_photo_path, photo_source_kind, pillow_available, recompress_image
+)
+
+logger = log.get_logger('fanfou_client')
+
+# 饭否 API 地址，可指向本地的模拟服务（benchmarks/mock_fanfou.py）做离线测试
+API_BASE = os.getenv('FANFOU_API_BASE', 'http://api.fanfou.com').rstrip('/')
+
+# 录制/回放饭否 API 的响应：record 正常请求并录制，replay 不访问网络直接返回录制的响应
+CASSETTE_MODE = os.getenv('FANFOU_CASSETTE_MODE', '').lower()
+CASSETTE_PATH = os.getenv('FANFOU_CASSETTE', 'fanfou-cassette.jsonl')
+_cassette = cassette.from_env(CASSETTE_MODE, CASSETTE_PATH)
+
+# 公开时间线对所有用户都相同，进程内共享一份缓存
+# 软过期后立即返回旧数据并在后台刷新，硬过期后调用方需等待重新加载；软过期时间设为 0 可关闭缓存
+PUBLIC_TIMELINE_SOFT_TTL = float(os.getenv('FANFOU_PUBLIC_TIMELINE_SOFT_TTL', '5'))
+PUBLIC_TIMELINE_HARD_TTL = float(os.getenv('FANFOU_PUBLIC_TIMELINE_HARD_TTL', '30'))
+_public_timeline_cache = SWRCache('public_timeline')
+
+# 首页时间线由每个客户端各自缓存，默认关闭，开启预取后由 enable_home_timeline_cache 打开
+HOME_TIMELINE_SOFT_TTL = float(os.getenv('FANFOU_HOME_TIMELINE_SOFT_TTL', '0'))
+HOME_TIMELINE_HARD_TTL = float(os.getenv('FANFOU_HOME_TIMELINE_HARD_TTL', '0'))
+
+# 用户资料缓存（每个客户端各自缓存，按用户 ID 索引）：USER_CACHE_TTL 秒内直接返回缓存，
+# 过期后发送条件请求验证；缓存条目数设为 0 可关闭缓存
+USER_CACHE_TTL = float(os.getenv('FANFOU_USER_CACHE_TTL', '30'))
+USER_CACHE_SIZE = int(os.getenv('FANFOU_USER_CACHE_SIZE', '1000'))
+
+# 不存在（已删除）的内容和用户：饭否 API 返回 404/410 后在进程内缓存错误响应，有效期内重复查询直接返回，
+# 不再访问饭否 API、不占用接口配额；有效期设为 0 可关闭
+NOT_FOUND_CACHE_TTL = float(os.getenv('FANFOU_NOT_FOUND_CACHE_TTL', '60'))
+NOT_FOUND_CACHE_SIZE = int(os.getenv('FANFOU_NOT_FOUND_CACHE_SIZE', '4096'))
+_not_found_cache = TTLCache(ttl=NOT_FOUND_CACHE_TTL, max_entries=NOT_FOUND_CACHE_SIZE)
+_NOT_FOUND_STATUSES = (404, 410)
+
+# 饭否图片大小限制（5MB）
+MAX_PHOTO_SIZE = 5 * 1024 * 1024
+
+# 上传图片时临时文件在内存中保留的最大字节数，超出部分写入磁盘
+PHOTO_SPOOL_SIZE = int(os.getenv('FANFOU_PHOTO_SPOOL_SIZE', str(256 * 1024)))
+
+# 进程内所有账号共享的空闲 HTTP 连接数
+HTTP_POOL_SIZE = int(os.getenv('FANFOU_HTTP_POOL_SIZE', '32'))
+
+# 上传前压缩图片（需要安装 Pillow），超过目标大小或最大边长的图片会被缩小并重新编码
+PHOTO_RECOMPRESS = os.getenv('FANFOU_PHOTO_RECOMPRESS', '').lower() in ('1', 'true', 'yes')
+PHOTO_TARGET_SIZE = int(os.getenv('FANFOU_PHOTO_TARGET_SIZE', str(1024 * 1024)))
+PHOTO_MAX_DIMENSION = int(os.getenv('FANFOU_PHOTO_MAX_DIMENSION', '2048'))
+# 开启压缩后允许输入的最大图片字节数（压缩后仍需小于 MAX_PHOTO_SIZE）
+PHOTO_INPUT_LIMIT = int(os.getenv('FANFOU_PHOTO_INPUT_LIMIT', str(30 * 1024 * 1024)))
+# 图片压缩线程数
+IMAGE_WORKERS = int(os.getenv('FANFOU_IMAGE_WORKERS', '2'))
+
+if PHOTO_RECOMPRESS and not pillow_available():
+    logger.warning("已设置 FANFOU_PHOTO_RECOMPRESS 但未安装 Pillow，图片压缩不会生效（pip install pillow）")
+    PHOTO_RECOMPRESS = False
+
+_image_executor = None
+_image_executor_lock = threading.Lock()
+
+# 批量操作：单次最多处理的条数、同时进行的请求数，以及写操作的限流（同一进程内所有账号共享）
+BULK_MAX_ITEMS = int(os.getenv('FANFOU_BULK_MAX_ITEMS', '100'))
+BULK_CONCURRENCY = int(os.getenv('FANFOU_BULK_CONCURRENCY', '4'))
+WRITE_RATE = float(os.getenv('FANFOU_WRITE_RATE', '60'))  # 每分钟最多的写操作数
+WRITE_BURST = int(os.getenv('FANFOU_WRITE_BURST', '10'))
+write_rate_limiter = RateLimiter(WRITE_RATE / 60, WRITE_BURST)
+
+
+def _cached_not_found(kind: str, key: str) -> Optional[Dict[str, Any]]:
+    """返回已知不存在的内容或用户的错误响应（副本），没有记录时返回 None"""
+    if NOT_FOUND_CACHE_TTL <= 0:
+        return None
+    error = _not_found_cache.get((kind, key))
+    result = 'hit' if error is not None else 'miss'
+    tracing.annotate('cache.not_found', result)
+    metrics.cache_requests.inc(cache='not_found', result=result)
+    return dict(error) if error is not None else None
+
+
+def _remember_not_found(kind: str, key: str, status: int, result: Any) -> None:
+    """饭否 API 返回 404/410 的错误响应时记录下来"""
+    if NOT_FOUND_CACHE_TTL > 0 and status in _NOT_FOUND_STATUSES and isinstance(result, dict):
+        _not_found_cache.set((kind, key), dict(result))
+
+
+def enable_home_timeline_cache(soft_ttl: float, hard_ttl: float) -> None:
+    """开启首页时间线缓存（已通过环境变量开启时不覆盖）"""
+    global HOME_TIMELINE_SOFT_TTL, HOME_TIMELINE_HARD_TTL
+    if HOME_TIMELINE_SOFT_TTL <= 0:
+        HOME_TIMELINE_SOFT_TTL = soft_ttl
+        HOME_TIMELINE_HARD_TTL = max(HOME_TIMELINE_HARD_TTL, hard_ttl)
+
+
+def _photo_input_limit() -> int:
+    """返回允许输入的最大图片字节数，开启压缩时可以接受超过 5MB 的图片"""
+    return max(PHOTO_INPUT_LIMIT, MAX_PHOTO_SIZE) if PHOTO_RECOMPRESS else MAX_PHOTO_SIZE
+
+
+def _photo_too_large(limit: int) -> ValueError:
+    return ValueError(f"图片文件过大，请选择小于{limit // (1024 * 1024)}MB的图片")
+
+
+def _check_photo(head: bytes, photo_size: int, limit: int = MAX_PHOTO_SIZE) -> str:
+    """检查图片大小和文件头，返回图片的 MIME 类型"""
+    if photo_size > limit:
+        raise _photo_too_large(limit)
+    mime_type = detect_image_type(head)
+    if mime_type is None:
+        raise ValueError("图片文件不是有效的图片（支持 JPEG、PNG、GIF、BMP、WebP）")
+    return mime_type
+
+
+class PhotoDownloadError(Exception):
+    """
+    网络原因导致图片下载失败（连接失败、超时、图片服务器错误等）
+
+    发生在请求饭否 API 之前，可以安全重试；不继承 ValueError，以便与图片无效等永久失败区分
+    """
+
+
+def _download_photo(photo_url: str, photo_file: BinaryIO, limit: int = MAX_PHOTO_SIZE) -> Tuple[int, str]:
+    """
+    下载网络图片并写入 photo_file，返回 (字节数, MIME 类型)
+    
+    超过大小限制或文件头不是图片时立即中断下载，抛出 ValueError；
+    连接失败、超时和图片服务器 5xx 错误抛出 PhotoDownloadError
+    """
+    import requests
+    try:
+        logger.info("正在下载图片: %s", photo_url)
+        with requests.get(photo_url, timeout=30, stream=True) as response:
+            response.raise_for_status()
+            
+            # 服务器声明的大小已超出限制时不再下载
+            content_length = response.headers.get('content-length', '')
+            if content_length.isdigit() and int(content_length) > limit:
+                raise _photo_too_large(limit)
+            
+            photo_size = 0
+            head = b''
+            mime_type = None
+            for chunk in response.iter_content(chunk_size=64 * 1024):
+                photo_size += len(chunk)
+                if photo_size > limit:
+                    raise _photo_too_large(limit)
+                
+                # 根据文件头识别图片格式
+                if mime_type is None:
+                    head += chunk[:IMAGE_SIGNATURE_SIZE - len(head)]
+                    if len(head) >= IMAGE_SIGNATURE_SIZE:
+                        mime_type = detect_image_type(head)
+                        if mime_type is None:
+                            raise ValueError("下载的文件不是有效的图片（支持 JPEG、PNG、GIF、BMP、WebP）")
+                
+                photo_file.write(chunk)
+        
+        # 文件小于识别所需的字节数
+        if mime_type is None:
+            mime_type = detect_image_type(head)
+            if mime_type is None:
+                raise ValueError("下载的文件不是有效的图片（支持 JPEG、PNG、GIF、BMP、WebP）")
+        return photo_size, mime_type
+    
+    except ValueError:
+        raise
+    except requests.exceptions.HTTPError as e:
+        # 图片不存在、无权访问等 4xx 错误重试也不会成功
+        if e.response is not None and e.response.status_code >= 500:
+            raise PhotoDownloadError(f"无法下载图片: {str(e)}") from e
+        raise ValueError(f"无法下载图片: {str(e)}")
+    except requests.exceptions.RequestException as e:
+        raise PhotoDownloadError(f"无法下载图片: {str(e)}") from e
+    except Exception as e:
+        raise ValueError(f"下载图片时发生错误: {str(e)}")
+
+
+def _decode_data_url(photo_url: str, photo_file: BinaryIO, limit: int = MAX_PHOTO_SIZE) -> Tuple[int, str]:
+    """将 base64 data URL 分块解码并写入 photo_file，返回 (字节数, MIME 类型)"""
+    offset = DATA_URL_PATTERN.match(photo_url).end()
+    
+    # 解码前按长度估算大小，超出限制时不再解码
+    if (len(photo_url) - offset) * 3 // 4 > limit + 2:
+        raise _photo_too_large(limit)
+    
+    photo_size = 0
+    head = b''
+    # 每次解码 64KB 的 base64 文本（4 的倍数，保证分块边界对齐）
+    step = 64 * 1024
+    try:
+        for start in range(offset, len(photo_url), step):
+            chunk = base64.b64decode(photo_url[start:start + step], validate=True)
+            if len(head) < IMAGE_SIGNATURE_SIZE:
+                head += chunk[:IMAGE_SIGNATURE_SIZE - len(head)]
+            photo_size += len(chunk)
+            photo_file.write(chunk)
+    except binascii.Error as e:
+        raise ValueError(f"无效的 base64 图片数据: {str(e)}")
+    
+    return photo_size, _check_photo(head, photo_size, limit)
+
+
+def _recompress_photo(photo_file: BinaryIO, photo_size: int, mime_type: str) -> Tuple[BinaryIO, int, str]:
+    """
+    在图片压缩线程池中压缩图片，返回 (文件对象, 字节数, MIME 类型)
+    
+    不需要压缩时原样返回；压缩后仍超过 MAX_PHOTO_SIZE 时抛出 ValueError
+    """
+    global _image_executor
+    if PHOTO_RECOMPRESS:
+        if _image_executor is None:
+            with _image_executor_lock:
+                if _image_executor is None:
+                    from concurrent.futures import ThreadPoolExecutor
+                    _image_executor = ThreadPoolExecutor(max_workers=IMAGE_WORKERS, thread_name_prefix='fanfou-image')
+        
+        with tracing.span('image.recompress', bytes_in=photo_size, mime_type=mime_type) as span:
+            try:
+                result = _image_executor.submit(tracing.bind_context(
+                    functools.partial(recompress_image, photo_file, photo_size, PHOTO_TARGET_SIZE, PHOTO_MAX_DIMENSION)
+                )).result()
+            except Exception as e:
+                raise ValueError(f"压缩图片时发生错误: {str(e)}")
+            span.set_attribute('bytes_out', len(result[0]) if result is not None else photo_size)
+        
+        if result is not None:
+            photo_data, new_mime_type = result
+            logger.info("图片已压缩: %d -> %d 字节", photo_size, len(photo_data))
+            photo_file, photo_size, mime_type = io.BytesIO(photo_data), len(photo_data), new_mime_type
+    
+    if photo_size > MAX_PHOTO_SIZE:
+        raise _photo_too_large(MAX_PHOTO_SIZE)
+    return photo_file, photo_size, mime_type
+
+
+class _CassetteHttp(httplib2.Http):
+    """
+    录制/回放模式使用的 httplib2.Http
+    
+    签名、请求头等处理与正常请求相同，只在 httplib2 实际收发数据这一步录制或回放，
+    回放时测量的仍是完整的客户端开销
+    """
+    
+    def _conn_request(self, conn, request_uri, method, body, headers):
+        # 表单请求体参与索引，multipart 等流式请求体只按 URL 索引
+        form_body = body if isinstance(body, (str, bytes)) else None
+        if _cassette.replaying:
+            if body is not None and form_body is None:
+                for _ in body:
+                    pass
+            status, content = _cassette.replay(method, request_uri, form_body)
+            return httplib2.Response({'status': status}), content
+        
+        response, content = super()._conn_request(conn, request_uri, method, body, headers)
+        _cassette.record(method, request_uri, form_body, response.status, content)
+        return response, content
+
+
+# 空闲的 httplib2.Http 连接池，进程内所有账号共享
+# OAuth 签名只依赖请求和凭据，与连接无关，不同账号的请求可以复用同一条 keep-alive 连接
+_http_pool: List[httplib2.Http] = []
+_http_pool_lock = threading.Lock()
+
+
+def _acquire_http() -> httplib2.Http:
+    """从连接池取出一个空闲的 httplib2.Http，没有则新建"""
+    with _http_pool_lock:
+        if _http_pool:
+            return _http_pool.pop()
+    return _CassetteHttp() if _cassette is not None else httplib2.Http()
+
+
+def _release_http(http: httplib2.Http) -> None:
+    """归还 httplib2.Http，超出池容量时关闭连接"""
+    with _http_pool_lock:
+        if len(_http_pool) < HTTP_POOL_SIZE:
+            _http_pool.append(http)
+            return
+    http.close()
+
+
+def _oauth_escape(value: str) -> str:
+    """OAuth 1.0 的百分号编码（RFC 5849 3.6），只保留非保留字符"""
+    return urllib.parse.quote(value, safe='~')
+
+
+# GET 等没有请求体的请求，请求体摘要固定为空字节串的 SHA-1
+_EMPTY_BODY_HASH = base64.b64encode(hashlib.sha1(b'').digest()).decode('ascii')
+_DEFAULT_PORTS = {'http': ':80', 'https': ':443'}
+
+
+class OAuthSigner:
+    """
+    OAuth 1.0 HMAC-SHA1 签名，签名结果与 oauth2 库一致
+
+    签名密钥只由 consumer secret 和 token secret 决定，创建时生成 HMAC 对象，每次签名复制后使用；
+    签名基础字符串直接由参数列表拼接，不创建 oauth2.Request 等中间对象。每个账号（客户端）一个实例
+    """
+
+    def __init__(self, consumer_key: str, consumer_secret: str, token_key: str, token_secret: str):
+        self.consumer_key = consumer_key
+        self.token_key = token_key
+        key = f'{_oauth_escape(consumer_secret)}&{_oauth_escape(token_secret)}'
+        self._hmac = hmac.new(key.encode('utf-8'), digestmod=hashlib.sha1)
+
+    def _oauth_params(self, body_hash: Optional[str]) -> List[Tuple[str, str]]:
+        params = [
+            ('oauth_consumer_key', self.consumer_key),
+            ('oauth_nonce', str(secrets.randbelow(100000000))),
+            ('oauth_signature_method', 'HMAC-SHA1'),
+            ('oauth_timestamp', str(int(time.time()))),
+            ('oauth_token', self.token_key),
+            ('oauth_version', '1.0'),
+        ]
+        if body_hash is not None:
+            params.append(('oauth_body_hash', body_hash))
+        return params
+
+    def signature(self, method: str, url: str, params: List[Tuple[str, str]]) -> str:
+        """
+        计算签名，params 为请求参数（oauth_* 参数和表单参数，不含 URL 中的查询参数）
+        """
+        parsed = urllib.parse.urlsplit(url)
+        scheme, netloc = parsed.scheme, parsed.netloc
+        default_port = _DEFAULT_PORTS.get(scheme)
+        if default_port and netloc.endswith(default_port):
+            netloc = netloc[:-len(default_port)]
+        if parsed.query:
+            params = params + urllib.parse.parse_qsl(parsed.query, keep_blank_values=True)
+        normalized = '&'.join(f'{_oauth_escape(k)}={_oauth_escape(v)}' for k, v in sorted(params))
+        base_string = '&'.join((
+            _oauth_escape(method.upper()),
+            _oauth_escape(f'{scheme}://{netloc}{parsed.path}'),
+            _oauth_escape(normalized),
+        ))
+        mac = self._hmac.copy()
+        mac.update(base_string.encode('ascii'))
+        return base64.b64encode(mac.digest()).decode('ascii')
+
+    def sign(self, url: str, method: str = 'GET', body=b'', headers: Optional[Dict[str, str]] = None,
+             body_hash: Optional[bytes] = None) -> Tuple[str, Any, Dict[str, str]]:
+        """
+        为请求添加签名，返回 (url, body, headers)
+
+        与 oauth2.Client.request 的处理一致：表单请求的签名参数放在请求体中，GET 请求放在 URL 中，
+        其余请求放在 Authorization 头中，并对请求体计算 oauth_body_hash。
+        流式请求体由调用方传入预先计算的 SHA-1 摘要 body_hash
+        """
+        headers = dict(headers) if headers else {}
+        if method == 'POST':
+            headers.setdefault('Content-Type', 'application/x-www-form-urlencoded')
+        is_form_encoded = headers.get('Content-Type') == 'application/x-www-form-urlencoded'
+
+        if is_form_encoded:
+            if isinstance(body, bytes):
+                body = body.decode('utf-8')
+            form = urllib.parse.parse_qsl(body) if body else []
+            params = self._oauth_params(None)
+            params.append(('oauth_signature', self.signature(method, url, params + form)))
+            body = '&'.join(f'{_oauth_escape(k)}={_oauth_escape(v)}' for k, v in sorted(params + form))
+            return url, body, headers
+
+        if body_hash is None:
+            if body:
+                body_hash = hashlib.sha1(body.encode('utf-8') if isinstance(body, str) else body).digest()
+                encoded_hash = base64.b64encode(body_hash).decode('ascii')
+            else:
+                encoded_hash = _EMPTY_BODY_HASH
+        else:
+            encoded_hash = base64.b64encode(body_hash).decode('ascii')
+        params = self._oauth_params(encoded_hash)
+        params.append(('oauth_signature', self.signature(method, url, params)))
+
+        if method == 'GET':
+            query = '&'.join(f'{_oauth_escape(k)}={_oauth_escape(v)}' for k, v in params)
+            url = f"{url}{'&' if urllib.parse.urlsplit(url).query else '?'}{query}"
+        else:
+            scheme, netloc = urllib.parse.urlsplit(url)[:2]
+            fields = ', '.join(f'{k}="{_oauth_escape(v)}"' for k, v in params)
+            headers['Authorization'] = f'OAuth realm="{scheme}://{netloc}", {fields}'
+        return url, body, headers
 
 
 class FanFou:
@@ -14,28 +414,35 @@ class FanFou:
     host = "fanfou.com"
 
     def __init__(self, api_key: str, api_secret: str, username: str = '', password: str = '', 
-                 oauth_token: str = '', oauth_token_secret: str = ''):
+                 oauth_token: str = '', oauth_token_secret: str = '', user_cache_size: Optional[int] = None):
+        """user_cache_size 为用户资料缓存的条数，默认 USER_CACHE_SIZE；多账号部署中可调小以限制总内存"""
         self.api_key = api_key
         self.api_secret = api_secret
         self.username = username
         self.password = password
         
+        # 首页时间线缓存属于当前账号，随客户端一起释放
+        self._home_timeline_cache = SWRCache('home_timeline')
+        # 用户资料缓存中的 following 等字段与当前账号相关，同样按客户端缓存
+        self._user_cache = ValidatorCache(USER_CACHE_SIZE if user_cache_size is None else user_cache_size, 'user')
+        
         # 优先使用传入的 oauth token
         if oauth_token and oauth_token_secret:
-            print('------ 使用已有的 OAuth Token ------')
+            logger.debug("使用已有的 OAuth Token")
             self.token = oauth_token
             self.token_secret = oauth_token_secret
         elif username and password:
-            print('------ 使用用户名密码登录 ------')
+            logger.debug("使用用户名密码登录")
             self.token, self.token_secret = self.login(username, password)
         else:
             raise Exception("必须提供 oauth_token + oauth_token_secret 或者 username + password")
         
+        self._signer = OAuthSigner(self.api_key, self.api_secret, self.token, self.token_secret)
         self.user_id = self.get_current_user_id()
 
+    @tracing.traced
     def login(self, username: str, password: str) -> Tuple[str, str]:
         """登录获取 OAuth token"""
-        print('------ login ------')
         params = {'x_auth_username': username, 'x_auth_password': password, 'x_auth_mode': 'client_auth'}
         url = "http://fanfou.com/oauth/access_token?{}".format(urllib.parse.urlencode(params))
 
@@ -49,38 +456,89 @@ class FanFou:
         if len(tokens) == 2:
             oauth_token = tokens['oauth_token']
             oauth_token_secret = tokens['oauth_token_secret']
-            print('=' * 60)
-            print('🎉 登录成功！已生成 OAuth Token')
-            print('=' * 60)
-            print(f'📋 请将以下环境变量保存到你的配置中：')
-            print()
-            print(f'FANFOU_OAUTH_TOKEN={oauth_token}')
-            print(f'FANFOU_OAUTH_TOKEN_SECRET={oauth_token_secret}')
-            print()
-            print('💡 提示：')
-            print('1. 将上述环境变量添加到你的 .env 文件中')
-            print('2. 添加后即可移除 FANFOU_USERNAME 和 FANFOU_PASSWORD')
-            print('3. OAuth Token 方式更安全且避免重复登录')
-            print('=' * 60)
+            # Token 属于凭据，不写入日志（日志可能落盘），由调用方（generate_oauth_token）返回给用户
+            logger.info("登录成功，已生成 OAuth Token，请保存为 FANFOU_OAUTH_TOKEN 和 FANFOU_OAUTH_TOKEN_SECRET")
             return oauth_token, oauth_token_secret
         else:
-            print('登录失败！')
+            logger.error("登录失败")
             raise Exception('登录失败，请检查用户名和密码')
 
+    @tracing.traced
     def get_current_user_id(self) -> str:
         """获取当前用户 ID"""
-        print('------ get_current_user_id ------')
-        url = 'http://api.fanfou.com/account/verify_credentials.json'
+        url = f'{API_BASE}/account/verify_credentials.json'
         params = {'mode': 'lite'}
 
-        consumer = oauth2.Consumer(self.api_key, self.api_secret)
-        token = oauth2.Token(self.token, self.token_secret)
-        client = oauth2.Client(consumer, token)
-
-        response, content = client.request(url, method='POST', body=urllib.parse.urlencode(params))
-        result = json.loads(content)
+        result = self._request(url, method='POST', body=urllib.parse.urlencode(params))
         return result['id']
 
+    def close(self) -> None:
+        """释放账号相关的缓存（连接属于进程共享的连接池，不需要关闭）"""
+        self._home_timeline_cache.clear()
+        self._user_cache.clear()
+
+    def _request(self, url: str, method: str = 'GET', body=b'', headers: Optional[Dict[str, str]] = None) -> Any:
+        """发送带 OAuth 签名的请求并解析 JSON 响应"""
+        _, content = self._send(url, method, body, headers)
+        return json.loads(content)
+
+    def _send(self, url: str, method: str = 'GET', body=b'', headers: Optional[Dict[str, str]] = None) -> Tuple[httplib2.Response, bytes]:
+        """
+        发送带 OAuth 签名的请求，返回 (响应, 响应体)
+
+        httplib2.Http 不是线程安全的，每个请求独占一个 httplib2.Http，用完放回进程共享的连接池
+        """
+        sent_bytes = len(body.encode('utf-8') if isinstance(body, str) else body)
+        signed_url, body, headers = self._signer.sign(url, method, body, headers)
+        http = _acquire_http()
+        try:
+            with metrics.track_api_call(url, method, sent_bytes) as call:
+                response, content = http.request(signed_url, method=method, body=body, headers=headers)
+                call.finish(response.status, len(content))
+        except Exception:
+            # 连接状态未知，不再放回连接池
+            http.close()
+            raise
+        _release_http(http)
+        return response, content
+
+    def _post_stream(self, url: str, body: MultipartStream) -> Any:
+        """
+        以流式请求体发送带 OAuth 签名的 POST 请求
+
+        oauth_body_hash 要求完整的请求体，这里先流式计算请求体摘要并签名，
+        再以预先计算的 Content-Length 分块发送请求体
+        """
+        headers = {
+            'Content-Type': body.content_type,
+            'Content-Length': str(len(body))
+        }
+        url, _, headers = self._signer.sign(url, 'POST', None, headers, body_hash=body.sha1())
+
+        http = _acquire_http()
+        try:
+            with metrics.track_api_call(url, 'POST', len(body)) as call:
+                response, content = http.request(url, method='POST', body=body, headers=headers)
+                call.finish(response.status, len(content))
+        except Exception:
+            http.close()
+            raise
+        _release_http(http)
+        return json.loads(content)
+
+    @tracing.traced
+    def prefetch_timelines(self, count: int = 5) -> None:
+        """预取首页时间线和公开时间线并写入缓存"""
+        # 预取期间发布或删除了内容时，取到的可能是旧数据，不写入缓存
+        generation = self._home_timeline_cache.generation
+        home = self._fetch_home_timeline(count, '')
+        if isinstance(home, list):
+            self._home_timeline_cache.set(count, home, generation)
+        public = self._fetch_public_timeline(count, '', '')
+        if isinstance(public, list):
+            _public_timeline_cache.set(count, public)
+
+    @tracing.traced
     def request_user_timeline(self, user_id: str = '', max_id: str = '', count: int = 5, q: str = '') -> List[Dict[str, Any]]:
         """
         根据用户 ID 获取某个用户发表内容的时间线
@@ -90,29 +548,24 @@ class FanFou:
         count 为获取数量，默认 5 条
         q 为搜索关键词，如果为空，则获取普通用户时间线；如果不为空，则搜索该用户包含该关键词的消息
         """
-        print('------ request_user_timeline ------')
         if user_id == '':
             user_id = self.user_id
 
         # 根据是否有搜索关键词选择不同的API接口
         if q:
             # 使用搜索接口
-            url = f"http://api.fanfou.com/search/user_timeline.json?id={user_id}&count={count}&format=html&q={urllib.parse.quote(q)}"
+            url = f"{API_BASE}/search/user_timeline.json?id={user_id}&count={count}&format=html&q={urllib.parse.quote(q)}"
             if max_id:
                 url += f"&max_id={max_id}"
         else:
             # 使用普通用户时间线接口
-            url = f"http://api.fanfou.com/statuses/user_timeline.json?id={user_id}&count={count}&format=html"
+            url = f"{API_BASE}/statuses/user_timeline.json?id={user_id}&count={count}&format=html"
             if max_id:
-                url = f"http://api.fanfou.com/statuses/user_timeline.json?max_id={max_id}&id={user_id}&count={count}&format=html"
-
-        consumer = oauth2.Consumer(self.api_key, self.api_secret)
-        token = oauth2.Token(self.token, self.token_secret)
-        client = oauth2.Client(consumer, token)
+                url = f"{API_BASE}/statuses/user_timeline.json?max_id={max_id}&id={user_id}&count={count}&format=html"
 
-        response, content = client.request(url)
-        return json.loads(content)
+        return self._request(url)
 
+    @tracing.traced
     def get_home_timeline(self, count: int = 5, max_id: str = '') -> List[Dict[str, Any]]:
         """
         获取当前用户首页关注用户及自己的饭否时间线
@@ -120,18 +573,28 @@ class FanFou:
         max_id 为返回列表中内容最新 ID，如果为空，则获取最新时间线
         count 为获取数量，默认 5 条
         """
-        print('------ get_home_timeline ------')
-        url = f"http://api.fanfou.com/statuses/home_timeline.json?count={count}&format=html"
+
+        # 最新的首页时间线在开启缓存后按用户缓存
+        if not max_id and HOME_TIMELINE_SOFT_TTL > 0:
+            return self._home_timeline_cache.get(
+                count,
+                lambda: self._fetch_home_timeline(count, max_id),
+                HOME_TIMELINE_SOFT_TTL,
+                max(HOME_TIMELINE_HARD_TTL, HOME_TIMELINE_SOFT_TTL),
+                should_cache=lambda data: isinstance(data, list)
+            )
+
+        return self._fetch_home_timeline(count, max_id)
+
+    def _fetch_home_timeline(self, count: int, max_id: str) -> List[Dict[str, Any]]:
+        """请求首页时间线接口"""
+        url = f"{API_BASE}/statuses/home_timeline.json?count={count}&format=html"
         if max_id:
             url += f"&max_id={max_id}"
 
-        consumer = oauth2.Consumer(self.api_key, self.api_secret)
-        token = oauth2.Token(self.token, self.token_secret)
-        client = oauth2.Client(consumer, token)
-
-        response, content = client.request(url)
-        return json.loads(content)
+        return self._request(url)
 
+    @tracing.traced
     def get_public_timeline(self, count: int = 5, max_id: str = '', q: str = '') -> List[Dict[str, Any]]:
         """
         获取公开时间线，获取饭否全站最新的公开消息
@@ -140,64 +603,137 @@ class FanFou:
         count 为获取数量，默认 5 条
         q 为搜索关键词，如果为空，则获取普通公开时间线；如果不为空，则搜索包含该关键词的公开消息
         """
-        print('------ get_public_timeline ------')
-        
+        # 最新的公开时间线（无搜索、无分页）走共享缓存
+        if not q and not max_id and PUBLIC_TIMELINE_SOFT_TTL > 0:
+            return _public_timeline_cache.get(
+                count,
+                lambda: self._fetch_public_timeline(count, max_id, q),
+                PUBLIC_TIMELINE_SOFT_TTL,
+                max(PUBLIC_TIMELINE_HARD_TTL, PUBLIC_TIMELINE_SOFT_TTL),
+                should_cache=lambda data: isinstance(data, list)
+            )
+        
+        return self._fetch_public_timeline(count, max_id, q)
+
+    def _fetch_public_timeline(self, count: int, max_id: str, q: str) -> List[Dict[str, Any]]:
+        """请求公开时间线接口"""
         # 根据是否有搜索关键词选择不同的API接口
         if q:
             # 使用搜索接口
-            url = f"http://api.fanfou.com/search/public_timeline.json?count={count}&format=html&mode=lite&q={urllib.parse.quote(q)}"
+            url = f"{API_BASE}/search/public_timeline.json?count={count}&format=html&mode=lite&q={urllib.parse.quote(q)}"
             if max_id:
                 url += f"&max_id={max_id}"
         else:
             # 使用普通公开时间线接口
-            url = f"http://api.fanfou.com/statuses/public_timeline.json?count={count}&format=html"
+            url = f"{API_BASE}/statuses/public_timeline.json?count={count}&format=html"
             if max_id:
                 url += f"&max_id={max_id}"
 
-        consumer = oauth2.Consumer(self.api_key, self.api_secret)
-        token = oauth2.Token(self.token, self.token_secret)
-        client = oauth2.Client(consumer, token)
-
-        response, content = client.request(url)
-        return json.loads(content)
+        return self._request(url)
 
+    @tracing.traced
     def get_user_info(self, user_id: str = '') -> Dict[str, Any]:
         """
         获取用户信息
         
         user_id 为用户 ID，如果为空，则获取当前用户信息
-        """
-        print('------ get_user_info ------')
         
+        USER_CACHE_TTL 秒内重复查询直接返回缓存；缓存过期后带上次响应的 ETag / Last-Modified 发送条件请求，
+        服务端返回 304 或响应体摘要与缓存一致时沿用缓存的数据，不再解析响应。缓存时长见 user_info_age
+        不存在的用户在 NOT_FOUND_CACHE_TTL 秒内直接返回上次的错误响应
+        """
         if user_id == '':
             user_id = self.user_id
         
-        url = f"http://api.fanfou.com/users/show.json?id={user_id}"
+        url = f"{API_BASE}/users/show.json?id={user_id}"
+        not_found = _cached_not_found('user', user_id)
+        if not_found is not None:
+            return not_found
+        if USER_CACHE_SIZE <= 0:
+            response, content = self._send(url)
+            result = json.loads(content)
+            _remember_not_found('user', user_id, response.status, result)
+            return result
+
+        entry = self._user_cache.get(user_id)
+        if entry is not None and entry.age < USER_CACHE_TTL:
+            self._record_user_cache('hit')
+            return entry.value
+
+        headers = {}
+        if entry is not None:
+            if entry.etag:
+                headers['If-None-Match'] = entry.etag
+            if entry.last_modified:
+                headers['If-Modified-Since'] = entry.last_modified
+        response, content = self._send(url, headers=headers)
+        etag = response.get('etag', '')
+        last_modified = response.get('last-modified', '')
+
+        if entry is not None and response.status == 304:
+            self._user_cache.revalidate(entry, etag, last_modified)
+            self._record_user_cache('revalidated')
+            return entry.value
+
+        digest = hashlib.blake2b(content, digest_size=16).digest()
+        if entry is not None and response.status == 200 and digest == entry.digest:
+            self._user_cache.revalidate(entry, etag, last_modified)
+            self._record_user_cache('revalidated')
+            return entry.value
+
+        self._record_user_cache('miss')
+        result = json.loads(content)
+        if response.status == 200 and isinstance(result, dict) and 'error' not in result:
+            self._user_cache.set(user_id, result, etag, last_modified, digest)
+        else:
+            self._user_cache.pop(user_id)
+            _remember_not_found('user', user_id, response.status, result)
+        return result
 
-        consumer = oauth2.Consumer(self.api_key, self.api_secret)
-        token = oauth2.Token(self.token, self.token_secret)
-        client = oauth2.Client(consumer, token)
+    def user_info_age(self, user_id: str = '') -> Optional[float]:
+        """返回用户资料缓存距上次从服务端获取或验证的秒数，没有缓存时返回 None"""
+        entry = self._user_cache.get(user_id or self.user_id)
+        return entry.age if entry is not None else None
 
-        response, content = client.request(url)
-        return json.loads(content)
+    def _forget_user_info(self, user_id: str) -> None:
+        """用户资料已知发生变化（关注、发布、删除等），丢弃缓存"""
+        self._user_cache.pop(user_id)
+
+    def _forget_own_statuses(self) -> None:
+        """
+        当前用户发布或删除了内容，丢弃首页时间线和当前用户资料（发布数）的缓存
+
+        在请求完成后调用（请求失败时同样调用，饭否可能已经处理了请求）；
+        清空前开始的读取、后台刷新和预取完成后不会把旧数据写回缓存（见 SWRCache.clear）
+        """
+        self._home_timeline_cache.clear()
+        self._forget_user_info(self.user_id)
+
+    @staticmethod
+    def _record_user_cache(result: str) -> None:
+        tracing.annotate('cache.user', result)
+        metrics.cache_requests.inc(cache='user', result=result)
 
+    @tracing.traced
     def get_status_info(self, status_id: str) -> Dict[str, Any]:
         """
         获取某条饭否内容的具体信息
         
         status_id 为饭否内容的 ID
+        
+        不存在或已删除的内容在 NOT_FOUND_CACHE_TTL 秒内直接返回上次的错误响应
         """
-        print('------ get_status_info ------')
+        not_found = _cached_not_found('status', status_id)
+        if not_found is not None:
+            return not_found
         
-        url = f"http://api.fanfou.com/statuses/show/{status_id}.json?format=html"
-
-        consumer = oauth2.Consumer(self.api_key, self.api_secret)
-        token = oauth2.Token(self.token, self.token_secret)
-        client = oauth2.Client(consumer, token)
-
-        response, content = client.request(url)
-        return json.loads(content)
+        url = f"{API_BASE}/statuses/show/{status_id}.json?format=html"
+        response, content = self._send(url)
+        result = json.loads(content)
+        _remember_not_found('status', status_id, response.status, result)
+        return result
 
+    @tracing.traced
     def manage_favorite(self, status_id: str, action: str) -> Dict[str, Any]:
         """
         管理饭否内容的收藏状态
@@ -205,20 +741,14 @@ class FanFou:
         status_id 为饭否内容的 ID
         action 为操作类型：'create' 表示收藏，'destroy' 表示取消收藏
         """
-        print(f'------ manage_favorite ({action}) ------')
-        
         if action not in ['create', 'destroy']:
             raise ValueError("action 参数必须是 'create' 或 'destroy'")
         
-        url = f"http://api.fanfou.com/favorites/{action}/{status_id}.json"
+        url = f"{API_BASE}/favorites/{action}/{status_id}.json"
 
-        consumer = oauth2.Consumer(self.api_key, self.api_secret)
-        token = oauth2.Token(self.token, self.token_secret)
-        client = oauth2.Client(consumer, token)
-
-        response, content = client.request(url, method='POST')
-        return json.loads(content) 
+        return self._request(url, method='POST') 
 
+    @tracing.traced
     def manage_friendship(self, user_id: str, action: str) -> Dict[str, Any]:
         """
         管理用户关注状态
@@ -226,155 +756,195 @@ class FanFou:
         user_id 为目标用户 ID
         action 为操作类型：'create' 表示关注，'destroy' 表示取消关注
         """
-        print(f'------ manage_friendship ({action}) ------')
-        
         if action not in ['create', 'destroy']:
             raise ValueError("action 参数必须是 'create' 或 'destroy'")
         
-        url = f"http://api.fanfou.com/friendships/{action}.json"
+        url = f"{API_BASE}/friendships/{action}.json"
         params = {'id': user_id}
 
-        consumer = oauth2.Consumer(self.api_key, self.api_secret)
-        token = oauth2.Token(self.token, self.token_secret)
-        client = oauth2.Client(consumer, token)
+        # 目标用户的 following、粉丝数和当前用户的关注数都会变化
+        self._forget_user_info(user_id)
+        self._forget_user_info(self.user_id)
+        return self._request(url, method='POST', body=urllib.parse.urlencode(params))
+
+    def _map_concurrent(self, fn, items: List[str], rate_limiter: Optional[RateLimiter] = None) -> List[Tuple[str, Any]]:
+        """
+        以最多 BULK_CONCURRENCY 个并发请求对每一项调用 fn
+        
+        返回与 items 顺序一致的 [(item, 结果或异常)]，单项失败不影响其他项
+        """
+        if len(items) > BULK_MAX_ITEMS:
+            raise ValueError(f"单次最多处理 {BULK_MAX_ITEMS} 项")
+        
+        def call(item):
+            if rate_limiter is not None:
+                rate_limiter.acquire()
+            try:
+                return fn(item)
+            except Exception as e:
+                return e
+        
+        if len(items) <= 1:
+            return [(item, call(item)) for item in items]
+        
+        from concurrent.futures import ThreadPoolExecutor
+        with ThreadPoolExecutor(max_workers=min(BULK_CONCURRENCY, len(items)), thread_name_prefix='fanfou-bulk') as executor:
+            # 在当前线程为每一项绑定上下文，工作线程中的 span 归属到当前 span 下
+            calls = [tracing.bind_context(functools.partial(call, item)) for item in items]
+            return list(zip(items, executor.map(lambda bound: bound(), calls)))
+
+    @tracing.traced
+    def get_statuses_info(self, status_ids: List[str]) -> List[Tuple[str, Any]]:
+        """
+        批量获取饭否内容信息
+        
+        饭否 API 没有批量查询接口，这里并发调用 get_status_info，返回 [(status_id, 内容信息或异常)]
+        """
+        return self._map_concurrent(self.get_status_info, status_ids)
 
-        response, content = client.request(url, method='POST', body=urllib.parse.urlencode(params))
-        return json.loads(content) 
+    @tracing.traced
+    def get_users_info(self, user_ids: List[str]) -> List[Tuple[str, Any]]:
+        """批量获取用户信息，返回 [(user_id, 用户信息或异常)]"""
+        return self._map_concurrent(self.get_user_info, user_ids)
+
+    @tracing.traced
+    def manage_favorites(self, status_ids: List[str], action: str) -> List[Tuple[str, Any]]:
+        """
+        批量收藏或取消收藏
+        
+        写操作受 write_rate_limiter 限流，返回 [(status_id, 操作结果或异常)]
+        """
+        if action not in ['create', 'destroy']:
+            raise ValueError("action 参数必须是 'create' 或 'destroy'")
+        return self._map_concurrent(lambda status_id: self.manage_favorite(status_id, action),
+                                    status_ids, rate_limiter=write_rate_limiter)
 
+    @tracing.traced
+    def manage_friendships(self, user_ids: List[str], action: str) -> List[Tuple[str, Any]]:
+        """
+        批量关注或取消关注
+        
+        写操作受 write_rate_limiter 限流，返回 [(user_id, 操作结果或异常)]
+        """
+        if action not in ['create', 'destroy']:
+            raise ValueError("action 参数必须是 'create' 或 'destroy'")
+        return self._map_concurrent(lambda user_id: self.manage_friendship(user_id, action),
+                                    user_ids, rate_limiter=write_rate_limiter)
+
+    @tracing.traced
     def publish_status(self, status: str) -> Dict[str, Any]:
         """
         发布饭否内容（仅文字）
         
         status 为要发布的文字内容（最多140字）
         """
-        print('------ publish_status ------')
-        
         if len(status) > 140:
             raise ValueError("饭否内容不能超过140字")
         
-        url = "http://api.fanfou.com/statuses/update.json"
+        url = f"{API_BASE}/statuses/update.json"
         params = {'status': status}
 
-        consumer = oauth2.Consumer(self.api_key, self.api_secret)
-        token = oauth2.Token(self.token, self.token_secret)
-        client = oauth2.Client(consumer, token)
-
-        response, content = client.request(url, method='POST', body=urllib.parse.urlencode(params))
-        return json.loads(content)
+        try:
+            return self._request(url, method='POST', body=urllib.parse.urlencode(params))
+        finally:
+            self._forget_own_statuses()
 
-    def publish_photo(self, status: str, photo_url: str) -> Dict[str, Any]:
+    @tracing.traced
+    def publish_photo(self, status: str, photo_url: str, allow_local_files: bool = False) -> Dict[str, Any]:
         """
         发布饭否内容（文字+图片）
         
         status 为要发布的文字内容（最多140字）
-        photo_url 为图片的网络 URL 地址
+        photo_url 为图片来源，支持：
+        - 图片的网络 URL 地址（最近通过 get_status_info 获取过的图片直接使用缓存，不重复下载）
+        - base64 编码的 data URL（data:image/png;base64,...）
+        - 本地文件路径或 file:// URL（需要 allow_local_files=True）
         """
-        print('------ publish_photo ------')
-        
         if len(status) > 140:
             raise ValueError("饭否内容不能超过140字")
         
-        # 下载图片
-        import requests
-        try:
-            print(f"正在下载图片: {photo_url}")
-            response = requests.get(photo_url, timeout=30)
-            response.raise_for_status()
-            photo_data = response.content
+        with self._open_photo(photo_url, allow_local_files) as (photo_file, photo_size, mime_type):
+            url = f"{API_BASE}/photos/upload.json"
             
-            # 获取图片的 MIME 类型
-            content_type = response.headers.get('content-type', '')
-            if content_type.startswith('image/'):
-                mime_type = content_type
+            # 根据 MIME 类型确定文件扩展名
+            if 'png' in mime_type:
+                filename = 'image.png'
+            elif 'gif' in mime_type:
+                filename = 'image.gif'
+            elif 'bmp' in mime_type:
+                filename = 'image.bmp'
+            elif 'webp' in mime_type:
+                filename = 'image.webp'
             else:
-                # 根据 URL 扩展名猜测 MIME 类型
-                import mimetypes
-                mime_type, _ = mimetypes.guess_type(photo_url)
-                if mime_type is None or not mime_type.startswith('image/'):
-                    mime_type = 'image/jpeg'  # 默认为 JPEG
+                filename = 'image.jpg'
             
-        except requests.exceptions.RequestException as e:
-            raise ValueError(f"无法下载图片: {str(e)}")
-        except Exception as e:
-            raise ValueError(f"下载图片时发生错误: {str(e)}")
-        
-        # 检查图片大小（饭否图片限制通常为5MB）
-        if len(photo_data) > 5 * 1024 * 1024:  # 5MB
-            raise ValueError("图片文件过大，请选择小于5MB的图片")
-        
-        # 检查是否为有效的图片数据
-        if len(photo_data) < 100:  # 太小的文件可能不是有效图片
-            raise ValueError("下载的文件可能不是有效的图片")
-        
-        url = "http://api.fanfou.com/photos/upload.json"
-        
-        # 构建multipart/form-data格式的数据
-        import uuid
-        
-        # 生成边界标识符
-        boundary = f"----formdata-{uuid.uuid4().hex}"
-        
-        # 构建multipart数据
-        body_parts = []
-        
-        # 添加status字段
-        body_parts.append(f'--{boundary}')
-        body_parts.append('Content-Disposition: form-data; name="status"')
-        body_parts.append('Content-Type: text/plain')
-        body_parts.append('')
-        body_parts.append(status)
-        
-        # 添加photo字段
-        # 根据 MIME 类型确定文件扩展名
-        if 'png' in mime_type:
-            filename = 'image.png'
-        elif 'gif' in mime_type:
-            filename = 'image.gif'
-        elif 'bmp' in mime_type:
-            filename = 'image.bmp'
-        elif 'webp' in mime_type:
-            filename = 'image.webp'
-        else:
-            filename = 'image.jpg'
-            
-        body_parts.append(f'--{boundary}')
-        body_parts.append(f'Content-Disposition: form-data; name="photo"; filename="{filename}"')
-        body_parts.append(f'Content-Type: {mime_type}')
-        body_parts.append('')
-        
-        # 将文本部分合并
-        body_text = '\r\n'.join(body_parts) + '\r\n'
-        
-        # 构建完整的body（文本 + 图片数据 + 结束边界）
-        body = body_text.encode('utf-8') + photo_data + f'\r\n--{boundary}--\r\n'.encode('utf-8')
+            # 流式构建 multipart/form-data 请求体，发送时按块读取
+            body = MultipartStream([('status', status)], 'photo', filename, mime_type, photo_file, photo_size)
+            try:
+                return self._post_stream(url, body)
+            finally:
+                self._forget_own_statuses()
+
+    @contextlib.contextmanager
+    def _open_photo(self, photo_url: str, allow_local_files: bool) -> Iterator[Tuple[BinaryIO, int, str]]:
+        """
+        打开要上传的图片，返回 (文件对象, 字节数, MIME 类型)
         
-        # 设置请求头
-        headers = {
-            'Content-Type': f'multipart/form-data; boundary={boundary}',
-            'Content-Length': str(len(body))
-        }
-
-        consumer = oauth2.Consumer(self.api_key, self.api_secret)
-        token = oauth2.Token(self.token, self.token_secret)
-        client = oauth2.Client(consumer, token)
-
-        response, content = client.request(url, method='POST', body=body, headers=headers)
-        return json.loads(content) 
+        本地文件直接分块读取，缓存中的图片直接使用内存数据，其余来源写入临时文件。
+        开启 FANFOU_PHOTO_RECOMPRESS 时，过大的图片会先压缩再返回。
+        """
+        limit = _photo_input_limit()
+        kind = photo_source_kind(photo_url)
+        if kind is None:
+            raise ValueError("无效的图片来源，请提供图片 URL、data URL 或本地文件路径")
+        
+        if kind == 'file':
+            if not allow_local_files:
+                raise ValueError("当前服务不支持读取本地文件，请提供图片 URL 或 data URL")
+            path = local_photo_path(photo_url)
+            try:
+                photo_file = open(path, 'rb')
+            except OSError as e:
+                raise ValueError(f"无法读取本地图片: {str(e)}")
+            with photo_file:
+                photo_size = os.fstat(photo_file.fileno()).st_size
+                mime_type = _check_photo(photo_file.read(IMAGE_SIGNATURE_SIZE), photo_size, limit)
+                yield _recompress_photo(photo_file, photo_size, mime_type)
+            return
+        
+        if kind == 'url':
+            cached = image_cache.get(photo_url)
+            if cached is not None:
+                logger.debug("使用缓存的图片: %s", photo_url)
+                photo_data = cached[0]
+                mime_type = _check_photo(photo_data[:IMAGE_SIGNATURE_SIZE], len(photo_data), limit)
+                yield _recompress_photo(io.BytesIO(photo_data), len(photo_data), mime_type)
+                return
+        
+        # 网络图片和 data URL 分块写入临时文件，超过 PHOTO_SPOOL_SIZE 的部分落盘，不在内存中保留完整图片
+        import tempfile
+        with tempfile.SpooledTemporaryFile(max_size=PHOTO_SPOOL_SIZE) as photo_file:
+            if kind == 'data':
+                with tracing.span('image.decode_data_url') as span:
+                    photo_size, mime_type = _decode_data_url(photo_url, photo_file, limit)
+            else:
+                with tracing.span('image.download', **{'http.url': photo_url}) as span:
+                    photo_size, mime_type = _download_photo(photo_url, photo_file, limit)
+            span.set_attribute('bytes', photo_size)
+            span.set_attribute('mime_type', mime_type)
+            yield _recompress_photo(photo_file, photo_size, mime_type)
 
+    @tracing.traced
     def delete_status(self, status_id: str) -> Dict[str, Any]:
         """
         删除饭否内容
         
         status_id 为要删除的饭否内容的 ID
         """
-        print('------ delete_status ------')
-        
-        url = "http://api.fanfou.com/statuses/destroy.json"
+        url = f"{API_BASE}/statuses/destroy.json"
         params = {'id': status_id}
 
-        consumer = oauth2.Consumer(self.api_key, self.api_secret)
-        token = oauth2.Token(self.token, self.token_secret)
-        client = oauth2.Client(consumer, token)
-
-        response, content = client.request(url, method='POST', body=urllib.parse.urlencode(params))
-        return json.loads(content) 
\ No newline at end of file
+        try:
+            return self._request(url, method='POST', body=urllib.parse.urlencode(params))
+        finally:
+            self._forget_own_statuses() 
\ No newline at end of file
@@ -0,0 +1,108 @@
+#!/usr/bin/env python3
+"""
+HTTP 中间件模块
+
+SSE / streamable HTTP 传输方式使用的 ASGI 中间件：
+- BodySizeLimitMiddleware: 限制请求体大小，超出时返回 413，不再继续读取请求体
+- 响应压缩：客户端声明 Accept-Encoding: gzip 时压缩响应（starlette GZipMiddleware，SSE 事件流不压缩），
+  小于 FANFOU_GZIP_MIN_SIZE 字节的响应不压缩
+
+main.py（SSE / HTTP 传输方式）和 app.py（Gradio）共用
+"""
+
+import os
+from typing import Any, Dict, List, Optional
+
+import log
+
+logger = log.get_logger('http_middleware')
+
+# 压缩的最小响应字节数和压缩级别（1~9，级别越高压缩率越高、CPU 开销越大）
+GZIP_MIN_SIZE = int(os.getenv('FANFOU_GZIP_MIN_SIZE', '1024'))
+GZIP_LEVEL = int(os.getenv('FANFOU_GZIP_LEVEL', '6'))
+
+
+class _BodyTooLarge(Exception):
+    pass
+
+
+class BodySizeLimitMiddleware:
+    """
+    限制请求体大小
+
+    声明了 Content-Length 的请求在读取请求体之前检查；分块传输的请求在读取过程中累计检查，
+    超出时中断读取，响应尚未开始则返回 413
+    """
+
+    def __init__(self, app: Any, max_body_size: int):
+        self.app = app
+        self.max_body_size = max_body_size
+
+    async def __call__(self, scope: Dict[str, Any], receive: Any, send: Any) -> None:
+        if scope['type'] != 'http' or self.max_body_size <= 0:
+            await self.app(scope, receive, send)
+            return
+
+        for name, value in scope.get('headers', []):
+            if name == b'content-length':
+                try:
+                    too_large = int(value) > self.max_body_size
+                except ValueError:
+                    too_large = False
+                if too_large:
+                    await self._reject(scope, send)
+                    return
+                break
+
+        received = 0
+        response_started = False
+
+        async def limited_receive() -> Dict[str, Any]:
+            nonlocal received
+            message = await receive()
+            if message['type'] == 'http.request':
+                received += len(message.get('body', b''))
+                if received > self.max_body_size:
+                    raise _BodyTooLarge()
+            return message
+
+        async def tracking_send(message: Dict[str, Any]) -> None:
+            nonlocal response_started
+            if message['type'] == 'http.response.start':
+                response_started = True
+            await send(message)
+
+        try:
+            await self.app(scope, limited_receive, tracking_send)
+        except _BodyTooLarge:
+            if response_started:
+                raise
+            await self._reject(scope, send)
+
+    async def _reject(self, scope: Dict[str, Any], send: Any) -> None:
+        from starlette.responses import JSONResponse
+
+        logger.warning("请求体超过 %d 字节，已拒绝: %s", self.max_body_size, scope.get('path', ''))
+        response = JSONResponse({'error': f'请求体超过 {self.max_body_size} 字节'}, status_code=413)
+        await response(scope, self._drain, send)
+
+    @staticmethod
+    async def _drain() -> Dict[str, Any]:
+        return {'type': 'http.disconnect'}
+
+
+def http_middleware(max_body_size: int, gzip: bool, gzip_min_size: Optional[int] = None) -> List[Any]:
+    """返回 starlette 中间件列表（传给 FastMCP.http_app 或 Gradio 的 FastAPI 应用）"""
+    from starlette.middleware import Middleware
+
+    middleware = []
+    if gzip:
+        from starlette.middleware.gzip import GZipMiddleware
+        middleware.append(Middleware(
+            GZipMiddleware,
+            minimum_size=GZIP_MIN_SIZE if gzip_min_size is None else gzip_min_size,
+            compresslevel=GZIP_LEVEL
+        ))
+    if max_body_size > 0:
+        middleware.append(Middleware(BodySizeLimitMiddleware, max_body_size=max_body_size))
+    return middleware
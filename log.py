@@ -0,0 +1,82 @@
+#!/usr/bin/env python3
+"""
+日志模块
+
+所有模块通过 get_logger 获取 fanfou_mcp 下的子 logger，日志写入 stderr 或文件，不占用 stdout
+（stdio 模式下 stdout 是 MCP 协议通道）。
+
+- FANFOU_LOG_LEVEL: 日志级别，默认 INFO
+- FANFOU_LOG_FILE: 日志文件路径，默认写入 stderr
+- FANFOU_LOG_FORMAT: text（默认）或 json
+
+结构化字段通过 extra={'fields': {...}} 传入，text 格式追加为 key=value，json 格式合并到输出对象中。
+调试日志较多的路径用 `if log.DEBUG:` 判断，级别高于 DEBUG 时不会构造日志参数。
+"""
+
+import json
+import logging
+import os
+import sys
+
+LOG_LEVEL = os.getenv('FANFOU_LOG_LEVEL', 'INFO').upper()
+LOG_FILE = os.getenv('FANFOU_LOG_FILE', '')
+LOG_FORMAT = os.getenv('FANFOU_LOG_FORMAT', 'text').lower()
+
+logger = logging.getLogger('fanfou_mcp')
+
+
+class TextFormatter(logging.Formatter):
+    """文本格式，结构化字段追加为 key=value"""
+
+    def __init__(self):
+        super().__init__('%(asctime)s %(levelname)s %(name)s: %(message)s')
+
+    def format(self, record: logging.LogRecord) -> str:
+        message = super().format(record)
+        fields = getattr(record, 'fields', None)
+        if fields:
+            message += ' ' + ' '.join(f'{key}={value}' for key, value in fields.items())
+        return message
+
+
+class JSONFormatter(logging.Formatter):
+    """每条日志输出一行 JSON"""
+
+    def format(self, record: logging.LogRecord) -> str:
+        data = {
+            'time': self.formatTime(record),
+            'level': record.levelname,
+            'logger': record.name,
+            'message': record.getMessage(),
+        }
+        fields = getattr(record, 'fields', None)
+        if fields:
+            data.update(fields)
+        if record.exc_info:
+            data['exception'] = self.formatException(record.exc_info)
+        return json.dumps(data, ensure_ascii=False, default=str)
+
+
+def _configure() -> None:
+    if logger.handlers:
+        return
+    if LOG_FILE:
+        handler: logging.Handler = logging.FileHandler(LOG_FILE, encoding='utf-8')
+    else:
+        handler = logging.StreamHandler(sys.stderr)
+    handler.setFormatter(JSONFormatter() if LOG_FORMAT == 'json' else TextFormatter())
+    logger.addHandler(handler)
+    logger.setLevel(getattr(logging, LOG_LEVEL, logging.INFO))
+    # 不传递给 root logger，避免宿主程序的日志配置把日志写到 stdout
+    logger.propagate = False
+
+
+_configure()
+
+# 是否输出调试日志，启动时确定
+DEBUG = logger.isEnabledFor(logging.DEBUG)
+
+
+def get_logger(name: str) -> logging.Logger:
+    """获取模块的 logger，例如 get_logger('fanfou_client')"""
+    return logger.getChild(name)
@@ -6,19 +6,96 @@
 该 MCP 服务器提供了饭否 API 的核心功能，包括时间线获取和 OAuth 认证管理。
 """
 
+import functools
+import inspect
 import os
-from typing import Optional, List, Dict, Any
+import threading
+import time
+from typing import TYPE_CHECKING, Optional, List, Dict, Any
 from fastmcp import FastMCP
-from fanfou_client import FanFou
-from utils import image_url_to_base64
+from fastmcp.server.middleware import Middleware
+import log
+import metrics
+from cache import TTLCache
+
+# fanfou_client（oauth2/httplib2）和 utils（requests）在首次使用时再导入，
+# stdio 模式下每次会话都会启动新进程，导入耗时直接影响启动速度
+if TYPE_CHECKING:
+    from fanfou_client import FanFou
+    from publish_queue import PublishQueue
+
+logger = log.get_logger('main')
+
+class MetricsMiddleware(Middleware):
+    """记录每次工具调用的耗时和结果（工具以返回 {"error": ...} 的方式报告失败）"""
+    
+    async def on_call_tool(self, context, call_next):
+        with metrics.track_tool_call(context.message.name) as call:
+            result = await call_next(context)
+            if metrics.is_error_result(getattr(result, 'structured_content', None)):
+                call.failed()
+            return result
 
 # 创建 MCP 服务器实例
 mcp = FastMCP("饭否 MCP 服务器", instructions="饭否是一款基于 Web 的微博客服务，用户可以发布 140 字以内的消息，并可以关注其他用户。该 MCP 服务器提供了诸多饭否 API 的工具。")
+mcp.add_middleware(MetricsMiddleware())
+
+@mcp.custom_route("/metrics", methods=["GET"], include_in_schema=False)
+async def metrics_endpoint(request):
+    """Prometheus 文本格式的指标（仅 SSE / HTTP 传输方式可访问）"""
+    from starlette.responses import PlainTextResponse
+    return PlainTextResponse(metrics.registry.render(), media_type=metrics.CONTENT_TYPE)
 
 # 全局 FanFou 实例
-_fanfou_client: Optional[FanFou] = None
+_fanfou_client: Optional["FanFou"] = None
+_fanfou_client_lock = threading.Lock()
+
+# 启动预热：FANFOU_WARMUP=1 时在后台创建客户端并预取时间线
+# FANFOU_PREFETCH_INTERVAL > 0 时按该间隔（秒）持续刷新预取的时间线
+WARMUP_ENABLED = os.getenv('FANFOU_WARMUP', '').lower() in ('1', 'true', 'yes')
+PREFETCH_INTERVAL = float(os.getenv('FANFOU_PREFETCH_INTERVAL', '0'))
+PREFETCH_COUNT = int(os.getenv('FANFOU_PREFETCH_COUNT', '5'))
+
+# 发布队列：FANFOU_PUBLISH_QUEUE=1 时确认发布后只将任务写入本地队列并立即返回任务 ID，
+# 由后台线程按限流速率发布，失败时自动重试
+PUBLISH_QUEUE_ENABLED = os.getenv('FANFOU_PUBLISH_QUEUE', '').lower() in ('1', 'true', 'yes')
+PUBLISH_QUEUE_PATH = os.getenv('FANFOU_PUBLISH_QUEUE_PATH', os.path.join(os.path.expanduser('~'), '.fanfou-mcp', 'publish_queue.db'))
+PUBLISH_RATE = float(os.getenv('FANFOU_PUBLISH_RATE', '6'))  # 每分钟最多发布的条数
+PUBLISH_BURST = int(os.getenv('FANFOU_PUBLISH_BURST', '3'))
+PUBLISH_MAX_ATTEMPTS = int(os.getenv('FANFOU_PUBLISH_MAX_ATTEMPTS', '3'))
+PUBLISH_RETRY_DELAY = float(os.getenv('FANFOU_PUBLISH_RETRY_DELAY', '5'))
+
+_publish_queue: Optional["PublishQueue"] = None
+_publish_queue_lock = threading.Lock()
+
+# 传输方式：stdio（默认）、sse 或 http（streamable HTTP），命令行参数优先于环境变量（见 parse_args）
+# FANFOU_WORKERS > 1 时以多个工作进程运行 HTTP 服务，每个进程各自创建客户端，图片缓存通过 FANFOU_CACHE_DIR 共享
+TRANSPORTS = ('stdio', 'sse', 'http')
+TRANSPORT = os.getenv('FANFOU_TRANSPORT', 'stdio').lower()
+HTTP_HOST = os.getenv('FANFOU_HOST', '127.0.0.1')
+HTTP_PORT = int(os.getenv('FANFOU_PORT', '8000'))
+HTTP_WORKERS = int(os.getenv('FANFOU_WORKERS', '1'))
+GRACEFUL_TIMEOUT = float(os.getenv('FANFOU_GRACEFUL_TIMEOUT', '30'))
+# HTTP 服务调优：同时处理的连接和请求数上限（超出返回 503，0 不限制）、keep-alive 空闲超时（秒）、
+# 请求体大小上限（字节，超出返回 413，0 不限制）、响应压缩
+HTTP_CONCURRENCY = int(os.getenv('FANFOU_HTTP_CONCURRENCY', '0'))
+HTTP_KEEP_ALIVE = float(os.getenv('FANFOU_HTTP_KEEP_ALIVE', '5'))
+HTTP_MAX_BODY_SIZE = int(os.getenv('FANFOU_HTTP_MAX_BODY_SIZE', str(16 * 1024 * 1024)))
+HTTP_GZIP = os.getenv('FANFOU_HTTP_GZIP', '').lower() in ('1', 'true', 'yes')
+# SSE / HTTP 方式下同步工具在工作线程中执行，同时执行的工具数等于 HTTP_CONCURRENCY，不限制时使用 anyio 的默认线程数
+DEFAULT_TOOL_THREADS = 40
+DEFAULT_CACHE_DIR = os.path.join(os.path.expanduser('~'), '.fanfou-mcp', 'cache')
+
+# 发布图片时读取服务器本地文件：只有以 stdio 方式运行（MCP 客户端在本机启动服务器）时允许（见 main）；
+# SSE / HTTP 方式下任何网络调用方都可以借此上传服务器上的文件，需设置 FANFOU_ALLOW_LOCAL_FILES=1 明确开启
+ALLOW_LOCAL_FILES = os.getenv('FANFOU_ALLOW_LOCAL_FILES', '').lower() in ('1', 'true', 'yes')
+_local_files_allowed = ALLOW_LOCAL_FILES
+
+# 确认令牌：预览时获取的内容或用户信息保存在服务端，确认时凭令牌直接复用，不再重复请求饭否 API
+CONFIRM_TOKEN_TTL = float(os.getenv('FANFOU_CONFIRM_TOKEN_TTL', '300'))
+_confirm_tokens = TTLCache(ttl=CONFIRM_TOKEN_TTL, max_entries=1024)
 
-def get_fanfou_client() -> FanFou:
+def get_fanfou_client() -> "FanFou":
     """
     获取饭否客户端实例
     
@@ -26,23 +103,48 @@ def get_fanfou_client() -> FanFou:
     支持自动生成和缓存 OAuth Token 以提高安全性和性能。
     """
     global _fanfou_client
-    if _fanfou_client is None:
-        # 从环境变量获取配置
-        api_key = os.getenv('FANFOU_API_KEY')
-        api_secret = os.getenv('FANFOU_API_SECRET')
-        oauth_token = os.getenv('FANFOU_OAUTH_TOKEN')
-        oauth_token_secret = os.getenv('FANFOU_OAUTH_TOKEN_SECRET')
-        username = os.getenv('FANFOU_USERNAME')
-        password = os.getenv('FANFOU_PASSWORD')
-        
-        if not all([api_key, api_secret]):
-            raise Exception("缺少必要的环境变量：FANFOU_API_KEY, FANFOU_API_SECRET")
-        
-        # 检查是否缺少 OAuth Token
-        if not oauth_token or not oauth_token_secret:
-            if not username or not password:
-                # 既没有 OAuth Token 也没有用户名密码
-                error_msg = """
+    # 双重检查加锁：已创建时不加锁直接返回；并发的首次调用在锁上等待，只有一个会创建客户端
+    #（verify_credentials 只请求一次），创建失败时不保存，下一次调用重试
+    client = _fanfou_client
+    if client is not None:
+        return client
+    with _fanfou_client_lock:
+        if _fanfou_client is None:
+            _fanfou_client = _create_fanfou_client()
+        return _fanfou_client
+
+async def get_fanfou_client_async() -> "FanFou":
+    """
+    获取饭否客户端实例（异步工具使用）
+    
+    客户端已创建时直接返回；否则在工作线程中调用 get_fanfou_client，创建期间不阻塞事件循环
+    """
+    client = _fanfou_client
+    if client is not None:
+        return client
+    import anyio
+    return await anyio.to_thread.run_sync(get_fanfou_client)
+
+def _create_fanfou_client() -> "FanFou":
+    """按环境变量中的认证信息创建饭否客户端"""
+    from fanfou_client import FanFou
+    
+    # 从环境变量获取配置
+    api_key = os.getenv('FANFOU_API_KEY')
+    api_secret = os.getenv('FANFOU_API_SECRET')
+    oauth_token = os.getenv('FANFOU_OAUTH_TOKEN')
+    oauth_token_secret = os.getenv('FANFOU_OAUTH_TOKEN_SECRET')
+    username = os.getenv('FANFOU_USERNAME')
+    password = os.getenv('FANFOU_PASSWORD')
+    
+    if not all([api_key, api_secret]):
+        raise Exception("缺少必要的环境变量：FANFOU_API_KEY, FANFOU_API_SECRET")
+    
+    # 检查是否缺少 OAuth Token
+    if not oauth_token or not oauth_token_secret:
+        if not username or not password:
+            # 既没有 OAuth Token 也没有用户名密码
+            error_msg = """
 ⚠️  缺少认证信息！
 
 请设置以下环境变量之一：
@@ -56,11 +158,11 @@ def get_fanfou_client() -> FanFou:
 - FANFOU_OAUTH_TOKEN_SECRET
 
 🔧 如果您是首次使用，请先设置用户名密码，然后我会帮助您生成 OAuth Token。
-                """
-                raise Exception(error_msg.strip())
-            else:
-                # 有用户名密码，但没有 OAuth Token，拦截并要求先生成
-                error_msg = """
+            """
+            raise Exception(error_msg.strip())
+        else:
+            # 有用户名密码，但没有 OAuth Token，拦截并要求先生成
+            error_msg = """
 🔑 检测到缺少 OAuth Token！
 
 为了安全和性能考虑，我将帮助您生成 OAuth Token：
@@ -72,14 +174,73 @@ def get_fanfou_client() -> FanFou:
 3. 然后即可正常使用所有功能
 
 💡 OAuth Token 方式更安全且避免重复登录。
-                """
-                raise Exception(error_msg.strip())
-        else:
-            # 有 OAuth Token，直接使用
-            print("✅ 使用缓存的 OAuth Token")
-            _fanfou_client = FanFou(api_key, api_secret, oauth_token=oauth_token, oauth_token_secret=oauth_token_secret)
+            """
+            raise Exception(error_msg.strip())
+    else:
+        # 有 OAuth Token，直接使用
+        logger.debug("使用缓存的 OAuth Token")
+        return FanFou(api_key, api_secret, oauth_token=oauth_token, oauth_token_secret=oauth_token_secret)
+
+def _publish_job(kind: str, payload: Dict[str, Any]) -> Dict[str, Any]:
+    """发布队列中的任务，饭否 API 返回错误时抛出 ValueError（不重试）"""
+    client = get_fanfou_client()
+    if kind == 'photo':
+        raw_data = client.publish_photo(payload['status'], payload['photo_url'], allow_local_files=_local_files_allowed)
+    else:
+        raw_data = client.publish_status(payload['status'])
     
-    return _fanfou_client
+    if isinstance(raw_data, dict) and raw_data.get('error'):
+        raise ValueError(raw_data['error'])
+    return raw_data
+
+def get_publish_queue() -> "PublishQueue":
+    """获取发布队列，首次调用时创建并启动后台发布线程"""
+    global _publish_queue
+    if _publish_queue is None:
+        with _publish_queue_lock:
+            if _publish_queue is None:
+                from publish_queue import PublishQueue
+                from rate_limiter import RateLimiter
+                
+                queue = PublishQueue(
+                    PUBLISH_QUEUE_PATH,
+                    _publish_job,
+                    rate_limiter=RateLimiter(PUBLISH_RATE / 60, PUBLISH_BURST),
+                    max_attempts=PUBLISH_MAX_ATTEMPTS,
+                    retry_delay=PUBLISH_RETRY_DELAY
+                )
+                queue.start()
+                _publish_queue = queue
+    return _publish_queue
+
+def _queued_result(job_id: str) -> Dict[str, Any]:
+    """发布任务入队后的返回结果"""
+    return {
+        "任务 ID": job_id,
+        "任务状态": "排队中",
+        "发布结果": "已加入发布队列，将在后台发布",
+        "查询提示": f"调用 get_publish_job('{job_id}') 查看发布结果"
+    }
+
+def _issue_confirm_token(operation: str, target: str, data: Dict[str, Any]) -> str:
+    """保存预览时获取的数据，返回一次性的确认令牌"""
+    import secrets
+    token = secrets.token_urlsafe(16)
+    _confirm_tokens.set(token, (operation, target, data))
+    return token
+
+def _redeem_confirm_token(confirm_token: str, operation: str, target: str) -> Optional[Dict[str, Any]]:
+    """
+    使用确认令牌，返回预览时保存的数据
+    
+    令牌只能使用一次；不存在、已过期或与本次操作不匹配时返回 None，调用方需要重新获取数据
+    """
+    if not confirm_token:
+        return None
+    entry = _confirm_tokens.pop(confirm_token)
+    if entry is None or entry[0] != operation or entry[1] != target:
+        return None
+    return entry[2]
 
 @mcp.tool()
 def generate_oauth_token() -> Dict[str, str]:
@@ -112,11 +273,12 @@ def generate_oauth_token() -> Dict[str, str]:
             return {"error": "缺少用户名密码：FANFOU_USERNAME, FANFOU_PASSWORD"}
         
         # 创建临时客户端来生成 Token
-        print("🔑 正在生成 OAuth Token...")
+        logger.info("正在生成 OAuth Token")
+        from fanfou_client import FanFou
         temp_client = FanFou(api_key, api_secret, username=username, password=password)
         
         return {
-            "success": "OAuth Token 生成成功！请查看 MCP 输出并保存至环境变量（以 JSON 格式输出给用户）。",
+            "success": "OAuth Token 生成成功！请保存以下 Token 至环境变量（以 JSON 格式输出给用户）。",
             "oauth_token": temp_client.token,
             "oauth_token_secret": temp_client.token_secret,
             "instructions": "请将生成的 OAuth Token 保存到 MCP env 中，然后移除用户名密码配置。"
@@ -310,10 +472,13 @@ def get_user_info(user_id: str = '') -> Dict[str, Any]:
         - 是否关注: 当前用户是否关注该用户
         - 注册时间: 账号注册时间
         - 最新状态: 用户最新发布的消息信息
+        - 缓存时长（秒）: 资料距上次从饭否获取或验证的秒数，0 表示刚刚获取
     """
     try:
         client = get_fanfou_client()
         raw_data = client.get_user_info(user_id)
+        if "error" in raw_data:
+            return {"error": raw_data["error"]}
         
         # 解析并格式化用户信息
         user_info = {
@@ -346,6 +511,10 @@ def get_user_info(user_id: str = '') -> Dict[str, Any]:
         else:
             user_info["最新状态"] = None
         
+        # 资料距上次从饭否获取或验证的秒数（0 表示刚刚获取）
+        age = client.user_info_age(user_id)
+        user_info["缓存时长（秒）"] = round(age, 1) if age is not None else 0
+        
         return user_info
     except Exception as e:
         return {"error": str(e)}
@@ -380,6 +549,8 @@ def get_status_info(status_id: str) -> Dict[str, Any]:
     try:
         client = get_fanfou_client()
         raw_data = client.get_status_info(status_id)
+        if "error" in raw_data:
+            return {"error": raw_data["error"]}
         
         # 解析并格式化状态信息
         status_info = {
@@ -411,6 +582,7 @@ def get_status_info(status_id: str) -> Dict[str, Any]:
             
             # 将图片转换为base64，如果大图超过300KB则使用普通图片
             if large_url:
+                from utils import image_url_to_base64
                 image_base64 = image_url_to_base64(large_url, normal_url)
                 status_info["图片base64"] = image_base64
             else:
@@ -424,7 +596,7 @@ def get_status_info(status_id: str) -> Dict[str, Any]:
         return {"error": str(e)}
 
 @mcp.tool()
-def manage_favorite(status_id: str, action: str, confirm: bool = False) -> Dict[str, Any]:
+def manage_favorite(status_id: str, action: str, confirm: bool = False, confirm_token: str = '') -> Dict[str, Any]:
     """
     管理饭否内容的收藏状态
     
@@ -435,6 +607,7 @@ def manage_favorite(status_id: str, action: str, confirm: bool = False) -> Dict[
         status_id: 饭否内容的 ID
         action: 操作类型，"create" 表示收藏，"destroy" 表示取消收藏
         confirm: 是否确认操作（二次确认参数）
+        confirm_token: 预览时返回的确认令牌，确认时传入可复用预览获取的内容信息
         
     Returns:
         操作结果字典，包含：
@@ -445,6 +618,7 @@ def manage_favorite(status_id: str, action: str, confirm: bool = False) -> Dict[
         或者确认信息字典，包含：
         - 需要确认: 是否需要用户确认
         - 内容预览: 要操作的内容预览
+        - 确认令牌: 确认时传入 confirm_token，复用预览时获取的信息（一次性，默认 5 分钟内有效）
         - 确认提示: 如何进行确认的说明
     """
     try:
@@ -461,6 +635,8 @@ def manage_favorite(status_id: str, action: str, confirm: bool = False) -> Dict[
             try:
                 # 获取要操作的内容信息
                 status_info = client.get_status_info(status_id)
+                if "error" in status_info:
+                    raise Exception(status_info["error"])
                 
                 # 截取内容预览（最多50字）
                 content = status_info.get("text", "")
@@ -478,6 +654,8 @@ def manage_favorite(status_id: str, action: str, confirm: bool = False) -> Dict[
                 elif action == "destroy" and not current_favorited:
                     return {"error": "该内容尚未收藏"}
                 
+                confirm_token = _issue_confirm_token(f"favorite:{action}", status_id, {"内容预览": content_preview})
+                
                 return {
                     "需要确认": True,
                     "内容预览": content_preview,
@@ -486,8 +664,9 @@ def manage_favorite(status_id: str, action: str, confirm: bool = False) -> Dict[
                     "发布者": status_info.get("user", {}).get("name", ""),
                     "当前收藏状态": "已收藏" if current_favorited else "未收藏",
                     "操作类型": operation_name,
+                    "确认令牌": confirm_token,
                     "⚠️ 重要提示": f"即将{operation_name}此内容，请确认是否继续",
-                    "确认提示": f"如果确认{operation_name}这条饭否，请用户明确告诉我要{operation_name}，然后我会调用 manage_favorite('{status_id}', '{action}', confirm=True)",
+                    "确认提示": f"如果确认{operation_name}这条饭否，请用户明确告诉我要{operation_name}，然后我会调用 manage_favorite('{status_id}', '{action}', confirm=True, confirm_token='{confirm_token}')",
                     "🚫 绝对禁止": "AI助手不能自动确认操作，必须等待用户明确指示！"
                 }
                 
@@ -497,6 +676,7 @@ def manage_favorite(status_id: str, action: str, confirm: bool = False) -> Dict[
         
         # 只有当用户明确确认时才执行操作
         # 这里应该只有在用户明确要求操作时才会到达
+        preview = _redeem_confirm_token(confirm_token, f"favorite:{action}", status_id)
         raw_data = client.manage_favorite(status_id, action)
         
         # 解析操作结果
@@ -514,13 +694,15 @@ def manage_favorite(status_id: str, action: str, confirm: bool = False) -> Dict[
             "操作结果": success_msg,
             "操作类型": operation
         }
+        if preview is not None:
+            result["内容预览"] = preview["内容预览"]
         
         return result
     except Exception as e:
         return {"error": str(e)}
 
 @mcp.tool()
-def manage_friendship(user_id: str, action: str, confirm: bool = False) -> Dict[str, Any]:
+def manage_friendship(user_id: str, action: str, confirm: bool = False, confirm_token: str = '') -> Dict[str, Any]:
     """
     管理用户关注状态
     
@@ -529,12 +711,13 @@ def manage_friendship(user_id: str, action: str, confirm: bool = False) -> Dict[
     
     注意：在执行关注操作前，会先调用 get_user_info 查询目标用户信息，
     如果目标用户账号受保护（protected），关注操作将变为申请关注，
-    需要对方确认后才能生效。
+    需要对方确认后才能生效。确认时传入预览返回的确认令牌可复用已获取的用户信息，不再重复查询。
     
     Args:
         user_id: 目标用户的 ID
         action: 操作类型，"create" 表示关注，"destroy" 表示取消关注
         confirm: 是否确认操作（二次确认参数）
+        confirm_token: 预览时返回的确认令牌
         
     Returns:
         操作结果字典，包含：
@@ -547,6 +730,7 @@ def manage_friendship(user_id: str, action: str, confirm: bool = False) -> Dict[
         或者确认信息字典，包含：
         - 需要确认: 是否需要用户确认
         - 用户预览: 要操作的用户预览
+        - 确认令牌: 确认时传入 confirm_token，复用预览时获取的信息（一次性，默认 5 分钟内有效）
         - 确认提示: 如何进行确认的说明
     """
     try:
@@ -558,9 +742,13 @@ def manage_friendship(user_id: str, action: str, confirm: bool = False) -> Dict[
         
         client = get_fanfou_client()
         
-        # 先获取目标用户信息
+        # 先获取目标用户信息（确认时优先使用预览时保存的信息）
         try:
-            user_info = client.get_user_info(user_id)
+            user_info = _redeem_confirm_token(confirm_token, f"friendship:{action}", user_id) if confirm else None
+            if user_info is None:
+                user_info = client.get_user_info(user_id)
+                if "error" in user_info:
+                    raise Exception(user_info["error"])
             target_username = user_info.get("name", "")
             is_protected = user_info.get("protected", False)
             current_following = user_info.get("following", False)
@@ -582,6 +770,8 @@ def manage_friendship(user_id: str, action: str, confirm: bool = False) -> Dict[
             if action == "create" and is_protected:
                 special_note = "⚠️ 注意：该用户账号受保护，关注操作将变为申请关注，需要对方确认后才能生效"
             
+            confirm_token = _issue_confirm_token(f"friendship:{action}", user_id, user_info)
+            
             return {
                 "需要确认": True,
                 "用户预览": {
@@ -594,9 +784,10 @@ def manage_friendship(user_id: str, action: str, confirm: bool = False) -> Dict[
                 },
                 "当前关注状态": "已关注" if current_following else "未关注",
                 "操作类型": operation_name,
+                "确认令牌": confirm_token,
                 "⚠️ 重要提示": f"即将{operation_name}用户 {target_username}，请确认是否继续",
                 "特殊情况": special_note if special_note else None,
-                "确认提示": f"如果确认{operation_name}这个用户，请用户明确告诉我要{operation_name}，然后我会调用 manage_friendship('{user_id}', '{action}', confirm=True)",
+                "确认提示": f"如果确认{operation_name}这个用户，请用户明确告诉我要{operation_name}，然后我会调用 manage_friendship('{user_id}', '{action}', confirm=True, confirm_token='{confirm_token}')",
                 "🚫 绝对禁止": "AI助手不能自动确认操作，必须等待用户明确指示！"
             }
         
@@ -650,6 +841,131 @@ def manage_friendship(user_id: str, action: str, confirm: bool = False) -> Dict[
     except Exception as e:
         return {"error": str(e)}
 
+@mcp.tool()
+async def manage_favorites_bulk(status_ids: List[str], action: str, confirm: bool = False) -> Dict[str, Any]:
+    """
+    批量管理饭否内容的收藏状态
+    
+    一次收藏或取消收藏多条饭否内容。未确认时并发获取所有内容信息并生成一份汇总预览，
+    已经处于目标状态或无法获取的内容会被跳过；确认后以有限的并发数并按限流速率执行，返回每条内容的操作结果。
+    
+    Args:
+        status_ids: 饭否内容的 ID 列表
+        action: 操作类型，"create" 表示收藏，"destroy" 表示取消收藏
+        confirm: 是否确认操作（二次确认参数）
+        
+    Returns:
+        操作结果字典，包含：
+        - 操作类型: 执行的具体操作（批量收藏/批量取消收藏）
+        - 成功数 / 失败数: 操作成功和失败的数量
+        - 操作明细: 每条内容的操作结果
+        
+        或者确认信息字典，包含：
+        - 需要确认: 是否需要用户确认
+        - 内容预览: 每条内容的预览及是否会被跳过
+        - 确认提示: 如何进行确认的说明
+    """
+    try:
+        if action not in ['create', 'destroy']:
+            return {"error": "action 参数必须是 'create' 或 'destroy'"}
+        
+        from utils import bulk_outcome, favorites_bulk_preview, parse_id_list
+        status_ids = parse_id_list(status_ids)
+        if not status_ids:
+            return {"error": "饭否内容 ID 列表不能为空"}
+        
+        import anyio
+        client = await get_fanfou_client_async()
+        operation_name = "收藏" if action == "create" else "取消收藏"
+        
+        # 如果未确认，先获取所有内容信息进行预览，绝对不执行操作
+        if not confirm:
+            statuses = await anyio.to_thread.run_sync(client.get_statuses_info, status_ids)
+            items, actionable = favorites_bulk_preview(statuses, action)
+            if not actionable:
+                return {"error": f"没有需要{operation_name}的内容", "内容预览": items}
+            
+            return {
+                "需要确认": True,
+                "操作类型": f"批量{operation_name}",
+                "总数": len(status_ids),
+                "将要操作": len(actionable),
+                "跳过": len(status_ids) - len(actionable),
+                "内容预览": items,
+                "⚠️ 重要提示": f"即将{operation_name} {len(actionable)} 条饭否内容，请确认是否继续",
+                "确认提示": f"如果确认{operation_name}这些饭否，请用户明确告诉我要{operation_name}，然后我会调用 manage_favorites_bulk({actionable}, '{action}', confirm=True)",
+                "🚫 绝对禁止": "AI助手不能自动确认操作，必须等待用户明确指示！"
+            }
+        
+        # 只有当用户明确确认时才执行操作
+        results = await anyio.to_thread.run_sync(client.manage_favorites, status_ids, action)
+        return {"操作类型": f"批量{operation_name}", **bulk_outcome(results, "发布 ID", f"{operation_name}成功")}
+    except Exception as e:
+        return {"error": str(e)}
+
+@mcp.tool()
+async def manage_friendships_bulk(user_ids: List[str], action: str, confirm: bool = False) -> Dict[str, Any]:
+    """
+    批量管理用户关注状态
+    
+    一次关注或取消关注多个用户。未确认时并发获取所有用户信息并生成一份汇总预览，
+    已经处于目标状态或无法获取的用户会被跳过；确认后以有限的并发数并按限流速率执行，返回每个用户的操作结果。
+    受保护账号的关注操作会变为申请关注，需要对方确认后才能生效。
+    
+    Args:
+        user_ids: 目标用户的 ID 列表
+        action: 操作类型，"create" 表示关注，"destroy" 表示取消关注
+        confirm: 是否确认操作（二次确认参数）
+        
+    Returns:
+        操作结果字典，包含：
+        - 操作类型: 执行的具体操作（批量关注/批量取消关注）
+        - 成功数 / 失败数: 操作成功和失败的数量
+        - 操作明细: 每个用户的操作结果
+        
+        或者确认信息字典，包含：
+        - 需要确认: 是否需要用户确认
+        - 用户预览: 每个用户的预览及是否会被跳过
+        - 确认提示: 如何进行确认的说明
+    """
+    try:
+        if action not in ['create', 'destroy']:
+            return {"error": "action 参数必须是 'create' 或 'destroy'"}
+        
+        from utils import bulk_outcome, friendships_bulk_preview, parse_id_list
+        user_ids = parse_id_list(user_ids)
+        if not user_ids:
+            return {"error": "用户 ID 列表不能为空"}
+        
+        import anyio
+        client = await get_fanfou_client_async()
+        operation_name = "关注" if action == "create" else "取消关注"
+        
+        # 如果未确认，先获取所有用户信息进行预览，绝对不执行操作
+        if not confirm:
+            users = await anyio.to_thread.run_sync(client.get_users_info, user_ids)
+            items, actionable = friendships_bulk_preview(users, action)
+            if not actionable:
+                return {"error": f"没有需要{operation_name}的用户", "用户预览": items}
+            
+            return {
+                "需要确认": True,
+                "操作类型": f"批量{operation_name}",
+                "总数": len(user_ids),
+                "将要操作": len(actionable),
+                "跳过": len(user_ids) - len(actionable),
+                "用户预览": items,
+                "⚠️ 重要提示": f"即将{operation_name} {len(actionable)} 个用户，请确认是否继续",
+                "确认提示": f"如果确认{operation_name}这些用户，请用户明确告诉我要{operation_name}，然后我会调用 manage_friendships_bulk({actionable}, '{action}', confirm=True)",
+                "🚫 绝对禁止": "AI助手不能自动确认操作，必须等待用户明确指示！"
+            }
+        
+        # 只有当用户明确确认时才执行操作
+        results = await anyio.to_thread.run_sync(client.manage_friendships, user_ids, action)
+        return {"操作类型": f"批量{operation_name}", **bulk_outcome(results, "用户 ID", f"{operation_name}成功")}
+    except Exception as e:
+        return {"error": str(e)}
+
 @mcp.tool()
 def publish_status(status: str, confirm: bool = False) -> Dict[str, Any]:
     """
@@ -672,6 +988,10 @@ def publish_status(status: str, confirm: bool = False) -> Dict[str, Any]:
         - 需要确认: 是否需要用户确认
         - 内容预览: 要发布的内容预览
         - 确认提示: 如何进行确认的说明
+        
+        开启发布队列（FANFOU_PUBLISH_QUEUE=1）时，确认发布后立即返回任务字典，包含：
+        - 任务 ID: 发布任务 ID，可通过 get_publish_job 查询发布结果
+        - 任务状态: 排队中
     """
     try:
         if len(status) > 140:
@@ -694,6 +1014,9 @@ def publish_status(status: str, confirm: bool = False) -> Dict[str, Any]:
         
         # 只有当用户明确确认时才执行发布
         # 这里应该只有在用户明确要求发布时才会到达
+        if PUBLISH_QUEUE_ENABLED:
+            return _queued_result(get_publish_queue().enqueue('status', {'status': status}))
+        
         client = get_fanfou_client()
         raw_data = client.publish_status(status)
         
@@ -710,7 +1033,7 @@ def publish_status(status: str, confirm: bool = False) -> Dict[str, Any]:
         return {"error": str(e)}
 
 @mcp.tool()
-def publish_photo(status: str, photo_url: str, confirm: bool = False) -> Dict[str, Any]:
+async def publish_photo(status: str, photo_url: str, confirm: bool = False) -> Dict[str, Any]:
     """
     发布饭否内容（文字+图片）
     
@@ -718,7 +1041,8 @@ def publish_photo(status: str, photo_url: str, confirm: bool = False) -> Dict[st
     
     Args:
         status: 要发布的文字内容（最多140字）
-        photo_url: 图片的网络 URL 地址
+        photo_url: 图片来源，支持网络 URL 地址（通过 get_status_info 获取过的图片链接会直接复用已下载的图片）、
+            data URL（data:image/png;base64,...）或本地文件路径（仅 stdio 方式，或设置了 FANFOU_ALLOW_LOCAL_FILES=1）
         confirm: 是否确认发布（二次确认参数）
         
     Returns:
@@ -732,6 +1056,10 @@ def publish_photo(status: str, photo_url: str, confirm: bool = False) -> Dict[st
         - 需要确认: 是否需要用户确认
         - 内容预览: 要发布的内容预览
         - 确认提示: 如何进行确认的说明
+        
+        开启发布队列（FANFOU_PUBLISH_QUEUE=1）时，确认发布后立即返回任务字典，包含：
+        - 任务 ID: 发布任务 ID，可通过 get_publish_job 查询发布结果
+        - 任务状态: 排队中
     """
     try:
         if len(status) > 140:
@@ -743,23 +1071,23 @@ def publish_photo(status: str, photo_url: str, confirm: bool = False) -> Dict[st
         if not photo_url.strip():
             return {"error": "图片 URL 不能为空"}
         
-        # 验证 URL 格式
-        import re
-        url_pattern = re.compile(
-            r'^https?://'  # http:// or https://
-            r'(?:(?:[A-Z0-9](?:[A-Z0-9-]{0,61}[A-Z0-9])?\.)+[A-Z]{2,6}\.?|'  # domain...
-            r'localhost|'  # localhost...
-            r'\d{1,3}\.\d{1,3}\.\d{1,3}\.\d{1,3})'  # ...or ip
-            r'(?::\d+)?'  # optional port
-            r'(?:/?|[/?]\S+)$', re.IGNORECASE)
+        # 识别图片来源：网络 URL、data URL 或本地文件
+        from utils import describe_photo_source, local_photo_path, photo_source_kind
+        source_kind = photo_source_kind(photo_url)
+        if source_kind is None:
+            return {"error": "无效的图片来源，请提供图片 URL、data URL（data:image/...;base64,...）或本地文件路径"}
         
-        if not url_pattern.match(photo_url):
-            return {"error": "无效的图片 URL 格式"}
+        # 不允许读取本地文件时不检查路径是否存在，避免泄露服务器上的文件信息
+        if source_kind == 'file' and not _local_files_allowed:
+            return {"error": "当前服务不支持读取本地文件，请提供图片 URL 或 data URL"}
+        
+        if source_kind == 'file' and not os.path.isfile(local_photo_path(photo_url)):
+            return {"error": f"本地图片文件不存在: {photo_url}"}
         
         # 检查 URL 是否看起来像图片
         image_extensions = ['.jpg', '.jpeg', '.png', '.gif', '.bmp', '.webp']
         url_lower = photo_url.lower()
-        has_image_extension = any(url_lower.endswith(ext) for ext in image_extensions)
+        has_image_extension = source_kind != 'url' or any(url_lower.endswith(ext) for ext in image_extensions)
         
         # 如果未确认，先显示内容预览，绝对不执行发布
         if not confirm:
@@ -768,15 +1096,18 @@ def publish_photo(status: str, photo_url: str, confirm: bool = False) -> Dict[st
             if not has_image_extension:
                 url_warning = "⚠️ 注意：URL 不包含常见的图片扩展名，将尝试下载并检测图片格式"
             
+            # data URL 内容很长，确认提示中不再重复
+            photo_arg = "与本次相同的 photo_url" if source_kind == 'data' else f"'{photo_url}'"
+            
             return {
                 "需要确认": True,
                 "内容预览": status,
                 "字数统计": f"{len(status)}/140",
-                "图片链接": photo_url,
+                "图片链接": describe_photo_source(photo_url),
                 "操作类型": "发布带图片的饭否",
                 "⚠️ 重要提示": "即将发布此内容和图片到饭否，发布后需要等待审核，请确认是否继续",
                 "URL 提示": url_warning if url_warning else "图片 URL 格式正常",
-                "确认提示": f"如果确认发布这条带图片的饭否，请用户明确告诉我要发布，然后我会调用 publish_photo('{status}', '{photo_url}', confirm=True)",
+                "确认提示": f"如果确认发布这条带图片的饭否，请用户明确告诉我要发布，然后我会调用 publish_photo('{status}', {photo_arg}, confirm=True)",
                 "🚫 绝对禁止": "AI助手不能自动确认发布，必须等待用户明确指示！"
             }
         
@@ -785,10 +1116,17 @@ def publish_photo(status: str, photo_url: str, confirm: bool = False) -> Dict[st
         
         # 如果没有图片扩展名，给出提示但不阻止（有些图片 URL 不包含扩展名）
         if not has_image_extension:
-            print(f"提示：URL 不包含常见的图片扩展名，将尝试下载: {photo_url}")
+            logger.info("URL 不包含常见的图片扩展名，将尝试下载: %s", photo_url)
         
-        client = get_fanfou_client()
-        raw_data = client.publish_photo(status, photo_url)
+        if PUBLISH_QUEUE_ENABLED:
+            return _queued_result(get_publish_queue().enqueue('photo', {'status': status, 'photo_url': photo_url}))
+        
+        # 下载、压缩和上传图片耗时较长，放到工作线程中执行，避免阻塞其他工具
+        import anyio
+        client = await get_fanfou_client_async()
+        raw_data = await anyio.to_thread.run_sync(
+            functools.partial(client.publish_photo, status, photo_url, allow_local_files=_local_files_allowed)
+        )
         
         # 解析发布结果
         result = {
@@ -803,7 +1141,7 @@ def publish_photo(status: str, photo_url: str, confirm: bool = False) -> Dict[st
         return {"error": str(e)}
 
 @mcp.tool()
-def delete_status(status_id: str, confirm: bool = False) -> Dict[str, Any]:
+def delete_status(status_id: str, confirm: bool = False, confirm_token: str = '') -> Dict[str, Any]:
     """
     删除饭否内容
     
@@ -813,6 +1151,7 @@ def delete_status(status_id: str, confirm: bool = False) -> Dict[str, Any]:
     Args:
         status_id: 要删除的饭否内容的 ID
         confirm: 是否确认删除（二次确认参数）
+        confirm_token: 预览时返回的确认令牌，确认时传入可复用预览获取的内容信息
         
     Returns:
         删除结果字典，包含：
@@ -823,6 +1162,7 @@ def delete_status(status_id: str, confirm: bool = False) -> Dict[str, Any]:
         或者确认信息字典，包含：
         - 需要确认: 是否需要用户确认
         - 内容预览: 要删除的内容预览
+        - 确认令牌: 确认时传入 confirm_token，复用预览时获取的信息（一次性，默认 5 分钟内有效）
         - 确认提示: 如何进行确认的说明
     """
     try:
@@ -836,6 +1176,8 @@ def delete_status(status_id: str, confirm: bool = False) -> Dict[str, Any]:
             try:
                 # 获取要删除的内容信息
                 status_info = client.get_status_info(status_id)
+                if "error" in status_info:
+                    raise Exception(status_info["error"])
                 
                 # 检查是否是自己的内容
                 if not status_info.get("is_self", False):
@@ -848,13 +1190,16 @@ def delete_status(status_id: str, confirm: bool = False) -> Dict[str, Any]:
                 clean_content = re.sub(r'<[^>]+>', '', content)
                 content_preview = clean_content[:50] + "..." if len(clean_content) > 50 else clean_content
                 
+                confirm_token = _issue_confirm_token("delete", status_id, {"内容预览": content_preview})
+                
                 return {
                     "需要确认": True,
                     "内容预览": content_preview,
                     "发布时间": status_info.get("created_at", ""),
                     "发布 ID": status_info.get("id", ""),
+                    "确认令牌": confirm_token,
                     "⚠️ 重要警告": "删除后无法恢复，请谨慎操作！",
-                    "确认提示": f"如果确认删除这条饭否，请用户明确告诉我要删除，然后我会调用 delete_status('{status_id}', confirm=True)",
+                    "确认提示": f"如果确认删除这条饭否，请用户明确告诉我要删除，然后我会调用 delete_status('{status_id}', confirm=True, confirm_token='{confirm_token}')",
                     "🚫 绝对禁止": "AI助手不能自动确认删除，必须等待用户明确指示！"
                 }
                 
@@ -864,6 +1209,7 @@ def delete_status(status_id: str, confirm: bool = False) -> Dict[str, Any]:
         
         # 只有当用户明确确认时才执行删除
         # 这里应该只有在用户明确要求删除时才会到达
+        preview = _redeem_confirm_token(confirm_token, "delete", status_id)
         raw_data = client.delete_status(status_id)
         
         # 解析删除结果
@@ -872,13 +1218,252 @@ def delete_status(status_id: str, confirm: bool = False) -> Dict[str, Any]:
             "删除结果": "删除成功",
             "重要提示": "饭否内容已成功删除，将从时间线中消失"
         }
+        if preview is not None:
+            result["内容预览"] = preview["内容预览"]
         
         return result
     except Exception as e:
         return {"error": str(e)}
 
-def main():
+@mcp.tool()
+def get_publish_job(job_id: str) -> Dict[str, Any]:
+    """
+    查询发布任务的状态
+    
+    开启发布队列（FANFOU_PUBLISH_QUEUE=1）时，publish_status 和 publish_photo 确认发布后会返回任务 ID，
+    可通过本工具查询发布结果。
+    
+    Args:
+        job_id: 发布任务 ID
+        
+    Returns:
+        任务状态字典，包含：
+        - 任务 ID: 发布任务 ID
+        - 任务类型: 发布文字或发布图片
+        - 任务状态: 排队中、等待重试、发布中、已发布、发布失败或结果未知（请求可能已经到达饭否，不会自动重试）
+        - 尝试次数: 已尝试发布的次数
+        - 发布 ID: 发布成功后新消息的唯一标识符
+        - 发布时间: 发布成功后的消息发布时间
+        - 错误信息: 最近一次失败的原因
+    """
+    try:
+        if not PUBLISH_QUEUE_ENABLED:
+            return {"error": "未开启发布队列，请设置环境变量 FANFOU_PUBLISH_QUEUE=1"}
+        
+        job = get_publish_queue().get(job_id)
+        if job is None:
+            return {"error": f"发布任务不存在: {job_id}"}
+        
+        status_names = {
+            'pending': "排队中" if job['attempts'] == 0 else "等待重试",
+            'running': "发布中",
+            'done': "已发布",
+            'failed': "发布失败",
+            'unknown': "结果未知",
+        }
+        result = {
+            "任务 ID": job['id'],
+            "任务类型": "发布图片" if job['kind'] == 'photo' else "发布文字",
+            "任务状态": status_names.get(job['status'], job['status']),
+            "尝试次数": job['attempts'],
+            "创建时间": time.strftime('%Y-%m-%d %H:%M:%S', time.localtime(job['created_at'])),
+            "更新时间": time.strftime('%Y-%m-%d %H:%M:%S', time.localtime(job['updated_at'])),
+        }
+        if job['status'] == 'done' and job['result']:
+            result["发布 ID"] = job['result'].get("id", "")
+            result["发布时间"] = job['result'].get("created_at", "")
+            result["重要提示"] = "内容已发布成功，正在等待审核，审核通过后将出现在时间线中"
+        if job['error']:
+            result["错误信息"] = job['error']
+        if job['status'] == 'unknown':
+            result["重要提示"] = "请求可能已经到达饭否，为避免重复发布不会自动重试；请先查看自己的时间线确认是否已发布，未发布时再重新发布"
+        
+        return result
+    except Exception as e:
+        return {"error": str(e)}
+
+def warm_up() -> None:
+    """
+    预热饭否客户端
+
+    创建客户端（完成 verify_credentials 并建立连接），然后预取首页和公开时间线到缓存。
+    """
+    client = get_fanfou_client()
+    client.prefetch_timelines(PREFETCH_COUNT)
+
+def _prefetch_loop() -> None:
+    """后台预热及定时预取"""
+    try:
+        warm_up()
+    except Exception as e:
+        logger.warning("预热失败: %s", e)
+    
+    while PREFETCH_INTERVAL > 0:
+        time.sleep(PREFETCH_INTERVAL)
+        try:
+            get_fanfou_client().prefetch_timelines(PREFETCH_COUNT)
+        except Exception as e:
+            logger.warning("预取时间线失败: %s", e)
+
+def start_prefetcher() -> None:
+    """启动后台预热线程，不阻塞服务器启动"""
+    # 预取的首页时间线需要缓存才能被工具调用读取，缓存有效期覆盖一个预取间隔
+    import fanfou_client
+    
+    soft_ttl = max(PREFETCH_INTERVAL, 30.0)
+    fanfou_client.enable_home_timeline_cache(soft_ttl, soft_ttl * 2)
+    threading.Thread(target=_prefetch_loop, name="fanfou-prefetch", daemon=True).start()
+
+# 同步工具的线程数上限；CapacityLimiter 需要在事件循环中创建，首次调用工具时再初始化
+_tool_threads = DEFAULT_TOOL_THREADS
+_tool_limiter = None
+
+def _run_sync_tools_in_threads(threads: int) -> None:
+    """
+    将同步工具函数包装为在工作线程中执行的异步函数
+
+    FastMCP 在事件循环中直接调用同步工具，饭否 API 请求期间整个服务无法处理其他请求；
+    SSE / HTTP 方式下多个客户端并发调用时，改为在最多 threads 个工作线程中执行（与 Gradio 应用的 tool_pool 相同）。
+    stdio 方式只有一个客户端，不做包装。重复调用时只更新线程数
+    """
+    global _tool_threads
+    _tool_threads = max(1, threads)
+    if _tool_limiter is not None:
+        _tool_limiter.total_tokens = _tool_threads
+    for tool in mcp._tool_manager._tools.values():
+        fn = getattr(tool, 'fn', None)
+        if fn is None or inspect.iscoroutinefunction(fn) or getattr(fn, '_in_thread', False):
+            continue
+        tool.fn = _in_thread(fn)
+
+def _in_thread(fn):
+    @functools.wraps(fn)
+    async def wrapper(*args, **kwargs):
+        import anyio
+        global _tool_limiter
+        if _tool_limiter is None:
+            _tool_limiter = anyio.CapacityLimiter(_tool_threads)
+        return await anyio.to_thread.run_sync(functools.partial(fn, *args, **kwargs), limiter=_tool_limiter)
+
+    wrapper._in_thread = True
+    return wrapper
+
+def build_http_app(transport: str, stateless: bool, max_body_size: int, gzip: bool,
+                   gzip_min_size: Optional[int] = None, tool_threads: int = DEFAULT_TOOL_THREADS):
+    """创建 SSE / streamable HTTP 传输方式的 ASGI 应用，同步工具在最多 tool_threads 个工作线程中执行"""
+    from http_middleware import http_middleware
+    
+    _run_sync_tools_in_threads(tool_threads)
+    return mcp.http_app(
+        transport=transport,
+        middleware=http_middleware(max_body_size, gzip, gzip_min_size),
+        stateless_http=stateless,
+        # SSE 事件流不会被压缩，开启压缩时 streamable HTTP 直接返回 JSON 响应
+        json_response=True if gzip and transport == 'http' else None,
+    )
+
+def http_app():
+    """
+    HTTP 工作进程的应用工厂（uvicorn main:http_app --factory）
+
+    每个工作进程独立导入本模块、创建自己的饭否客户端；请求可能被分配到任意进程，
+    因此使用无状态模式，不依赖进程内保存的 MCP 会话。配置从环境变量读取（由主进程的命令行参数写入）
+    """
+    if WARMUP_ENABLED:
+        start_prefetcher()
+    return build_http_app('http', True, HTTP_MAX_BODY_SIZE, HTTP_GZIP,
+                          tool_threads=HTTP_CONCURRENCY if HTTP_CONCURRENCY > 0 else DEFAULT_TOOL_THREADS)
+
+def parse_args(argv: Optional[List[str]] = None):
+    """解析 fanfou-mcp 的命令行参数，未指定的参数使用对应的环境变量"""
+    import argparse
+    
+    parser = argparse.ArgumentParser(prog='fanfou-mcp', description='饭否 MCP 服务器')
+    parser.add_argument('--transport', choices=TRANSPORTS, default=TRANSPORT if TRANSPORT in TRANSPORTS else 'stdio',
+                        help='传输方式，默认 stdio（FANFOU_TRANSPORT）')
+    parser.add_argument('--host', default=HTTP_HOST, help='HTTP 监听地址，默认 127.0.0.1（FANFOU_HOST）')
+    parser.add_argument('--port', type=int, default=HTTP_PORT, help='HTTP 监听端口，默认 8000（FANFOU_PORT）')
+    parser.add_argument('--workers', type=int, default=HTTP_WORKERS,
+                        help='工作进程数，仅 http 传输方式，默认 1（FANFOU_WORKERS）')
+    parser.add_argument('--concurrency', type=int, default=HTTP_CONCURRENCY,
+                        help='同时处理的连接和请求数上限，超出时返回 503，默认 0 不限制（FANFOU_HTTP_CONCURRENCY）')
+    parser.add_argument('--keep-alive', type=float, default=HTTP_KEEP_ALIVE,
+                        help='keep-alive 连接的空闲超时（秒），默认 5（FANFOU_HTTP_KEEP_ALIVE）')
+    parser.add_argument('--max-body-size', type=int, default=HTTP_MAX_BODY_SIZE,
+                        help='请求体大小上限（字节），超出时返回 413，默认 16MB，0 不限制（FANFOU_HTTP_MAX_BODY_SIZE）')
+    parser.add_argument('--gzip', action=argparse.BooleanOptionalAction, default=HTTP_GZIP,
+                        help='客户端支持时压缩响应，默认关闭（FANFOU_HTTP_GZIP）')
+    parser.add_argument('--gzip-min-size', type=int, default=None,
+                        help='压缩的最小响应字节数，更小的响应不压缩，默认 1024（FANFOU_GZIP_MIN_SIZE）')
+    return parser.parse_args(argv)
+
+def run_http(args) -> None:
+    """
+    运行 SSE / streamable HTTP 服务
+
+    workers > 1 时由 uvicorn 的主进程管理工作进程：异常退出的进程会被重新拉起，
+    收到 SIGHUP 时逐个重启工作进程（优雅重启），收到 SIGTERM/SIGINT 时等待进行中的请求完成后退出
+    """
+    import uvicorn
+    
+    options: Dict[str, Any] = {
+        'host': args.host,
+        'port': args.port,
+        'timeout_keep_alive': args.keep_alive,
+        'timeout_graceful_shutdown': GRACEFUL_TIMEOUT,
+        'log_level': log.LOG_LEVEL.lower(),
+    }
+    if args.concurrency > 0:
+        options['limit_concurrency'] = args.concurrency
+    tool_threads = args.concurrency if args.concurrency > 0 else DEFAULT_TOOL_THREADS
+    
+    path = 'sse' if args.transport == 'sse' else 'mcp'
+    if args.workers <= 1 or args.transport != 'http':
+        if args.workers > 1:
+            logger.warning("SSE 传输方式依赖进程内的会话，只能以单个进程运行，已忽略 --workers")
+        if WARMUP_ENABLED:
+            start_prefetcher()
+        if PUBLISH_QUEUE_ENABLED:
+            get_publish_queue()
+        app = build_http_app(args.transport, False, args.max_body_size, args.gzip, args.gzip_min_size, tool_threads)
+        logger.info("启动 %s 服务: http://%s:%d/%s/", args.transport.upper(), args.host, args.port, path)
+        uvicorn.run(app, **options)
+        return
+    
+    # 工作进程重新导入本模块并从环境变量读取配置
+    os.environ.update({
+        'FANFOU_HTTP_MAX_BODY_SIZE': str(args.max_body_size),
+        'FANFOU_HTTP_GZIP': '1' if args.gzip else '',
+        'FANFOU_HTTP_CONCURRENCY': str(args.concurrency),
+    })
+    if args.gzip_min_size is not None:
+        os.environ['FANFOU_GZIP_MIN_SIZE'] = str(args.gzip_min_size)
+    # 未指定缓存目录时使用默认目录，使各进程共享下载过的图片
+    os.environ.setdefault('FANFOU_CACHE_DIR', DEFAULT_CACHE_DIR)
+    if PUBLISH_QUEUE_ENABLED:
+        logger.warning("多进程模式不支持发布队列，FANFOU_PUBLISH_QUEUE 将被忽略")
+        os.environ['FANFOU_PUBLISH_QUEUE'] = ''
+    logger.info("以 %d 个工作进程启动 HTTP 服务: http://%s:%d/%s/", args.workers, args.host, args.port, path)
+    uvicorn.run('main:http_app', factory=True, workers=args.workers, **options)
+
+def main(argv: Optional[List[str]] = None):
     """MCP 服务器的主入口点"""
+    global _local_files_allowed
+    args = parse_args(argv)
+    if args.transport != 'stdio':
+        run_http(args)
+        return
+    
+    # stdio 方式下只有启动服务器的本机 MCP 客户端可以调用工具
+    _local_files_allowed = True
+    
+    if WARMUP_ENABLED:
+        start_prefetcher()
+    
+    # 继续发布上次退出前未完成的任务
+    if PUBLISH_QUEUE_ENABLED:
+        get_publish_queue()
+    
     # 启动服务器
     mcp.run()
 
@@ -0,0 +1,335 @@
+#!/usr/bin/env python3
+"""
+指标模块
+
+进程内的轻量指标收集，按 Prometheus 文本格式导出（不依赖 prometheus_client）：
+- 饭否 API 调用：按接口统计请求数、状态码、耗时分布、收发字节数和进行中的请求数
+- 工具调用：按工具统计调用数、结果、耗时分布和进行中的调用数
+- 缓存命中、发布重试等计数
+"""
+
+import bisect
+import re
+import threading
+import time
+import urllib.parse
+from typing import Callable, Dict, List, Sequence, Tuple
+
+import log
+import tracing
+
+logger = log.get_logger('metrics')
+api_logger = log.get_logger('api')
+tool_logger = log.get_logger('tools')
+
+# 耗时分布的桶（秒）
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+
+CONTENT_TYPE = 'text/plain; version=0.0.4; charset=utf-8'
+
+
+def _escape(value: str) -> str:
+    return value.replace('\\', '\\\\').replace('\n', '\\n').replace('"', '\\"')
+
+
+def _format_labels(names: Sequence[str], values: Sequence[str], extra: str = '') -> str:
+    pairs = [f'{name}="{_escape(value)}"' for name, value in zip(names, values)]
+    if extra:
+        pairs.append(extra)
+    return '{' + ','.join(pairs) + '}' if pairs else ''
+
+
+def _format_value(value: float) -> str:
+    if value == float('inf'):
+        return '+Inf'
+    return repr(float(value)) if not float(value).is_integer() else str(int(value))
+
+
+class _Metric:
+    """带标签的指标基类"""
+    kind = ''
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = ()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._lock = threading.Lock()
+
+    def _key(self, labels: Dict[str, str]) -> Tuple[str, ...]:
+        return tuple(str(labels.get(name, '')) for name in self.labelnames)
+
+    def render(self) -> List[str]:
+        lines = [f'# HELP {self.name} {self.documentation}', f'# TYPE {self.name} {self.kind}']
+        lines.extend(self._samples())
+        return lines
+
+    def _samples(self) -> List[str]:
+        raise NotImplementedError
+
+
+class Counter(_Metric):
+    """只增不减的计数器"""
+    kind = 'counter'
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = ()):
+        super().__init__(name, documentation, labelnames)
+        self._values: Dict[Tuple[str, ...], float] = {}
+
+    def inc(self, amount: float = 1, **labels: str) -> None:
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def value(self, **labels: str) -> float:
+        return self._values.get(self._key(labels), 0)
+
+    def remove(self, **labels: str) -> None:
+        """删除给定标签值匹配的所有序列（例如被淘汰的账号），避免标签组合无限增长"""
+        match = [(self.labelnames.index(name), str(value)) for name, value in labels.items()]
+        with self._lock:
+            for key in [key for key in self._values if all(key[index] == value for index, value in match)]:
+                del self._values[key]
+
+    def items(self) -> List[Tuple[Tuple[str, ...], float]]:
+        """返回所有 (标签值, 计数)"""
+        with self._lock:
+            return list(self._values.items())
+
+    def _samples(self) -> List[str]:
+        with self._lock:
+            items = sorted(self._values.items())
+        return [f'{self.name}{_format_labels(self.labelnames, key)} {_format_value(value)}' for key, value in items]
+
+
+class Gauge(Counter):
+    """可增可减的瞬时值"""
+    kind = 'gauge'
+
+    def dec(self, amount: float = 1, **labels: str) -> None:
+        self.inc(-amount, **labels)
+
+    def set(self, value: float, **labels: str) -> None:
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = value
+
+
+class Histogram(_Metric):
+    """按桶统计的分布（用于耗时）"""
+    kind = 'histogram'
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = (),
+                 buckets: Sequence[float] = DEFAULT_BUCKETS):
+        super().__init__(name, documentation, labelnames)
+        self.buckets = tuple(sorted(buckets))
+        # key -> [各桶计数..., 总和, 总数]
+        self._values: Dict[Tuple[str, ...], List[float]] = {}
+
+    def observe(self, value: float, **labels: str) -> None:
+        key = self._key(labels)
+        index = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            data = self._values.get(key)
+            if data is None:
+                data = self._values[key] = [0] * (len(self.buckets) + 2)
+            if index < len(self.buckets):
+                data[index] += 1
+            data[-2] += value
+            data[-1] += 1
+
+    def _samples(self) -> List[str]:
+        with self._lock:
+            items = sorted((key, list(data)) for key, data in self._values.items())
+        lines = []
+        for key, data in items:
+            cumulative = 0
+            for bound, count in zip(self.buckets, data):
+                cumulative += count
+                labels = _format_labels(self.labelnames, key, f'le="{_format_value(bound)}"')
+                lines.append(f'{self.name}_bucket{labels} {_format_value(cumulative)}')
+            labels = _format_labels(self.labelnames, key, 'le="+Inf"')
+            lines.append(f'{self.name}_bucket{labels} {_format_value(data[-1])}')
+            lines.append(f'{self.name}_sum{_format_labels(self.labelnames, key)} {_format_value(data[-2])}')
+            lines.append(f'{self.name}_count{_format_labels(self.labelnames, key)} {_format_value(data[-1])}')
+        return lines
+
+
+class Registry:
+    """指标注册表"""
+
+    def __init__(self):
+        self._metrics: List[_Metric] = []
+        # 导出前调用的回调，用于刷新由其他模块持有的瞬时值（例如线程池排队数）
+        self._collectors: List[Callable[[], None]] = []
+
+    def register(self, metric: _Metric) -> _Metric:
+        self._metrics.append(metric)
+        return metric
+
+    def add_collector(self, collector: Callable[[], None]) -> None:
+        self._collectors.append(collector)
+
+    def render(self) -> str:
+        """导出 Prometheus 文本格式"""
+        for collector in self._collectors:
+            try:
+                collector()
+            except Exception as e:
+                logger.warning("收集指标失败: %s", e)
+        lines = []
+        for metric in self._metrics:
+            lines.extend(metric.render())
+        return '\n'.join(lines) + '\n'
+
+
+registry = Registry()
+
+api_requests = registry.register(Counter(
+    'fanfou_api_requests_total', '饭否 API 请求数', ['endpoint', 'method', 'status']))
+api_duration = registry.register(Histogram(
+    'fanfou_api_request_duration_seconds', '饭否 API 请求耗时', ['endpoint', 'method']))
+api_sent_bytes = registry.register(Counter(
+    'fanfou_api_sent_bytes_total', '发送给饭否 API 的请求体字节数', ['endpoint']))
+api_received_bytes = registry.register(Counter(
+    'fanfou_api_received_bytes_total', '从饭否 API 接收的响应体字节数', ['endpoint']))
+api_in_flight = registry.register(Gauge(
+    'fanfou_api_requests_in_flight', '进行中的饭否 API 请求数'))
+
+tool_calls = registry.register(Counter(
+    'fanfou_tool_calls_total', '工具调用数', ['tool', 'outcome']))
+tool_duration = registry.register(Histogram(
+    'fanfou_tool_duration_seconds', '工具调用耗时', ['tool']))
+tool_in_flight = registry.register(Gauge(
+    'fanfou_tool_calls_in_flight', '进行中的工具调用数', ['tool']))
+
+tool_pool_limit = registry.register(Gauge(
+    'fanfou_tool_pool_limit', '工具线程池分组的并发上限', ['group']))
+tool_pool_running = registry.register(Gauge(
+    'fanfou_tool_pool_running', '工具线程池分组中正在执行的调用数', ['group']))
+tool_pool_waiting = registry.register(Gauge(
+    'fanfou_tool_pool_waiting', '工具线程池分组中排队等待的调用数', ['group']))
+
+tenant_calls = registry.register(Counter(
+    'fanfou_tenant_calls_total', '按账号统计的工具调用数', ['tenant', 'outcome']))
+tenants_active = registry.register(Gauge(
+    'fanfou_tenants_active', '缓存中的账号客户端数'))
+tenant_evictions = registry.register(Counter(
+    'fanfou_tenant_evictions_total', '淘汰的账号客户端数', ['reason']))
+
+cache_requests = registry.register(Counter(
+    'fanfou_cache_requests_total', '缓存读取次数', ['cache', 'result']))
+retries = registry.register(Counter(
+    'fanfou_retries_total', '重试次数', ['operation']))
+
+# 路径中的内容 ID、用户 ID 等会导致标签无限增长，统一替换为 :id
+_ID_SEGMENT = re.compile(r'^(/[^/]+/[^/.]+)/[^/]+?(\.json)?$')
+
+
+def endpoint_name(url: str) -> str:
+    """将请求 URL 归一化为接口名称，例如 /statuses/show/xxx.json -> /statuses/show/:id.json"""
+    path = urllib.parse.urlparse(url).path
+    return _ID_SEGMENT.sub(lambda m: f"{m.group(1)}/:id{m.group(2) or ''}", path)
+
+
+class track_api_call:
+    """
+    记录一次饭否 API 请求
+
+    用法：
+        with track_api_call(url, method, sent_bytes) as call:
+            response, content = ...
+            call.finish(response.status, len(content))
+    未调用 finish 就退出（发生异常）时状态记为 error。开启追踪时同时创建 HTTP span。
+    """
+
+    def __init__(self, url: str, method: str, sent_bytes: int = 0):
+        self.endpoint = endpoint_name(url)
+        self.method = method
+        self.sent_bytes = sent_bytes
+        self.received_bytes = 0
+        self.status = 'error'
+
+    def finish(self, status: int, received_bytes: int) -> None:
+        self.status = str(status)
+        self.received_bytes = received_bytes
+        api_received_bytes.inc(received_bytes, endpoint=self.endpoint)
+        self.span.set_attribute('http.status_code', status)
+        self.span.set_attribute('bytes_in', received_bytes)
+
+    def __enter__(self) -> 'track_api_call':
+        self._span = tracing.span(f'HTTP {self.method}', **{
+            'http.method': self.method, 'url.template': self.endpoint, 'bytes_out': self.sent_bytes,
+        })
+        self.span = self._span.__enter__()
+        self._started_at = time.perf_counter()
+        api_in_flight.inc()
+        return self
+
+    def __exit__(self, *exc_info) -> None:
+        duration = time.perf_counter() - self._started_at
+        self._span.__exit__(*exc_info)
+        api_in_flight.dec()
+        api_duration.observe(duration, endpoint=self.endpoint, method=self.method)
+        api_requests.inc(endpoint=self.endpoint, method=self.method, status=self.status)
+        if self.sent_bytes:
+            api_sent_bytes.inc(self.sent_bytes, endpoint=self.endpoint)
+        if log.DEBUG:
+            api_logger.debug("api call", extra={'fields': {
+                'endpoint': self.endpoint, 'method': self.method, 'status': self.status,
+                'duration_ms': round(duration * 1000, 1),
+                'bytes_out': self.sent_bytes, 'bytes_in': self.received_bytes,
+            }})
+
+
+class track_tool_call:
+    """
+    记录一次工具调用
+
+    工具以返回 {"error": ...} 的方式报告失败，调用方通过 failed() 标记；抛出异常时同样记为 error。
+    """
+
+    def __init__(self, tool: str):
+        self.tool = tool
+        self.outcome = 'ok'
+
+    def failed(self) -> None:
+        self.outcome = 'error'
+
+    def __enter__(self) -> 'track_tool_call':
+        self._span = tracing.span(f'tool {self.tool}', tool=self.tool)
+        self.span = self._span.__enter__()
+        self._started_at = time.perf_counter()
+        tool_in_flight.inc(tool=self.tool)
+        return self
+
+    def __exit__(self, exc_type, *exc_info) -> None:
+        duration = time.perf_counter() - self._started_at
+        if exc_type is not None:
+            self.outcome = 'error'
+        self.span.set_attribute('outcome', self.outcome)
+        self._span.__exit__(exc_type, *exc_info)
+        tool_in_flight.dec(tool=self.tool)
+        tool_duration.observe(duration, tool=self.tool)
+        tool_calls.inc(tool=self.tool, outcome=self.outcome)
+        if log.DEBUG:
+            tool_logger.debug("tool call", extra={'fields': {
+                'tool': self.tool, 'outcome': self.outcome, 'duration_ms': round(duration * 1000, 1),
+            }})
+
+
+def is_error_result(result) -> bool:
+    """
+    判断工具返回值是否表示失败
+
+    支持 {"error": ...}、时间线等列表工具的 [{"error": ...}]（FastMCP 的结构化结果中包装为 {"result": [...]}）
+    以及 JSON 文本形式的错误
+    """
+    if isinstance(result, dict) and len(result) == 1 and 'result' in result:
+        result = result['result']
+    if isinstance(result, list):
+        result = result[0] if result else None
+    if isinstance(result, dict):
+        return bool(result.get('error'))
+    if isinstance(result, str):
+        return result.lstrip().startswith(('{', '[')) and '"error"' in result[:200]
+    return False
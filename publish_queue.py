@@ -0,0 +1,306 @@
+#!/usr/bin/env python3
+"""
+发布队列模块
+
+将发布任务写入本地 SQLite 数据库，由后台线程按限流速率依次发布：
+- 入队后立即返回任务 ID，调用方不必等待饭否 API 响应
+- 任务持久化在本地文件中，进程重启后尚未开始发布的任务会继续发布
+- 发布不是幂等的：只有确定请求没有到达饭否的失败（域名解析失败、连接被拒绝、下载图片失败）按指数退避重试；
+  超时、连接中断等饭否可能已经收到请求的失败，以及进程退出时正在发布的任务，标记为结果未知，不再重新发送
+- 领取任务时记录进程标识和租约到期时间，多个进程共用队列文件时只回收所属进程已退出或租约过期的任务
+"""
+
+import json
+import os
+import socket
+import sqlite3
+import sys
+import threading
+import time
+import uuid
+from typing import Any, Callable, Dict, Optional
+
+import log
+import metrics
+import tracing
+from rate_limiter import RateLimiter
+
+logger = log.get_logger('publish_queue')
+
+# 任务状态
+PENDING = 'pending'
+RUNNING = 'running'
+DONE = 'done'
+FAILED = 'failed'
+# 请求可能已经到达饭否，无法确认是否已发布
+UNKNOWN = 'unknown'
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS publish_jobs (
+    id TEXT PRIMARY KEY,
+    kind TEXT NOT NULL,
+    payload TEXT NOT NULL,
+    status TEXT NOT NULL,
+    attempts INTEGER NOT NULL DEFAULT 0,
+    next_attempt_at REAL NOT NULL,
+    created_at REAL NOT NULL,
+    updated_at REAL NOT NULL,
+    result TEXT,
+    error TEXT,
+    owner TEXT,
+    lease_until REAL
+)
+"""
+
+# 旧版本创建的队列文件缺少的列
+_MIGRATIONS = {
+    'owner': "ALTER TABLE publish_jobs ADD COLUMN owner TEXT",
+    'lease_until': "ALTER TABLE publish_jobs ADD COLUMN lease_until REAL",
+}
+
+# 空闲时检查其他进程遗留任务的间隔（秒）
+RECLAIM_INTERVAL = 60.0
+
+
+def _boot_id() -> str:
+    """本次开机的标识，用于区分重启前后相同的进程号；不支持的平台返回空字符串"""
+    try:
+        with open('/proc/sys/kernel/random/boot_id') as f:
+            return f.read().strip()
+    except OSError:
+        return ''
+
+
+_BOOT_ID = _boot_id()
+
+
+def _current_owner() -> str:
+    # 每次调用时读取进程号，fork 出的子进程使用自己的标识
+    return f"{_BOOT_ID}:{os.getpid()}"
+
+
+def _owner_alive(owner: Optional[str]) -> bool:
+    """判断领取任务的进程是否仍在运行，无法判断时视为仍在运行（由租约兜底）"""
+    if not owner:
+        return False
+    boot_id, _, pid = owner.rpartition(':')
+    if boot_id != _BOOT_ID:
+        return False
+    try:
+        pid = int(pid)
+    except ValueError:
+        return False
+    if pid == os.getpid():
+        return True
+    if os.name == 'nt':
+        # Windows 上 os.kill 会结束目标进程，不能用来探测
+        return True
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except OSError:
+        # PermissionError 等：进程存在但属于其他用户
+        return True
+    return True
+
+
+def never_sent(error: Exception) -> bool:
+    """
+    判断发布失败时请求是否一定没有到达饭否（可以安全重试）
+
+    域名解析失败和连接被拒绝发生在发送请求之前；下载图片因网络原因失败（PhotoDownloadError）时还没有开始发布。
+    读取超时、连接中断、网关错误等情况下饭否可能已经收到请求
+    """
+    if isinstance(error, (socket.gaierror, ConnectionRefusedError)):
+        return True
+    # 只检查已经导入的模块，不为了判断异常类型而导入
+    httplib2 = sys.modules.get('httplib2')
+    if httplib2 is not None and isinstance(error, httplib2.ServerNotFoundError):
+        return True
+    fanfou_client = sys.modules.get('fanfou_client')
+    return fanfou_client is not None and isinstance(error, fanfou_client.PhotoDownloadError)
+
+
+class PublishQueue:
+    """
+    持久化的发布队列
+
+    publisher(kind, payload) 负责实际发布并返回饭否 API 的响应，抛出 ValueError 表示永久失败；
+    其他异常中只有 never_sent 判断请求没有发出的才重试，其余标记为结果未知。
+    lease 是领取任务后的租约时长（秒），应长于一次发布（包括下载图片）可能耗费的时间
+    """
+
+    def __init__(self, path: str, publisher: Callable[[str, Dict[str, Any]], Dict[str, Any]],
+                 rate_limiter: Optional[RateLimiter] = None, max_attempts: int = 3, retry_delay: float = 5.0,
+                 lease: float = 600.0):
+        self.path = path
+        self.publisher = publisher
+        self.rate_limiter = rate_limiter
+        self.max_attempts = max(1, max_attempts)
+        self.retry_delay = retry_delay
+        self.lease = lease
+
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self._conn = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+        self._lock = threading.Lock()
+        self._wakeup = threading.Event()
+        self._worker: Optional[threading.Thread] = None
+        self._last_reclaim = 0.0
+        with self._lock:
+            self._conn.execute(_SCHEMA)
+            columns = {row[1] for row in self._conn.execute("PRAGMA table_info(publish_jobs)")}
+            for column, statement in _MIGRATIONS.items():
+                if column not in columns:
+                    self._conn.execute(statement)
+            self._conn.execute("CREATE INDEX IF NOT EXISTS publish_jobs_pending ON publish_jobs (status, next_attempt_at)")
+
+    def enqueue(self, kind: str, payload: Dict[str, Any]) -> str:
+        """添加发布任务，返回任务 ID"""
+        job_id = uuid.uuid4().hex
+        now = time.time()
+        with self._lock:
+            self._conn.execute(
+                "INSERT INTO publish_jobs (id, kind, payload, status, next_attempt_at, created_at, updated_at)"
+                " VALUES (?, ?, ?, ?, ?, ?, ?)",
+                (job_id, kind, json.dumps(payload, ensure_ascii=False), PENDING, now, now, now)
+            )
+        self._wakeup.set()
+        return job_id
+
+    def get(self, job_id: str) -> Optional[Dict[str, Any]]:
+        """查询任务，不存在时返回 None"""
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT id, kind, status, attempts, created_at, updated_at, result, error"
+                " FROM publish_jobs WHERE id = ?",
+                (job_id,)
+            ).fetchone()
+        if row is None:
+            return None
+        return {
+            'id': row[0],
+            'kind': row[1],
+            'status': row[2],
+            'attempts': row[3],
+            'created_at': row[4],
+            'updated_at': row[5],
+            'result': json.loads(row[6]) if row[6] else None,
+            'error': row[7],
+        }
+
+    def start(self) -> None:
+        """启动后台发布线程（重复调用无副作用）"""
+        with self._lock:
+            if self._worker is not None:
+                return
+            self._reclaim()
+            self._worker = threading.Thread(target=self._run, name="fanfou-publish-queue", daemon=True)
+            self._worker.start()
+
+    def _reclaim(self) -> None:
+        """
+        回收其他进程遗留的发布中任务（调用方需持有 self._lock）
+
+        所属进程已经退出或租约已过期的任务可能已经发布，重新发送可能重复发布，标记为结果未知；
+        仍在运行的进程正在发布的任务保持不变
+        """
+        now = time.time()
+        rows = self._conn.execute(
+            "SELECT id, owner, lease_until FROM publish_jobs WHERE status = ?", (RUNNING,)
+        ).fetchall()
+        for job_id, owner, lease_until in rows:
+            if _owner_alive(owner) and lease_until is not None and lease_until > now:
+                continue
+            # 带上 owner 条件，避免覆盖在此期间被重新领取的任务
+            self._conn.execute(
+                "UPDATE publish_jobs SET status = ?, error = ?, owner = NULL, lease_until = NULL, updated_at = ?"
+                " WHERE id = ? AND status = ? AND owner IS ?",
+                (UNKNOWN, '进程在发布过程中退出，无法确认是否已发布', now, job_id, RUNNING, owner)
+            )
+        self._last_reclaim = now
+
+    def _next_job(self) -> Optional[tuple]:
+        """
+        取出下一个到期的任务并标记为发布中
+
+        多个进程可能共用同一个队列文件（例如同时运行的多个 STDIO 服务器），领取任务时带上 status 条件更新，
+        只有更新成功（rowcount 为 1）的进程会发布该任务；被其他进程抢先领取时继续查找下一个任务
+        """
+        while True:
+            now = time.time()
+            with self._lock:
+                row = self._conn.execute(
+                    "SELECT id, kind, payload, attempts FROM publish_jobs"
+                    " WHERE status = ? AND next_attempt_at <= ? ORDER BY created_at LIMIT 1",
+                    (PENDING, now)
+                ).fetchone()
+                if row is None:
+                    return None
+                claimed = self._conn.execute(
+                    "UPDATE publish_jobs SET status = ?, attempts = attempts + 1, owner = ?, lease_until = ?,"
+                    " updated_at = ? WHERE id = ? AND status = ?",
+                    (RUNNING, _current_owner(), now + self.lease, now, row[0], PENDING)
+                ).rowcount == 1
+            if claimed:
+                return row
+
+    def _finish(self, job_id: str, status: str, result: Optional[Dict[str, Any]] = None,
+                error: Optional[str] = None, next_attempt_at: float = 0.0) -> None:
+        with self._lock:
+            self._conn.execute(
+                "UPDATE publish_jobs SET status = ?, result = ?, error = ?, next_attempt_at = ?, owner = NULL,"
+                " lease_until = NULL, updated_at = ? WHERE id = ?",
+                (status, json.dumps(result, ensure_ascii=False) if result is not None else None,
+                 error, next_attempt_at, time.time(), job_id)
+            )
+
+    def _run(self) -> None:
+        while True:
+            try:
+                job = self._next_job()
+            except Exception as e:
+                logger.error("读取发布队列失败: %s", e)
+                job = None
+            if job is None:
+                if time.time() - self._last_reclaim >= RECLAIM_INTERVAL:
+                    try:
+                        with self._lock:
+                            self._reclaim()
+                    except Exception as e:
+                        logger.error("回收发布队列任务失败: %s", e)
+                # 没有到期任务时等待新任务入队，或定期检查等待重试的任务
+                self._wakeup.wait(1.0)
+                self._wakeup.clear()
+                continue
+
+            job_id, kind, payload, attempts = job
+            attempts += 1
+            if self.rate_limiter is not None:
+                self.rate_limiter.acquire()
+
+            try:
+                with tracing.span('publish_queue.job', job_id=job_id, kind=kind, attempt=attempts):
+                    result = self.publisher(kind, json.loads(payload))
+            except Exception as e:
+                # ValueError 表示内容或图片无效，重试也不会成功；
+                # JSONDecodeError 是 ValueError 的子类，通常来自网关返回的错误页面，请求可能已经到达饭否
+                if isinstance(e, ValueError) and not isinstance(e, json.JSONDecodeError):
+                    logger.error("发布任务 %s 失败: %s", job_id, e)
+                    self._finish(job_id, FAILED, error=str(e))
+                elif not never_sent(e):
+                    logger.error("发布任务 %s 结果未知，不再重试: %s", job_id, e)
+                    self._finish(job_id, UNKNOWN, error=str(e))
+                elif attempts < self.max_attempts:
+                    metrics.retries.inc(operation='publish')
+                    delay = self.retry_delay * 2 ** (attempts - 1)
+                    logger.warning("发布任务 %s 第 %d 次失败，%.0f 秒后重试: %s", job_id, attempts, delay, e)
+                    self._finish(job_id, PENDING, error=str(e), next_attempt_at=time.time() + delay)
+                else:
+                    logger.error("发布任务 %s 失败: %s", job_id, e)
+                    self._finish(job_id, FAILED, error=str(e))
+                continue
+
+            self._finish(job_id, DONE, result=result)
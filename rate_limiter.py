@@ -0,0 +1,50 @@
+#!/usr/bin/env python3
+"""
+限流模块
+
+提供进程内共享的令牌桶限流器
+"""
+
+import threading
+import time
+
+
+class RateLimiter:
+    """
+    令牌桶限流器
+
+    令牌以 rate 个/秒的速度补充，最多积累 burst 个；每次调用消耗一个令牌，没有令牌时等待。
+    允许短时间内突发 burst 次调用，长期平均速率不超过 rate。
+    """
+
+    def __init__(self, rate: float, burst: int = 1):
+        if rate <= 0:
+            raise ValueError("限流速率必须大于 0")
+        self.rate = rate
+        self.burst = max(1, burst)
+        self._tokens = float(self.burst)
+        self._updated_at = time.monotonic()
+        self._lock = threading.Lock()
+
+    def try_acquire(self) -> float:
+        """
+        尝试获取一个令牌
+
+        获取成功返回 0，否则返回还需等待的秒数（不消耗令牌）
+        """
+        with self._lock:
+            now = time.monotonic()
+            self._tokens = min(self.burst, self._tokens + (now - self._updated_at) * self.rate)
+            self._updated_at = now
+            if self._tokens >= 1:
+                self._tokens -= 1
+                return 0.0
+            return (1 - self._tokens) / self.rate
+
+    def acquire(self) -> None:
+        """获取一个令牌，没有令牌时阻塞等待"""
+        while True:
+            wait = self.try_acquire()
+            if wait <= 0:
+                return
+            time.sleep(wait)
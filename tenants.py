@@ -0,0 +1,177 @@
+#!/usr/bin/env python3
+"""
+多账号客户端管理模块
+
+托管部署（app.py）中每个请求通过 X-Fanfou-* Header 携带账号凭据，按凭据复用客户端：
+- 每个账号一个 FanFou 客户端，同一账号的请求共享首页时间线缓存（HTTP 连接由所有账号共享）
+- 每个账号独立的令牌桶限流，超出速率的调用立即返回错误，不请求饭否 API，不影响其他账号的配额
+  （检查发生在工具函数内，被限流的调用仍会短暂占用一个工具线程池名额，但不会等待）
+- 空闲超过 idle_ttl 或账号数超过 max_tenants 时淘汰最久未使用的账号，释放缓存
+- 按账号统计调用数和被限流次数（fanfou_tenant_calls_total，账号以凭据摘要的前缀标识，淘汰时删除对应序列）
+"""
+
+import hashlib
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Callable, Dict, Optional
+
+import log
+import metrics
+from rate_limiter import RateLimiter
+
+logger = log.get_logger('tenants')
+
+
+class TenantRateLimited(Exception):
+    """账号调用过于频繁"""
+
+    def __init__(self, wait: float):
+        super().__init__(f"当前账号请求过于频繁，请 {wait:.1f} 秒后重试")
+        self.wait = wait
+
+
+class Tenant:
+    """一个账号的客户端、限流器和统计"""
+
+    def __init__(self, key: str, client: Any, rate_limiter: Optional[RateLimiter]):
+        self.key = key
+        self.client = client
+        self.rate_limiter = rate_limiter
+        # stats() 和日志中的账号标识使用饭否用户 ID
+        self.label = str(getattr(client, 'user_id', '') or key[:12])
+        # 指标可能被公开访问，只使用凭据摘要的前缀，不暴露饭否用户 ID
+        self.metric_label = key[:12]
+        self.calls = 0
+        self.rate_limited = 0
+        self.last_used = time.monotonic()
+
+
+class TenantManager:
+    """
+    按账号凭据管理客户端
+
+    factory(api_key, api_secret, oauth_token, oauth_token_secret) 创建客户端（会请求饭否 API 验证凭据），
+    同一账号并发的首次请求只创建一次；创建失败的账号不缓存
+    """
+
+    def __init__(self, factory: Callable[[str, str, str, str], Any], max_tenants: int = 500,
+                 idle_ttl: float = 1800.0, rate: float = 0.0, burst: int = 1):
+        self.factory = factory
+        self.max_tenants = max(1, max_tenants)
+        self.idle_ttl = idle_ttl
+        # 每个账号每秒的调用数，0 表示不限流
+        self.rate = rate
+        self.burst = burst
+        self._tenants: 'OrderedDict[str, Tenant]' = OrderedDict()
+        self._lock = threading.Lock()
+        self._create_locks: Dict[str, threading.Lock] = {}
+        metrics.registry.add_collector(self._collect_metrics)
+
+    @staticmethod
+    def _key(api_key: str, api_secret: str, oauth_token: str, oauth_token_secret: str) -> str:
+        # 只保存凭据的摘要作为索引
+        raw = '\0'.join([api_key, api_secret, oauth_token, oauth_token_secret])
+        return hashlib.sha256(raw.encode('utf-8')).hexdigest()
+
+    def get(self, api_key: str, api_secret: str, oauth_token: str, oauth_token_secret: str) -> Any:
+        """
+        返回账号的客户端
+
+        超出账号限流时抛出 TenantRateLimited
+        """
+        key = self._key(api_key, api_secret, oauth_token, oauth_token_secret)
+        tenant = self._lookup(key)
+        if tenant is None:
+            tenant = self._create(key, api_key, api_secret, oauth_token, oauth_token_secret)
+
+        if tenant.rate_limiter is not None:
+            wait = tenant.rate_limiter.try_acquire()
+            if wait > 0:
+                tenant.rate_limited += 1
+                metrics.tenant_calls.inc(tenant=tenant.metric_label, outcome='rate_limited')
+                raise TenantRateLimited(wait)
+        tenant.calls += 1
+        metrics.tenant_calls.inc(tenant=tenant.metric_label, outcome='ok')
+        return tenant.client
+
+    def _lookup(self, key: str) -> Optional[Tenant]:
+        now = time.monotonic()
+        with self._lock:
+            self._evict_idle(now)
+            tenant = self._tenants.get(key)
+            if tenant is not None:
+                tenant.last_used = now
+                self._tenants.move_to_end(key)
+            return tenant
+
+    def _create(self, key: str, api_key: str, api_secret: str, oauth_token: str, oauth_token_secret: str) -> Tenant:
+        with self._lock:
+            create_lock = self._create_locks.setdefault(key, threading.Lock())
+        with create_lock:
+            # 等锁期间可能已经被其他请求创建
+            tenant = self._lookup(key)
+            if tenant is not None:
+                return tenant
+            try:
+                client = self.factory(api_key, api_secret, oauth_token, oauth_token_secret)
+            finally:
+                with self._lock:
+                    self._create_locks.pop(key, None)
+            rate_limiter = RateLimiter(self.rate, self.burst) if self.rate > 0 else None
+            tenant = Tenant(key, client, rate_limiter)
+            with self._lock:
+                self._tenants[key] = tenant
+                while len(self._tenants) > self.max_tenants:
+                    _, evicted = self._tenants.popitem(last=False)
+                    self._close(evicted, 'capacity')
+            logger.debug("新增账号客户端: %s", tenant.label)
+            return tenant
+
+    def _evict_idle(self, now: float) -> None:
+        """淘汰空闲的账号，调用方持有 _lock；按最近使用顺序排列，遇到未过期的账号即停止"""
+        while self._tenants:
+            tenant = next(iter(self._tenants.values()))
+            if now - tenant.last_used < self.idle_ttl:
+                break
+            self._tenants.popitem(last=False)
+            self._close(tenant, 'idle')
+
+    def _close(self, tenant: Tenant, reason: str) -> None:
+        metrics.tenant_evictions.inc(reason=reason)
+        metrics.tenant_calls.remove(tenant=tenant.metric_label)
+        logger.debug("淘汰账号客户端: %s（%s）", tenant.label, reason)
+        close = getattr(tenant.client, 'close', None)
+        if close is not None:
+            try:
+                close()
+            except Exception as e:
+                logger.warning("关闭账号客户端失败: %s", e)
+
+    def __len__(self) -> int:
+        return len(self._tenants)
+
+    def stats(self) -> Dict[str, Dict[str, Any]]:
+        """
+        返回各账号的统计，以饭否用户 ID 为键
+
+        - calls: 调用数
+        - rate_limited: 被限流的次数
+        - idle_seconds: 距上次使用的秒数
+        """
+        now = time.monotonic()
+        with self._lock:
+            tenants = list(self._tenants.values())
+        return {
+            tenant.label: {
+                'calls': tenant.calls,
+                'rate_limited': tenant.rate_limited,
+                'idle_seconds': round(now - tenant.last_used, 1),
+            }
+            for tenant in tenants
+        }
+
+    def _collect_metrics(self) -> None:
+        with self._lock:
+            self._evict_idle(time.monotonic())
+            metrics.tenants_active.set(len(self._tenants))
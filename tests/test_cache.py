@@ -0,0 +1,60 @@
+"""stale-while-revalidate 缓存的失效"""
+
+import threading
+import time
+
+from cache import SWRCache
+
+
+def _wait_idle(cache: SWRCache, timeout: float = 5.0) -> None:
+    deadline = time.time() + timeout
+    while cache._refreshing and time.time() < deadline:
+        time.sleep(0.01)
+    assert not cache._refreshing
+
+
+def test_refresh_started_before_publish_is_not_written_back():
+    cache = SWRCache('home_timeline')
+    cache.set(5, ['旧内容'])
+    started = threading.Event()
+    release = threading.Event()
+
+    def stale_loader():
+        # 后台刷新在发布之前读到了旧的时间线
+        started.set()
+        release.wait(5)
+        return ['旧内容']
+
+    # 软过期：返回旧数据并在后台刷新
+    assert cache.get(5, stale_loader, soft_ttl=0, hard_ttl=60) == ['旧内容']
+    assert started.wait(5)
+    # 发布完成，丢弃首页时间线缓存（FanFou._forget_own_statuses）
+    cache.clear()
+    release.set()
+    _wait_idle(cache)
+
+    assert cache.age(5) is None
+    assert cache.get(5, lambda: ['新内容', '旧内容'], soft_ttl=60, hard_ttl=60) == ['新内容', '旧内容']
+
+
+def test_refresh_after_clear_is_written():
+    cache = SWRCache('home_timeline')
+    cache.set(5, ['旧内容'])
+    cache.clear()
+    cache.set(5, ['旧内容'])
+
+    assert cache.get(5, lambda: ['新内容'], soft_ttl=0, hard_ttl=60) == ['旧内容']
+    _wait_idle(cache)
+
+    assert cache.get(5, lambda: ['不应加载'], soft_ttl=60, hard_ttl=60) == ['新内容']
+
+
+def test_prefetch_across_clear_is_dropped():
+    cache = SWRCache('home_timeline')
+    generation = cache.generation
+    cache.clear()
+    cache.set(5, ['旧内容'], generation)
+
+    assert cache.age(5) is None
+    cache.set(5, ['新内容'], cache.generation)
+    assert cache.age(5) is not None
@@ -0,0 +1,129 @@
+"""发布队列的重试与任务领取"""
+
+import io
+import socket
+import subprocess
+import sys
+import time
+
+import fanfou_client
+import publish_queue
+from publish_queue import PublishQueue
+
+
+def _closed_port() -> int:
+    with socket.socket() as s:
+        s.bind(('127.0.0.1', 0))
+        return s.getsockname()[1]
+
+
+def _wait(queue: PublishQueue, job_id: str, timeout: float = 5.0) -> dict:
+    deadline = time.time() + timeout
+    while time.time() < deadline:
+        job = queue.get(job_id)
+        if job['status'] not in (publish_queue.PENDING, publish_queue.RUNNING):
+            return job
+        time.sleep(0.02)
+    raise AssertionError(f"任务 {job_id} 未在 {timeout} 秒内完成: {queue.get(job_id)}")
+
+
+def test_download_connect_error_is_retried(tmp_path):
+    url = f"http://127.0.0.1:{_closed_port()}/photo.png"
+    attempts = []
+
+    def publisher(kind, payload):
+        attempts.append(kind)
+        if len(attempts) == 1:
+            # 图片服务器拒绝连接，还没有请求饭否 API
+            fanfou_client._download_photo(payload['photo_url'], io.BytesIO())
+        return {'id': 'published'}
+
+    queue = PublishQueue(str(tmp_path / 'queue.db'), publisher, retry_delay=0.01)
+    queue.start()
+    job = _wait(queue, queue.enqueue('photo', {'status': 'hi', 'photo_url': url}))
+
+    assert job['status'] == publish_queue.DONE
+    assert job['attempts'] == 2
+    assert job['result'] == {'id': 'published'}
+
+
+def test_download_error_is_never_sent():
+    url = f"http://127.0.0.1:{_closed_port()}/photo.png"
+    try:
+        fanfou_client._download_photo(url, io.BytesIO())
+    except fanfou_client.PhotoDownloadError as e:
+        assert not isinstance(e, ValueError)
+        assert publish_queue.never_sent(e)
+    else:
+        raise AssertionError("下载应当失败")
+
+
+def test_invalid_content_is_not_retried(tmp_path):
+    def publisher(kind, payload):
+        raise ValueError("图片文件不是有效的图片")
+
+    queue = PublishQueue(str(tmp_path / 'queue.db'), publisher, retry_delay=0.01)
+    queue.start()
+    job = _wait(queue, queue.enqueue('photo', {}))
+
+    assert job['status'] == publish_queue.FAILED
+    assert job['attempts'] == 1
+
+
+def test_timeout_is_unknown(tmp_path):
+    def publisher(kind, payload):
+        raise TimeoutError("timed out")
+
+    queue = PublishQueue(str(tmp_path / 'queue.db'), publisher, retry_delay=0.01)
+    queue.start()
+    job = _wait(queue, queue.enqueue('status', {}))
+
+    assert job['status'] == publish_queue.UNKNOWN
+    assert job['attempts'] == 1
+
+
+def test_jobs_are_claimed_once_across_queues(tmp_path):
+    path = str(tmp_path / 'queue.db')
+    published = []
+
+    def publisher(kind, payload):
+        published.append(payload['n'])
+        return {}
+
+    queues = [PublishQueue(path, publisher) for _ in range(4)]
+    job_ids = [queues[0].enqueue('status', {'n': n}) for n in range(50)]
+    for queue in queues:
+        queue.start()
+    for job_id in job_ids:
+        assert _wait(queues[0], job_id)['status'] == publish_queue.DONE
+
+    assert sorted(published) == list(range(50))
+
+
+def test_start_reclaims_only_abandoned_jobs(tmp_path):
+    queue = PublishQueue(str(tmp_path / 'queue.db'), lambda kind, payload: {})
+    exited = subprocess.Popen([sys.executable, '-c', 'pass'])
+    exited.wait()
+    running = subprocess.Popen([sys.executable, '-c', 'import time; time.sleep(30)'])
+    try:
+        now = time.time()
+        owners = {
+            'alive': (f"{publish_queue._BOOT_ID}:{running.pid}", now + 600),
+            'exited': (f"{publish_queue._BOOT_ID}:{exited.pid}", now + 600),
+            'expired': (f"{publish_queue._BOOT_ID}:{running.pid}", now - 1),
+            'legacy': (None, None),
+        }
+        for job_id, (owner, lease_until) in owners.items():
+            queue._conn.execute(
+                "INSERT INTO publish_jobs (id, kind, payload, status, next_attempt_at, created_at, updated_at,"
+                " owner, lease_until) VALUES (?, 'status', '{}', ?, 0, 0, 0, ?, ?)",
+                (job_id, publish_queue.RUNNING, owner, lease_until)
+            )
+        queue.start()
+
+        assert queue.get('alive')['status'] == publish_queue.RUNNING
+        for job_id in ('exited', 'expired', 'legacy'):
+            assert queue.get(job_id)['status'] == publish_queue.UNKNOWN
+    finally:
+        running.kill()
+        running.wait()
@@ -0,0 +1,93 @@
+#!/usr/bin/env python3
+"""
+工具线程池模块
+
+为阻塞的饭否 I/O 工具函数提供专用线程池和按分组的并发限制。
+
+每个分组对应一个 anyio.CapacityLimiter：
+- 工具函数被包装为异步函数，排队等待时不占用线程
+- 拿到配额后在工作线程中执行原来的同步函数
+- 分组之间互不影响，例如慢速的图片上传不会占满时间线读取的并发
+"""
+
+import functools
+import os
+from typing import Any, Callable, Dict
+
+import metrics
+
+# 默认分组及并发上限，可通过环境变量覆盖
+DEFAULT_LIMITS = {
+    'read': int(os.getenv('FANFOU_CONCURRENCY_READ', '16')),
+    'write': int(os.getenv('FANFOU_CONCURRENCY_WRITE', '4')),
+    'photo': int(os.getenv('FANFOU_CONCURRENCY_PHOTO', '2')),
+}
+
+
+class ToolPool:
+    """按分组限制并发的工具线程池"""
+
+    def __init__(self, limits: Dict[str, int]):
+        self.limits = dict(limits)
+        # CapacityLimiter 需要在事件循环中创建，首次使用时再初始化
+        self._limiters: Dict[str, Any] = {}
+        metrics.registry.add_collector(self._collect_metrics)
+
+    def _limiter(self, group: str):
+        limiter = self._limiters.get(group)
+        if limiter is None:
+            import anyio
+            limiter = self._limiters.setdefault(group, anyio.CapacityLimiter(self.limits[group]))
+        return limiter
+
+    def wrap(self, fn: Callable[..., Any], group: str) -> Callable[..., Any]:
+        """
+        将同步工具函数包装为在指定分组线程池中执行的异步函数
+
+        包装后的函数保留原函数的名称、文档和签名（Gradio 依赖它们生成 MCP 工具描述和注入 request）
+        """
+        if group not in self.limits:
+            raise ValueError(f"未知的工具分组: {group}")
+
+        @functools.wraps(fn)
+        async def wrapper(*args, **kwargs):
+            import anyio
+            # 耗时包含排队等待的时间
+            with metrics.track_tool_call(fn.__name__) as call:
+                result = await anyio.to_thread.run_sync(
+                    functools.partial(fn, *args, **kwargs),
+                    limiter=self._limiter(group)
+                )
+                if metrics.is_error_result(result):
+                    call.failed()
+                return result
+
+        return wrapper
+
+    def stats(self) -> Dict[str, Dict[str, int]]:
+        """
+        返回各分组的并发统计
+
+        - limit: 并发上限
+        - running: 正在执行的调用数
+        - waiting: 排队等待的调用数（队列深度）
+        """
+        result = {}
+        for group, limit in self.limits.items():
+            limiter = self._limiters.get(group)
+            if limiter is None:
+                result[group] = {'limit': limit, 'running': 0, 'waiting': 0}
+                continue
+            statistics = limiter.statistics()
+            result[group] = {
+                'limit': limit,
+                'running': statistics.borrowed_tokens,
+                'waiting': statistics.tasks_waiting,
+            }
+        return result
+
+    def _collect_metrics(self) -> None:
+        for group, stats in self.stats().items():
+            metrics.tool_pool_limit.set(stats['limit'], group=group)
+            metrics.tool_pool_running.set(stats['running'], group=group)
+            metrics.tool_pool_waiting.set(stats['waiting'], group=group)
@@ -0,0 +1,176 @@
+#!/usr/bin/env python3
+"""
+追踪模块
+
+可选的调用链追踪，用于定位慢调用的耗时分布（工具 → FanFou 方法 → HTTP 请求 / 图片处理）：
+- FANFOU_TRACING=json: 内置实现，每个结束的 span 以一行 JSON 追加写入 FANFOU_TRACE_FILE
+- FANFOU_TRACING=otlp: 使用 OpenTelemetry SDK 导出到本地 collector（需要安装 fanfou-mcp[tracing]，
+  导出地址等通过 OTEL_EXPORTER_OTLP_* 标准环境变量配置）
+- 未设置时关闭：span() 返回空操作对象，traced 装饰器直接返回原函数，没有额外开销
+"""
+
+import contextlib
+import contextvars
+import functools
+import json
+import os
+import secrets
+import threading
+import time
+from typing import Any, Callable, Dict, Iterator, Optional
+
+import log
+
+logger = log.get_logger('tracing')
+
+TRACING_MODE = os.getenv('FANFOU_TRACING', '').lower()
+TRACE_FILE = os.getenv('FANFOU_TRACE_FILE', 'fanfou-traces.jsonl')
+
+
+class _NoopSpan:
+    """关闭追踪时使用的空 span"""
+
+    def set_attribute(self, key: str, value: Any) -> None:
+        pass
+
+
+_NOOP_SPAN = _NoopSpan()
+
+
+class Span:
+    """内置 JSON 导出使用的 span"""
+
+    def __init__(self, name: str, trace_id: str, parent_id: Optional[str], attributes: Dict[str, Any]):
+        self.name = name
+        self.trace_id = trace_id
+        self.span_id = secrets.token_hex(8)
+        self.parent_id = parent_id
+        self.attributes = attributes
+        self.start_time = time.time()
+        self._started_at = time.perf_counter()
+
+    def set_attribute(self, key: str, value: Any) -> None:
+        self.attributes[key] = value
+
+    def to_dict(self, error: Optional[BaseException]) -> Dict[str, Any]:
+        return {
+            'name': self.name,
+            'trace_id': self.trace_id,
+            'span_id': self.span_id,
+            'parent_id': self.parent_id,
+            'start_time': self.start_time,
+            'duration_ms': round((time.perf_counter() - self._started_at) * 1000, 3),
+            'status': 'error' if error is not None else 'ok',
+            'error': repr(error) if error is not None else None,
+            'attributes': self.attributes,
+        }
+
+
+_current_span: contextvars.ContextVar[Optional[Span]] = contextvars.ContextVar('fanfou_span', default=None)
+_file_lock = threading.Lock()
+
+
+@contextlib.contextmanager
+def _json_span(name: str, attributes: Dict[str, Any]) -> Iterator[Span]:
+    parent = _current_span.get()
+    span = Span(name, parent.trace_id if parent else secrets.token_hex(16),
+                parent.span_id if parent else None, attributes)
+    token = _current_span.set(span)
+    error = None
+    try:
+        yield span
+    except BaseException as e:
+        error = e
+        raise
+    finally:
+        _current_span.reset(token)
+        line = json.dumps(span.to_dict(error), ensure_ascii=False, default=str)
+        try:
+            with _file_lock, open(TRACE_FILE, 'a', encoding='utf-8') as f:
+                f.write(line + '\n')
+        except OSError as e:
+            logger.warning("写入追踪文件失败: %s", e)
+
+
+_tracer = None
+
+
+def _configure() -> str:
+    """初始化追踪，返回实际生效的模式"""
+    global _tracer
+    if TRACING_MODE == 'otlp':
+        try:
+            from opentelemetry import trace
+            from opentelemetry.exporter.otlp.proto.http.trace_exporter import OTLPSpanExporter
+            from opentelemetry.sdk.resources import Resource
+            from opentelemetry.sdk.trace import TracerProvider
+            from opentelemetry.sdk.trace.export import BatchSpanProcessor
+        except ImportError:
+            logger.warning("已设置 FANFOU_TRACING=otlp 但未安装 OpenTelemetry，追踪不会生效（pip install \"fanfou-mcp[tracing]\"）")
+            return ''
+        provider = TracerProvider(resource=Resource.create({'service.name': 'fanfou-mcp'}))
+        provider.add_span_processor(BatchSpanProcessor(OTLPSpanExporter()))
+        trace.set_tracer_provider(provider)
+        _tracer = trace.get_tracer('fanfou-mcp')
+        return 'otlp'
+    if TRACING_MODE == 'json':
+        return 'json'
+    if TRACING_MODE:
+        logger.warning("未知的 FANFOU_TRACING: %s（支持 json、otlp）", TRACING_MODE)
+    return ''
+
+
+MODE = _configure()
+ENABLED = bool(MODE)
+
+
+def span(name: str, **attributes: Any):
+    """
+    创建 span 的上下文管理器
+
+    用法：
+        with tracing.span('image.get', **{'http.url': url}) as s:
+            ...
+            s.set_attribute('bytes', size)
+    """
+    if MODE == 'json':
+        return _json_span(name, attributes)
+    if MODE == 'otlp':
+        return _tracer.start_as_current_span(name, attributes=attributes)
+    return contextlib.nullcontext(_NOOP_SPAN)
+
+
+def annotate(key: str, value: Any) -> None:
+    """为当前 span 添加属性（例如缓存命中情况），没有 span 时忽略"""
+    if MODE == 'json':
+        current = _current_span.get()
+        if current is not None:
+            current.set_attribute(key, value)
+    elif MODE == 'otlp':
+        from opentelemetry import trace
+        trace.get_current_span().set_attribute(key, value)
+
+
+def traced(fn: Callable) -> Callable:
+    """为函数创建以限定名命名的 span（例如 FanFou.get_user_info），关闭追踪时直接返回原函数"""
+    if not ENABLED:
+        return fn
+
+    @functools.wraps(fn)
+    def wrapper(*args, **kwargs):
+        with span(fn.__qualname__):
+            return fn(*args, **kwargs)
+
+    return wrapper
+
+
+def bind_context(fn: Callable) -> Callable:
+    """
+    将当前上下文（包括当前 span）绑定到函数上，用于提交到线程池执行
+
+    ThreadPoolExecutor 不会传递 contextvars，工作线程中创建的 span 会丢失父 span
+    """
+    if not ENABLED:
+        return fn
+    context = contextvars.copy_context()
+    return functools.partial(context.run, fn)
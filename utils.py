@@ -6,10 +6,77 @@
 """
 
 import base64
-import requests
-from typing import Optional
+import hashlib
+import os
+import re
+import uuid
+from typing import Any, BinaryIO, Dict, Iterator, List, Optional, Tuple, Union
+import log
+import tracing
+from cache import BytesLRUCache, DiskBytesCache
 
+logger = log.get_logger('utils')
 
+# 最近下载过的图片（按图片 URL 缓存），发布图片时可直接复用，避免重复下载
+# 设置 FANFOU_CACHE_DIR 时缓存保存在该目录下，多个工作进程共享
+CACHE_DIR = os.getenv('FANFOU_CACHE_DIR', '')
+IMAGE_CACHE_SIZE = int(os.getenv('FANFOU_IMAGE_CACHE_SIZE', str(32 * 1024 * 1024)))
+IMAGE_CACHE_TTL = float(os.getenv('FANFOU_IMAGE_CACHE_TTL', '600'))
+if CACHE_DIR:
+    image_cache: Union[BytesLRUCache, DiskBytesCache] = DiskBytesCache(
+        os.path.join(CACHE_DIR, 'images.db'), max_bytes=IMAGE_CACHE_SIZE, ttl=IMAGE_CACHE_TTL, name='image'
+    )
+else:
+    image_cache = BytesLRUCache(max_bytes=IMAGE_CACHE_SIZE, ttl=IMAGE_CACHE_TTL, name='image')
+
+# 图片 URL 格式校验
+PHOTO_URL_PATTERN = re.compile(
+    r'^https?://'  # http:// or https://
+    r'(?:(?:[A-Z0-9](?:[A-Z0-9-]{0,61}[A-Z0-9])?\.)+[A-Z]{2,6}\.?|'  # domain...
+    r'localhost|'  # localhost...
+    r'\d{1,3}\.\d{1,3}\.\d{1,3}\.\d{1,3})'  # ...or ip
+    r'(?::\d+)?'  # optional port
+    r'(?:/?|[/?]\S+)$', re.IGNORECASE)
+
+# 图片 data URL 格式校验（仅支持 base64 编码）
+DATA_URL_PATTERN = re.compile(r'^data:(image/[a-z0-9.+-]+);base64,', re.IGNORECASE)
+
+
+def photo_source_kind(photo_url: str) -> Optional[str]:
+    """
+    判断图片来源类型
+    
+    Returns:
+        'url'（HTTP/HTTPS 网络地址）、'data'（base64 data URL）、'file'（本地文件路径或 file:// URL），
+        无法识别时返回 None
+    """
+    if DATA_URL_PATTERN.match(photo_url):
+        return 'data'
+    if PHOTO_URL_PATTERN.match(photo_url):
+        return 'url'
+    if photo_url.startswith('file://') or photo_url.startswith('~') or os.path.isabs(photo_url):
+        return 'file'
+    return None
+
+
+def local_photo_path(photo_url: str) -> str:
+    """将本地文件路径或 file:// URL 转换为文件系统路径"""
+    if photo_url.startswith('file://'):
+        from urllib.parse import unquote, urlparse
+        photo_url = unquote(urlparse(photo_url).path)
+    return os.path.expanduser(photo_url)
+
+
+def describe_photo_source(photo_url: str) -> str:
+    """生成用于预览的图片来源描述，data URL 只显示类型和大小，避免回显整段 base64"""
+    match = DATA_URL_PATTERN.match(photo_url)
+    if match:
+        approx_size = (len(photo_url) - match.end()) * 3 // 4
+        return f"data:{match.group(1)};base64,...（约 {approx_size // 1024} KB）"
+    return photo_url
+
+
+@tracing.traced
 def image_url_to_base64(large_url: str, normal_url: str = "") -> Optional[str]:
     """
     将图片URL转换为base64编码
@@ -23,10 +90,23 @@ def image_url_to_base64(large_url: str, normal_url: str = "") -> Optional[str]:
     Returns:
         base64编码的图片数据（data URL格式），如果失败则返回None
     """
+    # requests 导入较慢，只在图片相关路径上使用，首次调用时再导入
+    import requests
+
+    # 图片 URL 对应的内容不会变化，缓存中已有（本进程或其他工作进程下载过）时直接使用
+    for cached_url in filter(None, (large_url, normal_url)):
+        cached = image_cache.get(cached_url)
+        if cached is not None:
+            data, content_type = cached
+            with tracing.span('image.base64', bytes=len(data)):
+                return f"data:{content_type or 'image/jpeg'};base64,{base64.b64encode(data).decode('utf-8')}"
+
     try:
         # 首先尝试获取大图的大小
-        head_response = requests.head(large_url, timeout=10)
-        head_response.raise_for_status()
+        with tracing.span('image.head', **{'http.url': large_url}) as span:
+            head_response = requests.head(large_url, timeout=10)
+            span.set_attribute('http.status_code', head_response.status_code)
+            head_response.raise_for_status()
         
         # 获取内容长度
         content_length = head_response.headers.get('content-length')
@@ -34,7 +114,7 @@ def image_url_to_base64(large_url: str, normal_url: str = "") -> Optional[str]:
             file_size = int(content_length)
             # 如果大图超过300KB且有普通图片URL，则使用普通图片
             if file_size > 300 * 1024 and normal_url:
-                print(f"大图尺寸 {file_size} 字节超过300KB，使用普通图片")
+                logger.debug("大图尺寸 %d 字节超过300KB，使用普通图片", file_size)
                 image_url = normal_url
             else:
                 image_url = large_url
@@ -43,17 +123,286 @@ def image_url_to_base64(large_url: str, normal_url: str = "") -> Optional[str]:
             image_url = large_url
         
         # 下载图片
-        response = requests.get(image_url, timeout=10)
-        response.raise_for_status()
+        with tracing.span('image.get', **{'http.url': image_url}) as span:
+            response = requests.get(image_url, timeout=10)
+            span.set_attribute('http.status_code', response.status_code)
+            span.set_attribute('bytes', len(response.content))
+            response.raise_for_status()
         
         # 获取图片内容类型
         content_type = response.headers.get('content-type', 'image/jpeg')
         
+        # 缓存原始图片，之后以该 URL 发布图片时不再重复下载
+        image_cache.set(image_url, response.content, content_type)
+        
         # 转换为base64
-        image_base64 = base64.b64encode(response.content).decode('utf-8')
+        with tracing.span('image.base64', bytes=len(response.content)):
+            image_base64 = base64.b64encode(response.content).decode('utf-8')
         
         # 返回data URL格式
         return f"data:{content_type};base64,{image_base64}"
     except Exception as e:
-        print(f"转换图片为base64失败: {e}")
-        return None 
\ No newline at end of file
+        logger.warning("转换图片为base64失败: %s", e)
+        return None
+
+
+# 图片文件头（magic bytes）与 MIME 类型的对应关系
+IMAGE_SIGNATURES = [
+    (b'\xff\xd8\xff', 'image/jpeg'),
+    (b'\x89PNG\r\n\x1a\n', 'image/png'),
+    (b'GIF87a', 'image/gif'),
+    (b'GIF89a', 'image/gif'),
+    (b'BM', 'image/bmp'),
+]
+
+# 识别图片格式所需的最少字节数（WebP 需要 12 字节）
+IMAGE_SIGNATURE_SIZE = 12
+
+
+def detect_image_type(head: bytes) -> Optional[str]:
+    """
+    根据文件头识别图片格式
+    
+    Args:
+        head: 文件开头的字节（至少 IMAGE_SIGNATURE_SIZE 字节，文件更短时为完整内容）
+        
+    Returns:
+        图片的 MIME 类型，无法识别时返回 None
+    """
+    if head[:4] == b'RIFF' and head[8:12] == b'WEBP':
+        return 'image/webp'
+    for signature, mime_type in IMAGE_SIGNATURES:
+        if head.startswith(signature):
+            return mime_type
+    return None
+
+
+def pillow_available() -> bool:
+    """检查是否安装了 Pillow（图片压缩为可选功能）"""
+    import importlib.util
+    return importlib.util.find_spec('PIL') is not None
+
+
+def recompress_image(photo_file: BinaryIO, photo_size: int, target_size: int,
+                     max_dimension: int) -> Optional[Tuple[bytes, str]]:
+    """
+    缩小并重新压缩图片
+    
+    仅处理超过 target_size 字节或最长边超过 max_dimension 像素的静态图片（动图保持原样）。
+    重新编码时按 EXIF 方向旋转图片并去除 EXIF 等元数据；带透明通道的图片输出 PNG，其余输出 JPEG，
+    逐步降低质量和尺寸直到不超过 target_size。需要安装 Pillow。
+    
+    Args:
+        photo_file: 图片文件对象
+        photo_size: 图片字节数
+        target_size: 目标字节数
+        max_dimension: 最长边的最大像素数
+        
+    Returns:
+        (压缩后的图片数据, MIME 类型)，不需要处理时返回 None
+    """
+    import io
+    from PIL import Image, ImageOps
+    
+    photo_file.seek(0)
+    with Image.open(photo_file) as image:
+        if getattr(image, 'is_animated', False):
+            return None
+        if photo_size <= target_size and max(image.size) <= max_dimension:
+            return None
+        
+        has_alpha = image.mode in ('RGBA', 'LA') or (image.mode == 'P' and 'transparency' in image.info)
+        image = ImageOps.exif_transpose(image)
+        image = image.convert('RGBA' if has_alpha else 'RGB')
+        if max(image.size) > max_dimension:
+            image.thumbnail((max_dimension, max_dimension), Image.LANCZOS)
+    
+    quality = 85
+    while True:
+        buffer = io.BytesIO()
+        if has_alpha:
+            image.save(buffer, 'PNG', optimize=True)
+            mime_type = 'image/png'
+        else:
+            image.save(buffer, 'JPEG', quality=quality, optimize=True, progressive=True)
+            mime_type = 'image/jpeg'
+        
+        if buffer.tell() <= target_size or max(image.size) <= 256:
+            return buffer.getvalue(), mime_type
+        
+        # 先降低 JPEG 质量，质量降到下限后再缩小尺寸
+        if not has_alpha and quality > 55:
+            quality -= 15
+        else:
+            image = image.resize((max(1, image.width * 3 // 4), max(1, image.height * 3 // 4)), Image.LANCZOS)
+
+
+class MultipartStream:
+    """
+    multipart/form-data 流式编码器
+
+    依次输出文本字段和文件头（preamble）、文件内容分块、结束边界（trailer），
+    不拼接完整的请求体，峰值内存只有一个分块大小。
+    请求体长度可预先计算，可作为可迭代的请求体直接交给 http.client 发送：
+    每次发送（包括 httplib2 在连接断开后的重试）都重新迭代，从头输出完整的请求体。
+    """
+
+    def __init__(self, fields: List[Tuple[str, str]], file_field: str, filename: str, mime_type: str,
+                 file_obj: BinaryIO, file_size: int, chunk_size: int = 64 * 1024):
+        self.boundary = f"----formdata-{uuid.uuid4().hex}"
+        self.content_type = f'multipart/form-data; boundary={self.boundary}'
+        self.file_obj = file_obj
+        self.file_size = file_size
+        self.chunk_size = chunk_size
+
+        body_parts = []
+        for name, value in fields:
+            body_parts.append(f'--{self.boundary}')
+            body_parts.append(f'Content-Disposition: form-data; name="{name}"')
+            body_parts.append('Content-Type: text/plain')
+            body_parts.append('')
+            body_parts.append(value)
+        body_parts.append(f'--{self.boundary}')
+        body_parts.append(f'Content-Disposition: form-data; name="{file_field}"; filename="{filename}"')
+        body_parts.append(f'Content-Type: {mime_type}')
+        body_parts.append('')
+
+        self._preamble = ('\r\n'.join(body_parts) + '\r\n').encode('utf-8')
+        self._trailer = f'\r\n--{self.boundary}--\r\n'.encode('utf-8')
+
+    def __len__(self) -> int:
+        return len(self._preamble) + self.file_size + len(self._trailer)
+
+    def __iter__(self) -> Iterator[bytes]:
+        yield self._preamble
+        self.file_obj.seek(0)
+        while True:
+            chunk = self.file_obj.read(self.chunk_size)
+            if not chunk:
+                break
+            yield chunk
+        yield self._trailer
+
+    def sha1(self) -> bytes:
+        """流式计算整个请求体的 SHA1 摘要（OAuth body hash 需要）"""
+        digest = hashlib.sha1()
+        for chunk in self:
+            digest.update(chunk)
+        return digest.digest()
+
+
+def parse_id_list(ids: Union[str, List[str]]) -> List[str]:
+    """将 ID 列表或以逗号、空白分隔的字符串转换为去重后的 ID 列表（保持原顺序）"""
+    if isinstance(ids, str):
+        ids = re.split(r'[\s,，]+', ids)
+    return list(dict.fromkeys(item.strip() for item in ids if item and item.strip()))
+
+
+def _error_message(result: Any) -> Optional[str]:
+    """返回批量操作单项结果中的错误信息，成功时返回 None"""
+    if isinstance(result, Exception):
+        return str(result)
+    if isinstance(result, dict) and result.get('error'):
+        return str(result['error'])
+    return None
+
+
+def favorites_bulk_preview(statuses: List[Tuple[str, Any]], action: str) -> Tuple[List[Dict[str, Any]], List[str]]:
+    """
+    生成批量收藏操作的预览
+    
+    Args:
+        statuses: get_statuses_info 的返回值 [(status_id, 内容信息或异常)]
+        action: 'create' 或 'destroy'
+        
+    Returns:
+        (每条内容的预览列表, 需要操作的 status_id 列表)
+    """
+    items = []
+    actionable = []
+    for status_id, info in statuses:
+        error = _error_message(info)
+        if error is not None:
+            items.append({"发布 ID": status_id, "说明": f"无法获取内容信息，跳过: {error}"})
+            continue
+        
+        clean_content = re.sub(r'<[^>]+>', '', info.get("text", ""))
+        favorited = info.get("favorited", False)
+        item = {
+            "发布 ID": status_id,
+            "内容预览": clean_content[:50] + "..." if len(clean_content) > 50 else clean_content,
+            "发布者": info.get("user", {}).get("name", ""),
+            "当前收藏状态": "已收藏" if favorited else "未收藏",
+        }
+        if action == "create" and favorited:
+            item["说明"] = "已经收藏过了，跳过"
+        elif action == "destroy" and not favorited:
+            item["说明"] = "尚未收藏，跳过"
+        else:
+            actionable.append(status_id)
+        items.append(item)
+    return items, actionable
+
+
+def friendships_bulk_preview(users: List[Tuple[str, Any]], action: str) -> Tuple[List[Dict[str, Any]], List[str]]:
+    """
+    生成批量关注操作的预览
+    
+    Args:
+        users: get_users_info 的返回值 [(user_id, 用户信息或异常)]
+        action: 'create' 或 'destroy'
+        
+    Returns:
+        (每个用户的预览列表, 需要操作的 user_id 列表)
+    """
+    items = []
+    actionable = []
+    for user_id, info in users:
+        error = _error_message(info)
+        if error is not None:
+            items.append({"用户 ID": user_id, "说明": f"无法获取用户信息，跳过: {error}"})
+            continue
+        
+        following = info.get("following", False)
+        protected = info.get("protected", False)
+        item = {
+            "用户 ID": user_id,
+            "用户名": info.get("name", ""),
+            "是否受保护": protected,
+            "当前关注状态": "已关注" if following else "未关注",
+        }
+        if action == "create" and following:
+            item["说明"] = "已经关注了该用户，跳过"
+        elif action == "destroy" and not following:
+            item["说明"] = "尚未关注该用户，跳过"
+        else:
+            if action == "create" and protected:
+                item["说明"] = "该用户账号受保护，关注操作将变为申请关注"
+            actionable.append(user_id)
+        items.append(item)
+    return items, actionable
+
+
+def bulk_outcome(results: List[Tuple[str, Any]], id_name: str, success_msg: str) -> Dict[str, Any]:
+    """
+    汇总批量写操作的结果
+    
+    Args:
+        results: [(id, 操作结果或异常)]
+        id_name: 结果中 ID 字段的名称，例如 "发布 ID"、"用户 ID"
+        success_msg: 单项成功时的描述
+    """
+    items = []
+    succeeded = 0
+    for item_id, result in results:
+        error = _error_message(result)
+        if error is None:
+            succeeded += 1
+            items.append({id_name: item_id, "操作结果": success_msg})
+        else:
+            items.append({id_name: item_id, "操作结果": f"失败: {error}"})
+    return {
+        "成功数": succeeded,
+        "失败数": len(results) - succeeded,
+        "操作明细": items,
+    }